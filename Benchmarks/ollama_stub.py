@@ -0,0 +1,201 @@
+import re
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OllamaStubServer:
+    """
+    Local stand-in for the Ollama HTTP API, implementing /api/chat (streaming and
+    non-streaming) with a configurable first-token latency and token rate.
+
+    When the request offers tools and the last user message contains a path, the stub answers
+    with a call to the first tool, so the tool path can be benchmarked too.
+
+    With load_seconds set, models are "loaded" like Ollama does: a request for a model that
+    is not loaded first waits load_seconds, and the model stays loaded for the request's
+    keep_alive (default keep_alive seconds). A request without messages only loads the model.
+    """
+
+    def __init__(self, **kwargs):
+        self.host = kwargs.get("host", "127.0.0.1")
+        self.port = kwargs.get("port", 0)
+        self.latency = kwargs.get("latency", 0.05)  # seconds before the first token
+        self.tokens_per_second = kwargs.get("tokens_per_second", 200)
+        self.response_tokens = kwargs.get("response_tokens", 64)
+        self.load_seconds = kwargs.get("load_seconds", 0.0)
+        self.keep_alive = kwargs.get("keep_alive", 300)
+        self.loaded = {}  # model -> time.monotonic() it is unloaded at
+        self.requests_served = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.server.server_address[1]}/api/chat"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Small streamed lines must not wait for delayed ACKs on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                try:
+                    stub.handle_chat(self, payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, e.g. a RAG answer that turned out to be void
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # Clients closing idle keep-alive connections are expected
+                if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+                    super().handle_error(request, client_address)
+
+        self.server = Server((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ollama-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _tool_call(self, payload):
+        tools = payload.get("tools") or []
+        user_messages = [m for m in payload.get("messages", []) if m.get("role") == "user"]
+        if not tools or not user_messages:
+            return None
+        match = re.search(r"(/[^\s'\"]+)", user_messages[-1].get("content", ""))
+        if not match:
+            return None
+        name = tools[0].get("function", {}).get("name", "tool")
+        return {"function": {"name": name, "arguments": {"repository_path": match.group(1)}}}
+
+    def _keep_alive_seconds(self, keep_alive):
+        if keep_alive is None:
+            return self.keep_alive
+        if isinstance(keep_alive, str):
+            match = re.fullmatch(r"(-?[\d.]+)([hms]?)", keep_alive.strip())
+            if not match:
+                return self.keep_alive
+            keep_alive = float(match.group(1)) * {"h": 3600, "m": 60, "s": 1, "": 1}[match.group(2)]
+        return float("inf") if keep_alive < 0 else keep_alive
+
+    def _load(self, model, keep_alive):
+        """
+        Load model if it is not loaded and extend its residency. Returns the seconds spent loading.
+        """
+        now = time.monotonic()
+        with self.lock:
+            cold = self.loaded.get(model, 0) <= now
+            self.loaded[model] = now + self._keep_alive_seconds(keep_alive)
+        if cold and self.load_seconds:
+            time.sleep(self.load_seconds)
+            return self.load_seconds
+        return 0.0
+
+    def unload(self, model=None):
+        """
+        Unload one model, or all of them, as if Ollama had evicted them.
+        """
+        with self.lock:
+            if model is None:
+                self.loaded.clear()
+            else:
+                self.loaded.pop(model, None)
+
+    def _tokens(self, payload):
+        words = " ".join(m.get("content", "") for m in payload.get("messages", [])).split()
+        prompt_tokens = len(words)
+        words = words or ["token"]
+        return prompt_tokens, [words[i % len(words)] + " " for i in range(self.response_tokens)]
+
+    def handle_chat(self, request, payload):
+        with self.lock:
+            self.requests_served += 1
+        model = payload.get("model", "stub")
+        prompt_tokens, tokens = self._tokens(payload)
+        tool_call = self._tool_call(payload)
+        load_duration = int(self._load(model, payload.get("keep_alive")) * 1e9)
+        if payload.get("messages"):
+            time.sleep(self.latency)
+        else:
+            # A preload: nothing to generate
+            tokens = []
+
+        def stats():
+            return {"done": True, "model": model, "prompt_eval_count": prompt_tokens, "eval_count": len(tokens),
+                    "load_duration": load_duration}
+
+        if not payload.get("stream", True):
+            time.sleep(len(tokens) / self.tokens_per_second)
+            message = {"role": "assistant", "content": "" if tool_call else "".join(tokens)}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            body = json.dumps({"message": message, **stats()}).encode("utf-8")
+            request.send_response(200)
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+            return
+
+        request.send_response(200)
+        request.send_header("Content-Type", "application/x-ndjson")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+
+        def write_line(data):
+            line = (json.dumps(data) + "\n").encode("utf-8")
+            request.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+            request.wfile.flush()
+
+        if tool_call:
+            write_line({"message": {"role": "assistant", "content": "", "tool_calls": [tool_call]}, "done": False})
+        else:
+            for token in tokens:
+                write_line({"message": {"role": "assistant", "content": token}, "done": False})
+                time.sleep(1 / self.tokens_per_second)
+        write_line({"message": {"role": "assistant", "content": ""}, **stats()})
+        request.wfile.write(b"0\r\n\r\n")
+        request.wfile.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local Ollama /api/chat stub.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = OllamaStubServer(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            response_tokens=args.response_tokens, load_seconds=args.load_seconds).start()
+    print(f"Ollama stub listening on {stub.url}")
+    stub.thread.join()
@@ -0,0 +1,288 @@
+"""
+Benchmark suite: cold and warm first-token latency, ingest throughput, retrieval latency, compact
+vector storage (size and recall), repository analysis and end-to-end chat latency, measured
+against a synthetic repository and a local Ollama stub that emulates model loading.
+
+    python Benchmarks/run_benchmarks.py --files 200 --output results.json
+
+Compare two reports (e.g. from two commits) to spot regressions.
+
+Everything runs inside a temporary working directory, so caches and indexes from earlier runs
+(or from the application itself) never leak into the numbers.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from Benchmarks.ollama_stub import OllamaStubServer
+from Benchmarks.synthetic_repo import WORDS, generate_repository
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_ingest(rag_handler, repo_path, repo_info):
+    """
+    Cold ingest of the whole repository, then a re-index where every file is unchanged.
+    """
+    results = {}
+    for run in ("cold", "unchanged"):
+        start = time.perf_counter()
+        stats = rag_handler.update_vectorstore(repo_path)
+        seconds = time.perf_counter() - start
+        results[run] = {
+            "seconds": round(seconds, 3),
+            "files_per_second": round(repo_info["files"] / seconds, 2),
+            "mb_per_second": round(repo_info["bytes"] / 1e6 / seconds, 3),
+            "chunks_added": stats["chunks_added"],
+            "chunks_per_second": round(stats["chunks_added"] / seconds, 2),
+            "files_unchanged": stats["files_unchanged"],
+        }
+    return results
+
+
+def benchmark_retrieval(rag_handler, queries):
+    """
+    Relevance-gate latency for each query, uncached and then repeated (cache hits).
+    """
+    results = {}
+    rag_handler.bump_index_generation()
+    for run in ("uncached", "cached"):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            rag_handler.relevance_gate(query)
+            samples.append(time.perf_counter() - start)
+        results[run] = latency_summary(samples)
+    return results
+
+
+def benchmark_vector_storage(embedding, repo_path, queries, k, workdir):
+    """
+    Index size, search latency and recall@k of the FAISS vector dtypes, with float32 as the
+    reference for recall, over the chunks of the repository.
+    """
+    from repo_scanner import RepositoryScanner
+    from RAG.embedding import embed_query_array
+    from RAG.faiss_store import FaissStore
+    from RAG.ingest import load_and_split
+
+    scanned, _ = RepositoryScanner().scan(repo_path)
+    texts = [text for scanned_file in scanned for text in load_and_split(scanned_file.path, None, 1000, 200).get("texts", [])]
+    query_vectors = [embed_query_array(embedding, query) for query in queries]
+
+    results, reference = {}, None
+    for vector_dtype in FaissStore.VECTOR_DTYPES:
+        store = FaissStore(os.path.join(workdir, f"storage-{vector_dtype}"), embedding, vector_dtype=vector_dtype)
+        for start in range(0, len(texts), 256):
+            store.add_texts(texts[start:start + 256], ids=[f"chunk-{i}" for i in range(start, min(start + 256, len(texts)))])
+        samples, found = [], []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            documents = store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+            samples.append(time.perf_counter() - start)
+            found.append({document.page_content for document, _ in documents})
+        reference = reference or found
+        recall = sum(len(a & b) for a, b in zip(found, reference)) / max(sum(len(b) for b in reference), 1)
+        results[vector_dtype] = {"chunks": store.count(), "index_bytes": store.index_bytes(),
+                                 "recall_at_k": round(recall, 4), "search": latency_summary(samples)}
+    return results
+
+
+def benchmark_repo_analyzer(analyzer, repo_path):
+    """
+    Wall time of analyze_repository, with a cold and then a warm summary cache.
+    """
+    results = {}
+    for run in ("cold", "warm"):
+        start = time.perf_counter()
+        response = json.loads(analyzer.handle_tool_call({"repository_path": repo_path}))
+        results[run] = {"seconds": round(time.perf_counter() - start, 3), "error": response.get("error")}
+    return results
+
+
+def benchmark_model_residency(stub, model, repeats):
+    """
+    First-token latency of a streamed chat request with the model unloaded (cold) and loaded
+    (warm), and of the first request after the residency manager preloaded the model.
+    Leaves the model loaded, so the benchmarks that follow run warm.
+    """
+    from model_handler import SCOUT_SYSTEM_PROMPT
+    from model_residency import ModelResidencyManager
+    from ollama_client import OllamaClient
+
+    client = OllamaClient(max_retries=0)
+    payload = {"model": model, "messages": [{"role": "system", "content": SCOUT_SYSTEM_PROMPT},
+                                            {"role": "user", "content": "Tell me a short story about a puppy"}]}
+
+    def first_token_seconds():
+        start = time.perf_counter()
+        for _ in client.stream_chat(stub.url, payload):
+            break
+        return time.perf_counter() - start
+
+    cold, warm = [], []
+    for _ in range(repeats):
+        stub.unload(model)
+        cold.append(first_token_seconds())
+        warm.append(first_token_seconds())
+
+    stub.unload(model)
+    manager = ModelResidencyManager(stub.url, [model], ping_interval=0, client=client)
+    preload = manager.preload(model)
+    after_preload = first_token_seconds()
+    client.close()
+    return {
+        "cold_first_token": latency_summary(cold),
+        "warm_first_token": latency_summary(warm),
+        "preload_seconds": preload["seconds"],
+        "first_token_after_preload_ms": round(after_preload * 1000, 3),
+    }
+
+
+def benchmark_chat(api, scenarios, repeats):
+    """
+    Time to first yielded message and total time of chat_with_tool_icon for each scenario.
+    """
+    results = {}
+    for name, message in scenarios.items():
+        first, total = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            first_at = None
+            for _ in api.chat_with_tool_icon(message, []):
+                if first_at is None:
+                    first_at = time.perf_counter() - start
+            total.append(time.perf_counter() - start)
+            first.append(first_at if first_at is not None else total[-1])
+        results[name] = {"first_message": latency_summary(first), "total": latency_summary(total)}
+    return results
+
+
+def retrieval_queries(repo_path, count, seed):
+    """
+    A mix of identifier lookups and natural-language questions about the synthetic repository.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        first, second = rng.sample(WORDS, 2)
+        if i % 2:
+            queries.append(f"What does {first}_{second} do in {os.path.basename(repo_path)}?")
+        else:
+            queries.append(f"How is the {first} used to build the {second}?")
+    return queries
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="assistant-bench-")
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from model_handler import Modelhandler
+        from RAG.embedding import get_embedding_model
+        from Tools.repo_analyzer import RepoAnalyzer
+
+        repo_path = os.path.join(workdir, "synthetic_repo")
+        repo_info = generate_repository(repo_path, files=args.files, file_size=(args.min_file_size, args.max_file_size), seed=args.seed)
+
+        with OllamaStubServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                              response_tokens=args.response_tokens, load_seconds=args.load_seconds) as stub:
+            model_residency = benchmark_model_residency(stub, args.model, args.chat_repeats)
+            tool = RepoAnalyzer(model=args.model, localApiUrl=stub.url, knowledge_base_dir=os.path.join(workdir, "knowledge_base"))
+            api = Modelhandler(localAPIUrl=stub.url, model=args.model, tool=tool, model_url=stub.url,
+                               db_name=os.path.join(workdir, "vectorstore"), vector_backend=args.backend)
+
+            results = {
+                "model_residency": model_residency,
+                "ingest": benchmark_ingest(api.rag_handler, repo_path, repo_info),
+                "retrieval": benchmark_retrieval(api.rag_handler, retrieval_queries(repo_path, args.queries, args.seed)),
+                "vector_storage": benchmark_vector_storage(get_embedding_model(api.rag_handler.embedding_model_name), repo_path,
+                                                           retrieval_queries(repo_path, args.queries, args.seed), 5, workdir),
+                "repo_analyzer": benchmark_repo_analyzer(tool, repo_path),
+                "chat": benchmark_chat(api, {
+                    "general": "Tell me a short story about a puppy",
+                    "rag": f"What does the session_cache function do in {os.path.basename(repo_path)}?",
+                    "tool": f"Analyze the repository at {repo_path}",
+                }, args.chat_repeats),
+            }
+            results["stub_requests"] = stub.requests_served
+        api.rag_handler.close_vectorstore()
+    finally:
+        os.chdir(original_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "repository": {key: value for key, value in repo_info.items() if key != "path"},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the assistant against a synthetic repository and an Ollama stub.")
+    parser.add_argument("--files", type=int, default=200, help="Number of files in the synthetic repository")
+    parser.add_argument("--min-file-size", type=int, default=500)
+    parser.add_argument("--max-file-size", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "faiss"])
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--queries", type=int, default=50, help="Number of retrieval queries")
+    parser.add_argument("--chat-repeats", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency before the first token, in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Stub token rate")
+    parser.add_argument("--response-tokens", type=int, default=64, help="Tokens per stub response")
+    parser.add_argument("--load-seconds", type=float, default=0.5, help="Stub model load time of a cold request, in seconds")
+    parser.add_argument("--output", default="benchmark_results.json", help="File the JSON report is written to")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directory")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import random
+
+
+WORDS = [
+    "user", "session", "cache", "index", "vector", "token", "stream", "batch", "query", "result",
+    "config", "handler", "client", "server", "request", "response", "buffer", "record", "manifest", "worker",
+]
+
+# Default share of each file type in a generated repository
+DEFAULT_LANGUAGE_MIX = {".py": 0.4, ".js": 0.2, ".java": 0.15, ".rs": 0.1, ".sh": 0.05, ".md": 0.1}
+
+
+def _identifier(rng, style="snake"):
+    words = rng.sample(WORDS, 2)
+    if style == "camel":
+        return words[0] + words[1].capitalize()
+    if style == "pascal":
+        return "".join(word.capitalize() for word in words)
+    return "_".join(words)
+
+
+def _python_function(rng):
+    name = _identifier(rng)
+    body = "\n".join(f"    {_identifier(rng)} = {rng.randint(0, 999)}" for _ in range(rng.randint(2, 12)))
+    return f'def {name}(self, {_identifier(rng)}):\n    """\n    Handle {name.replace("_", " ")}.\n    """\n{body}\n    return None\n'
+
+
+def _js_function(rng):
+    name = _identifier(rng, "camel")
+    body = "\n".join(f"  const {_identifier(rng, 'camel')} = {rng.randint(0, 999)};" for _ in range(rng.randint(2, 12)))
+    return f"function {name}({_identifier(rng, 'camel')}) {{\n{body}\n  return null;\n}}\n"
+
+
+def _java_method(rng):
+    name = _identifier(rng, "camel")
+    body = "\n".join(f"        int {_identifier(rng, 'camel')} = {rng.randint(0, 999)};" for _ in range(rng.randint(2, 12)))
+    return f"    public int {name}(int {_identifier(rng, 'camel')}) {{\n{body}\n        return 0;\n    }}\n"
+
+
+def _rust_function(rng):
+    name = _identifier(rng)
+    body = "\n".join(f"    let {_identifier(rng)} = {rng.randint(0, 999)};" for _ in range(rng.randint(2, 12)))
+    return f"pub fn {name}({_identifier(rng)}: u32) -> u32 {{\n{body}\n    0\n}}\n"
+
+
+def _shell_function(rng):
+    name = _identifier(rng)
+    body = "\n".join(f"  echo \"{_identifier(rng)} {rng.randint(0, 999)}\"" for _ in range(rng.randint(2, 6)))
+    return f"{name}() {{\n{body}\n}}\n"
+
+
+def _markdown_section(rng):
+    title = " ".join(rng.sample(WORDS, 3)).title()
+    sentences = " ".join(f"The {rng.choice(WORDS)} uses the {rng.choice(WORDS)} to build a {rng.choice(WORDS)}." for _ in range(rng.randint(3, 8)))
+    return f"## {title}\n\n{sentences}\n\n"
+
+
+def generate_file(rng, extension, target_size):
+    """
+    Generate plausible source (or markdown) content of roughly target_size characters.
+    """
+    if extension == ".java":
+        class_name = _identifier(rng, "pascal")
+        parts = [f"package bench;\n\npublic class {class_name} {{\n"]
+        while sum(len(part) for part in parts) < target_size:
+            parts.append(_java_method(rng) + "\n")
+        parts.append("}\n")
+        return "".join(parts)
+
+    generators = {".py": _python_function, ".js": _js_function, ".rs": _rust_function,
+                  ".sh": _shell_function, ".md": _markdown_section}
+    header = {".py": "import os\n\n\n", ".sh": "#!/bin/bash\n\n", ".md": "# Benchmark document\n\n"}.get(extension, "")
+    parts = [header]
+    while sum(len(part) for part in parts) < target_size:
+        parts.append(generators.get(extension, _markdown_section)(rng) + "\n")
+    return "".join(parts)
+
+
+def generate_repository(path, files=200, language_mix=None, file_size=(500, 8000), max_depth=3, seed=0):
+    """
+    Write a synthetic repository to path.
+
+    Args:
+        files (int): Number of files to generate.
+        language_mix (dict): Extension -> share of files; defaults to DEFAULT_LANGUAGE_MIX.
+        file_size (tuple): Minimum and maximum file size in characters.
+        max_depth (int): Maximum directory nesting depth.
+        seed (int): Random seed, so the same arguments always produce the same repository.
+
+    Returns:
+        dict: Summary of what was generated.
+    """
+    rng = random.Random(seed)
+    language_mix = language_mix or DEFAULT_LANGUAGE_MIX
+    extensions, weights = zip(*language_mix.items())
+    directories = [""]
+    total_bytes = 0
+
+    for index in range(files):
+        if rng.random() < 0.2 and len(directories) < max(files // 10, 1):
+            parent = rng.choice(directories)
+            if parent.count(os.sep) + 1 < max_depth:
+                directories.append(os.path.join(parent, f"{rng.choice(WORDS)}_{len(directories)}"))
+        directory = os.path.join(path, rng.choice(directories))
+        os.makedirs(directory, exist_ok=True)
+
+        extension = rng.choices(extensions, weights)[0]
+        content = generate_file(rng, extension, rng.randint(*file_size))
+        with open(os.path.join(directory, f"{rng.choice(WORDS)}_{index}{extension}"), "w", encoding="utf-8") as f:
+            f.write(content)
+        total_bytes += len(content)
+
+    return {"path": path, "files": files, "directories": len(directories), "bytes": total_bytes,
+            "language_mix": dict(language_mix), "seed": seed}
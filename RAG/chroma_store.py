@@ -0,0 +1,57 @@
+import numpy as np
+
+from RAG.vector_store import VectorStore
+
+
+class ChromaStore(VectorStore):
+    """
+    Chroma backend, wrapping langchain's Chroma vector store.
+    """
+
+    def __init__(self, persist_directory, embedding, **kwargs):
+        from langchain.vectorstores import Chroma
+
+        self.persist_directory = persist_directory
+        self.embedding = embedding
+        self.collection_name = kwargs.get("collection_name", "langchain")
+        self.store = Chroma(collection_name=self.collection_name, embedding_function=embedding,
+                            persist_directory=persist_directory)
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        return self.store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids):
+        if ids:
+            self.store.delete(ids=ids)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        # Query embeddings may be NumPy arrays; Chroma expects a list of floats
+        embedding = np.asarray(embedding, dtype=np.float32).tolist()
+        return self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+    def reset(self):
+        """
+        Drop and recreate the collection instead of fetching and deleting every id.
+        """
+        from langchain.vectorstores import Chroma
+
+        self.store.delete_collection()
+        self.store = Chroma(collection_name=self.collection_name, embedding_function=self.embedding,
+                            persist_directory=self.persist_directory)
+
+    def drop(self):
+        """
+        Delete the collection without creating an empty one in its place.
+        """
+        self.store.delete_collection()
+
+    def persist(self):
+        # Chroma 0.4+ persists automatically; older versions need an explicit call
+        if hasattr(self.store, "persist"):
+            try:
+                self.store.persist()
+            except Exception as e:
+                print(f"Error persisting Chroma vectorstore: {e}")
+
+    def count(self):
+        return self.store._collection.count()
@@ -0,0 +1,200 @@
+import os
+import re
+import ast
+
+
+CODE_EXTENSIONS = {".py", ".java", ".js", ".rs", ".sh"}
+
+# Keywords whose statements look like method declarations, e.g. "else if (x) {" or "for (...) {"
+CONTROL_KEYWORDS = r"(?:if|else|for|while|do|switch|case|try|catch|finally|return|throw|new|assert)\b"
+
+# Lines that start a definition, per extension. The first non-empty group is used as the symbol name.
+DEFINITION_PATTERNS = {
+    ".java": re.compile(
+        r"^\s*(?:@\w+(?:\([^)]*\))?\s+)*(?:(?:public|private|protected|static|final|abstract|sealed|synchronized|native|default)\s+)*"
+        rf"(?:(?:class|interface|enum|record)\s+(\w+)|(?!{CONTROL_KEYWORDS})\w[\w<>\[\],.?\s]*\s+(?!{CONTROL_KEYWORDS})(\w+)\s*\([^;]*$"
+        r"|([A-Z]\w*)\s*\([^;]*$)"
+    ),
+    ".js": re.compile(
+        r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\s*\*?\s*(\w+)|class\s+(\w+)"
+        r"|(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>|\w+\s*=>))"
+    ),
+    ".rs": re.compile(
+        r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:(?:async|unsafe|const|extern\s+\"\w+\")\s+)*"
+        r"(?:fn|struct|enum|trait|impl|mod|union)\b(?:\s*<[^>]*>)?\s*(?:[\w:<>, ]+\s+for\s+)?(\w+)"
+    ),
+    ".sh": re.compile(r"^\s*(?:function\s+(\w+)|(\w+)\s*\(\s*\))"),
+}
+
+# Comment, doc comment and annotation lines that belong to the definition that follows them
+LEADING_LINE = re.compile(r"^\s*(?:#(?!!)|//|/\*|\*|@)")
+
+
+class CodeChunk:
+    def __init__(self, lines, start_line, symbol, symbol_type):
+        self.lines = lines
+        self.start_line = start_line
+        self.symbol = symbol
+        self.symbol_type = symbol_type
+
+    @property
+    def text(self):
+        return "".join(self.lines)
+
+    @property
+    def end_line(self):
+        return self.start_line + len(self.lines) - 1
+
+    def metadata(self):
+        return {"symbol": self.symbol, "symbol_type": self.symbol_type,
+                "start_line": self.start_line, "end_line": self.end_line}
+
+
+def split_code(content, file_path, max_chars=1000, min_chars=200):
+    """
+    Split source code into definition-level chunks without overlap.
+
+    Python files are split on the AST (top-level functions and classes, and methods of
+    classes that are too large); the other CODE_EXTENSIONS use a definition-boundary
+    heuristic. Small neighbouring chunks are merged so tiny helpers do not each cost
+    an embedding.
+
+    Returns:
+        list: (text, metadata) tuples, where metadata has symbol, symbol_type, start_line and end_line.
+    """
+    extension = os.path.splitext(file_path)[1]
+    lines = content.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    chunks = None
+    if extension == ".py":
+        chunks = _split_python(lines, content, max_chars)
+    if chunks is None:
+        pattern = DEFINITION_PATTERNS.get(extension)
+        chunks = _split_by_definitions(lines, 1, pattern, max_chars) if pattern else _split_lines(lines, 1, "", "text", max_chars)
+
+    chunks = _merge_small(chunks, max_chars, min_chars)
+    return [(chunk.text, chunk.metadata()) for chunk in chunks if chunk.text.strip()]
+
+
+def _split_lines(lines, start_line, symbol, symbol_type, max_chars):
+    """
+    Split lines into pieces of at most max_chars, breaking only between lines (unless a single line is longer).
+    """
+    chunks = []
+    current, current_start, size = [], start_line, 0
+    for offset, line in enumerate(lines):
+        if current and size + len(line) > max_chars:
+            chunks.append(CodeChunk(current, current_start, symbol, symbol_type))
+            current, current_start, size = [], start_line + offset, 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append(CodeChunk(current, current_start, symbol, symbol_type))
+    return chunks
+
+
+def _split_python(lines, content, max_chars):
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    def node_start(node):
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+    def split_body(body, first_line, last_line, prefix):
+        """
+        Split the statements in body (covering first_line..last_line) into chunks.
+        """
+        chunks = []
+        cursor = first_line
+        gap_symbol = prefix.rstrip(".") or "<module>"
+        gap_type = "class" if prefix else "module"
+        for node in body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            start, end = node_start(node), node.end_lineno
+            gap = lines[cursor - 1:start - 1]
+            if all(not line.strip() or line.lstrip().startswith("#") for line in gap):
+                # Blank lines and comments between definitions belong to the definition that follows
+                start = cursor
+            else:
+                chunks.extend(_split_lines(gap, cursor, gap_symbol, gap_type, max_chars))
+
+            symbol = f"{prefix}{node.name}"
+            symbol_type = "class" if isinstance(node, ast.ClassDef) else "function"
+            node_lines = lines[start - 1:end]
+            if sum(len(line) for line in node_lines) <= max_chars:
+                chunks.append(CodeChunk(node_lines, start, symbol, symbol_type))
+            elif isinstance(node, ast.ClassDef):
+                chunks.extend(split_body(node.body, start, end, f"{symbol}."))
+            else:
+                chunks.extend(_split_lines(node_lines, start, symbol, symbol_type, max_chars))
+            cursor = end + 1
+        if cursor <= last_line:
+            chunks.extend(_split_lines(lines[cursor - 1:last_line], cursor, gap_symbol, gap_type, max_chars))
+        return chunks
+
+    return split_body(tree.body, 1, len(lines), "")
+
+
+def _split_by_definitions(lines, start_line, pattern, max_chars, symbol="<module>"):
+    """
+    Split at the outermost definition lines; definitions that are still too large are split
+    again at the definitions nested inside them.
+    """
+    matches = []
+    for index, line in enumerate(lines):
+        match = pattern.match(line)
+        if match:
+            indent = len(line) - len(line.lstrip())
+            name = next((group for group in match.groups() if group), "")
+            matches.append((index, indent, name))
+
+    # When re-splitting a definition, only the definitions nested inside it are boundaries
+    if symbol != "<module>" and matches:
+        parent_indent = matches[0][1]
+        matches = [match for match in matches if match[1] > parent_indent]
+    if not matches:
+        return _split_lines(lines, start_line, symbol, "module" if symbol == "<module>" else "definition", max_chars)
+
+    outer_indent = min(indent for _, indent, _ in matches)
+    boundaries = []
+    for index, indent, name in matches:
+        if indent != outer_indent:
+            continue
+        # Attach comments, doc comments and annotations directly above the definition
+        while index > 0 and LEADING_LINE.match(lines[index - 1]) and (not boundaries or index - 1 > boundaries[-1][0]):
+            index -= 1
+        boundaries.append((index, name))
+
+    chunks = []
+    if boundaries[0][0] > 0:
+        chunks.extend(_split_lines(lines[:boundaries[0][0]], start_line, symbol, "module" if symbol == "<module>" else "definition", max_chars))
+    for position, (index, name) in enumerate(boundaries):
+        end = boundaries[position + 1][0] if position + 1 < len(boundaries) else len(lines)
+        segment = lines[index:end]
+        if sum(len(line) for line in segment) <= max_chars:
+            chunks.append(CodeChunk(segment, start_line + index, name, "definition"))
+        else:
+            chunks.extend(_split_by_definitions(segment, start_line + index, pattern, max_chars, symbol=name))
+    return chunks
+
+
+def _merge_small(chunks, max_chars, min_chars):
+    """
+    Merge neighbouring chunks while the accumulated chunk is smaller than min_chars.
+    """
+    merged = []
+    for chunk in chunks:
+        previous = merged[-1] if merged else None
+        if previous and len(previous.text) < min_chars and len(previous.text) + len(chunk.text) <= max_chars:
+            symbols = [symbol for symbol in (previous.symbol, chunk.symbol) if symbol]
+            merged[-1] = CodeChunk(previous.lines + chunk.lines, previous.start_line,
+                                   ", ".join(dict.fromkeys(symbols)), previous.symbol_type if previous.symbol_type == chunk.symbol_type else "mixed")
+        else:
+            merged.append(chunk)
+    return merged
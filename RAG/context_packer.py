@@ -0,0 +1,183 @@
+import numpy as np
+
+from context_builder import count_tokens, truncate_to_tokens
+from RAG.embedding import embed_documents_array
+
+
+def text_overlap(first, second, min_overlap=20, max_overlap=2000):
+    """
+    Length of the longest suffix of first that is also a prefix of second, or 0 if it is
+    shorter than min_overlap characters.
+    """
+    if len(second) < min_overlap:
+        return 0
+    head = second[:min_overlap]
+    start = first.find(head, max(len(first) - max_overlap, 0))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(head, start + 1)
+    return 0
+
+
+def _line_range(doc):
+    metadata = doc.metadata or {}
+    start, end = metadata.get("start_line"), metadata.get("end_line")
+    return (start, end) if isinstance(start, int) and isinstance(end, int) else None
+
+
+def _merge_line_chunks(documents):
+    """
+    Merge chunks with line ranges (code chunks) that overlap or touch, in line order.
+    """
+    blocks = []
+    for doc in sorted(documents, key=lambda doc: _line_range(doc)[0]):
+        start, end = _line_range(doc)
+        if blocks and start <= blocks[-1]["end"] + 1:
+            block = blocks[-1]
+            if end > block["end"]:
+                lines = doc.page_content.splitlines(keepends=True)
+                if block["text"] and not block["text"].endswith("\n"):
+                    block["text"] += "\n"
+                block["text"] += "".join(lines[block["end"] - start + 1:])
+                block["end"] = end
+            block["documents"].append(doc)
+            continue
+        blocks.append({"text": doc.page_content, "start": start, "end": end, "documents": [doc]})
+    return blocks
+
+
+def _merge_text_chunks(documents):
+    """
+    Merge chunks without line ranges whose text overlaps, and drop chunks contained in another.
+    """
+    blocks = []
+    for doc in documents:
+        content = doc.page_content
+        for block in blocks:
+            if content in block["text"]:
+                break
+            if block["text"] in content:
+                block["text"] = content
+                break
+            overlap = text_overlap(block["text"], content)
+            if overlap:
+                block["text"] += content[overlap:]
+                break
+            overlap = text_overlap(content, block["text"])
+            if overlap:
+                block["text"] = content + block["text"][overlap:]
+                break
+        else:
+            blocks.append({"text": content, "documents": []})
+            block = blocks[-1]
+        block["documents"].append(doc)
+    return blocks
+
+
+def merge_chunks(documents):
+    """
+    Merge chunks of the same file_path that overlap or are adjacent into one document each,
+    dropping duplicates. Files keep the order of their first chunk in documents.
+
+    Returns:
+        list: langchain Documents; merged ones have merged_chunks and, for code, the merged line range in their metadata.
+    """
+    from langchain.schema import Document
+
+    by_file = {}
+    for doc in documents:
+        by_file.setdefault(str((doc.metadata or {}).get("file_path") or (doc.metadata or {}).get("source", "")), []).append(doc)
+
+    merged = []
+    for file_documents in by_file.values():
+        line_chunks = [doc for doc in file_documents if _line_range(doc)]
+        text_chunks = [doc for doc in file_documents if not _line_range(doc)]
+        blocks = (_merge_line_chunks(line_chunks) if line_chunks else []) + _merge_text_chunks(text_chunks)
+        for block in blocks:
+            if len(block["documents"]) == 1:
+                merged.append(block["documents"][0])
+                continue
+            metadata = dict(block["documents"][0].metadata or {})
+            metadata["merged_chunks"] = len(block["documents"])
+            if "start" in block:
+                metadata["start_line"], metadata["end_line"] = block["start"], block["end"]
+            merged.append(Document(page_content=block["text"], metadata=metadata))
+    return merged
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into the context of a RAG prompt.
+
+    Candidates are ordered by maximal marginal relevance (lambda_mult trades relevance to
+    the query against similarity to the chunks already chosen), then taken in that order
+    for as long as the context, after merging overlapping and adjacent chunks of the same
+    file, fits the token budget. So the number of chunks adapts to their size instead of
+    being a fixed k, and text repeated by the chunk overlap is sent only once.
+    """
+
+    def __init__(self, **kwargs):
+        self.lambda_mult = kwargs.get("lambda_mult", 0.7)
+        self.max_chunks = kwargs.get("max_chunks", 20)
+        self.separator = kwargs.get("separator", "\n\n")
+
+    def mmr_order(self, documents, embedding, query_embedding=None):
+        """
+        Indices of documents in maximal marginal relevance order. Without a query embedding,
+        the documents' own order stands in for their relevance.
+        """
+        vectors = embed_documents_array(embedding, [doc.page_content for doc in documents])
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if query_embedding is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            relevance = vectors @ (query / max(np.linalg.norm(query), 1e-12))
+        else:
+            relevance = 1.0 - np.arange(len(documents)) / len(documents)
+        similarity = vectors @ vectors.T
+
+        order = [int(np.argmax(relevance))]
+        remaining = [index for index in range(len(documents)) if index != order[0]]
+        while remaining:
+            redundancy = similarity[np.ix_(remaining, order)].max(axis=1)
+            scores = self.lambda_mult * relevance[remaining] - (1 - self.lambda_mult) * redundancy
+            order.append(remaining.pop(int(np.argmax(scores))))
+        return order
+
+    def join(self, documents):
+        return self.separator.join(doc.page_content for doc in documents)
+
+    def pack(self, documents, budget, embedding, query_embedding=None):
+        """
+        Choose and merge documents to fill at most budget tokens.
+
+        Returns:
+            dict: {"context", "documents", "candidates", "selected", "tokens", "tokens_unpacked", "tokens_saved"}
+        """
+        result = {"context": "", "documents": [], "candidates": len(documents), "selected": 0,
+                  "tokens": 0, "tokens_unpacked": 0, "tokens_saved": 0}
+        if not documents:
+            return result
+
+        order = self.mmr_order(documents, embedding, query_embedding) if len(documents) > 1 else [0]
+        selected = []
+        for index in order:
+            if len(selected) >= self.max_chunks:
+                break
+            candidate = selected + [documents[index]]
+            if count_tokens(self.join(merge_chunks(candidate))) <= budget:
+                selected = candidate
+
+        if selected:
+            packed = merge_chunks(selected)
+            context = self.join(packed)
+            result["tokens_unpacked"] = count_tokens(self.join(selected))
+        else:
+            # Even the most relevant chunk alone is over budget, so it is truncated
+            selected = packed = [documents[order[0]]]
+            context = truncate_to_tokens(packed[0].page_content, budget)
+            result["tokens_unpacked"] = count_tokens(context)
+
+        result.update(context=context, documents=packed, selected=len(selected), tokens=count_tokens(context))
+        result["tokens_saved"] = max(result["tokens_unpacked"] - result["tokens"], 0)
+        return result
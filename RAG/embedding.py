@@ -1,13 +1,118 @@
+import threading
 
-from sentence_transformers import SentenceTransformer
-from langchain.embeddings.base import Embeddings
+import numpy as np
 
-class SentenceTransformerEmbeddings(Embeddings):
-    def __init__(self, model_name):
+from RAG.embedding_cache import EmbeddingCache
+from tracing import tracer
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+
+
+class SentenceTransformerEmbeddings:
+    """
+    Embeddings backed by sentence-transformers and the on-disk embedding cache. It has the
+    embed_documents/embed_query interface of langchain embeddings without subclassing them,
+    so importing this module does not import langchain.
+
+    The *_array methods return contiguous float32 NumPy arrays and are what the FAISS
+    backend uses; embed_documents and embed_query convert to Python lists only for callers
+    that need langchain's list interface, such as Chroma.
+    """
+
+    def __init__(self, model_name, cache_dir="embedding_cache", max_cache_entries=200_000, batch_size=32):
+        # Imported here so that importing this module does not pull in torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        # Texts encoded per forward pass
+        self.batch_size = batch_size
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(cache_dir, model_name, self.dim, max_entries=max_cache_entries)
+
+    def encode(self, texts):
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True).astype(np.float32, copy=False)
+
+    def embed_documents_array(self, texts):
+        """
+        Embed texts into a (len(texts), dim) float32 array, encoding only those that are not
+        already in the embedding cache.
+        """
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return vectors
+        if self.cache is None:
+            with tracer.span("embedding.encode", model=self.model_name, texts=len(texts)):
+                vectors[:] = self.encode(texts)
+            return vectors
+
+        keys = [self.cache.key_for(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Encode each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            with tracer.span("embedding.encode", model=self.model_name, texts=len(missing), cached=len(cached)):
+                encoded = self.encode(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), encoded)
+            self.cache.maybe_flush()
+            cached.update(zip(missing.keys(), encoded))
+
+        for row, key in enumerate(keys):
+            vectors[row] = cached[key]
+        return vectors
+
+    def embed_query_array(self, text):
+        return self.encode([text])[0]
 
     def embed_documents(self, texts):
-        return self.model.encode(texts, convert_to_tensor=False).tolist()
+        return self.embed_documents_array(texts).tolist()
 
     def embed_query(self, text):
-        return self.model.encode([text], convert_to_tensor=False)[0].tolist()
\ No newline at end of file
+        return self.embed_query_array(text).tolist()
+
+
+def embed_documents_array(embedding, texts):
+    """
+    Embed texts as one float32 array, skipping Python lists when the embedding model supports it.
+    """
+    if hasattr(embedding, "embed_documents_array"):
+        return embedding.embed_documents_array(texts)
+    vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    return vectors if texts else vectors.reshape(0, 0)
+
+
+def flush_embedding_cache(embedding):
+    """
+    Write the embedding model's cache to disk, e.g. at the end of an indexing run.
+    """
+    cache = getattr(embedding, "cache", None)
+    if cache is not None:
+        cache.flush()
+
+
+def embed_query_array(embedding, text):
+    if hasattr(embedding, "embed_query_array"):
+        return embedding.embed_query_array(text)
+    return np.asarray(embedding.embed_query(text), dtype=np.float32)
+
+
+def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL, batch_size=None):
+    """
+    Return the process-wide embedding model for model_name, loading it on first use.
+    batch_size, if given, sets the number of texts it encodes per forward pass.
+    """
+    with _shared_models_lock:
+        if model_name not in _shared_models:
+            _shared_models[model_name] = SentenceTransformerEmbeddings(model_name)
+        if batch_size:
+            _shared_models[model_name].batch_size = batch_size
+        return _shared_models[model_name]
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed cache of embedding vectors.
+
+    Vectors live in a memory-mapped float32 array of fixed capacity and a small JSON
+    index maps each key (model name + text hash) to its row. When the cache is full
+    the least recently used row is overwritten. Every row also stores the key it holds,
+    which is checked on read, so an index saved before a row was reused never returns
+    another text's vector.
+
+    Rewriting the index is proportional to the cache size, so new entries are written to
+    disk by maybe_flush() at most every flush_interval seconds, and by flush().
+    """
+
+    def __init__(self, cache_dir, model_name, dim, max_entries=200_000, flush_interval=60):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_flush = time.time()
+
+        model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        os.makedirs(cache_dir, exist_ok=True)
+        self.vectors_path = os.path.join(cache_dir, f"{model_key}-{dim}.f32")
+        self.keys_path = os.path.join(cache_dir, f"{model_key}-{dim}.keys")
+        self.index_path = os.path.join(cache_dir, f"{model_key}-{dim}.index.json")
+
+        self.index = OrderedDict()
+        self.vectors = None
+        self.keys = None
+        self._open()
+
+    def _open(self):
+        """
+        Open the existing cache files, or create new ones if they are missing or were
+        written with a different capacity.
+        """
+        index = None
+        if all(os.path.exists(path) for path in (self.index_path, self.vectors_path, self.keys_path)):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable embedding cache index: {e}")
+
+        if index and index.get("dim") == self.dim and index.get("max_entries") == self.max_entries:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+            self.keys = np.memmap(self.keys_path, dtype=np.uint8, mode="r+", shape=(self.max_entries, 32))
+            self.index = OrderedDict((key, slot) for key, slot in index.get("entries", []))
+        else:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=(self.max_entries, self.dim))
+            self.keys = np.memmap(self.keys_path, dtype=np.uint8, mode="w+", shape=(self.max_entries, 32))
+            self.index = OrderedDict()
+
+    def key_for(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Return {key: vector} for every key that is cached, marking them as recently used.
+        """
+        found = {}
+        with self.lock:
+            for key in keys:
+                slot = self.index.get(key)
+                if slot is None:
+                    continue
+                if self.keys[slot].tobytes() != bytes.fromhex(key):
+                    # The row was reused after the index was saved
+                    del self.index[key]
+                    continue
+                self.index.move_to_end(key)
+                found[key] = np.array(self.vectors[slot])
+        return found
+
+    def put_many(self, keys, vectors):
+        """
+        Store vectors for keys, evicting least recently used entries when full.
+        """
+        with self.lock:
+            for key, vector in zip(keys, vectors):
+                slot = self.index.get(key)
+                if slot is None:
+                    if len(self.index) < self.max_entries:
+                        slot = len(self.index)
+                    else:
+                        _, slot = self.index.popitem(last=False)
+                # Cleared first, so a row caught half written reads as a miss
+                self.keys[slot] = 0
+                self.vectors[slot] = vector
+                self.keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self.index[key] = slot
+                self.index.move_to_end(key)
+            self.dirty = True
+
+    def maybe_flush(self):
+        """
+        Flush if there are new entries and flush_interval seconds have passed since the last flush.
+        """
+        if self.dirty and time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Persist the vector array and the key index.
+        """
+        with self.lock:
+            self.vectors.flush()
+            self.keys.flush()
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "model_name": self.model_name,
+                    "dim": self.dim,
+                    "max_entries": self.max_entries,
+                    "entries": list(self.index.items()),
+                }, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+            self.last_flush = time.time()
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,263 @@
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from RAG.vector_store import VectorStore, matches_filter
+from RAG.embedding import embed_documents_array
+
+
+class VectorFile:
+    """
+    Full-precision float32 vectors on disk, one row per FAISS int id, read through a memory map.
+    Rows of deleted ids stay in the file until the store is reset.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self.mmap = None
+
+    def write(self, first_id, vectors):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+            f.seek(first_id * self.dim * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            # Rows written after the last persist of a crashed run are overwritten, not kept
+            f.truncate()
+        self.mmap = None
+
+    def read(self, int_ids):
+        if self.mmap is None:
+            self.mmap = np.memmap(self.path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        return np.asarray(self.mmap[np.asarray(int_ids, dtype=np.int64)])
+
+    def remove(self):
+        self.mmap = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FaissStore(VectorStore):
+    """
+    FAISS backend. Vectors live in a (squared L2) index wrapped in an id map, texts and
+    metadata in a pickled side file.
+
+    By default the index is exact and stores float32 vectors. With vector_dtype "float16"
+    or "int8" it stores scalar-quantized codes instead, 2x or 4x smaller, and keeps the
+    float32 vectors in a memory-mapped side file: searches fetch rescore_factor times more
+    candidates from the compact index and rank them by their exact distances, so only the
+    rows of those candidates are read from disk. The int8 quantizer is trained on the
+    vectors stored so far and retrained whenever the collection has doubled since.
+
+    A persisted index is opened memory-mapped and read-only, so a cold start only maps the
+    file instead of reading it; it is copied into memory on the first write.
+    """
+
+    INDEX_FILE = "faiss.index"
+    DOCSTORE_FILE = "faiss_docstore.pkl"
+    VECTORS_FILE = "faiss_vectors.f32"
+    VECTOR_DTYPES = ("float32", "float16", "int8")
+
+    def __init__(self, persist_directory, embedding, **kwargs):
+        import faiss
+
+        self.faiss = faiss
+        # Each named collection gets its own directory, so it can be dropped on its own
+        collection_name = kwargs.get("collection_name")
+        self.persist_directory = os.path.join(persist_directory, "faiss", collection_name) if collection_name else persist_directory
+        self.embedding = embedding
+        self.index_path = os.path.join(self.persist_directory, kwargs.get("index_file", self.INDEX_FILE))
+        self.docstore_path = os.path.join(self.persist_directory, kwargs.get("docstore_file", self.DOCSTORE_FILE))
+        self.vectors_path = os.path.join(self.persist_directory, self.VECTORS_FILE)
+        self.vector_dtype = kwargs.get("vector_dtype", "float32")
+        if self.vector_dtype not in self.VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype {self.vector_dtype}, expected one of {', '.join(self.VECTOR_DTYPES)}")
+        self.rescore_factor = kwargs.get("rescore_factor", 4)
+        self.lock = threading.RLock()
+
+        self.index = None
+        self.mmapped = False
+        self.documents = {}  # int id -> (string id, text, metadata)
+        self.id_map = {}  # string id -> int id
+        self.next_id = 0
+        self.vector_file = None
+        # Number of vectors the int8 quantizer was trained on
+        self.trained_on = 0
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.docstore_path)):
+            return
+        with open(self.docstore_path, "rb") as f:
+            data = pickle.load(f)
+        self.documents = data["documents"]
+        self.next_id = data["next_id"]
+        # An existing collection keeps the storage it was built with
+        if data.get("vector_dtype", "float32") != self.vector_dtype:
+            print(f"{self.persist_directory} stores {data.get('vector_dtype', 'float32')} vectors, not {self.vector_dtype}")
+            self.vector_dtype = data.get("vector_dtype", "float32")
+        self.trained_on = data.get("trained_on", 0)
+        if self.vector_dtype != "float32":
+            self.vector_file = VectorFile(self.vectors_path, data["dim"])
+        self.id_map = {string_id: int_id for int_id, (string_id, _, _) in self.documents.items()}
+        try:
+            self.index = self.faiss.read_index(self.index_path, self.faiss.IO_FLAG_MMAP | self.faiss.IO_FLAG_READ_ONLY)
+            self.mmapped = True
+        except RuntimeError as e:
+            print(f"Memory-mapping {self.index_path} failed, loading it into memory: {e}")
+            self.index = self.faiss.read_index(self.index_path)
+
+    def _new_index(self, dim):
+        if self.vector_dtype == "float32":
+            return self.faiss.IndexIDMap2(self.faiss.IndexFlatL2(dim))
+        quantizer_type = self.faiss.ScalarQuantizer.QT_fp16 if self.vector_dtype == "float16" else self.faiss.ScalarQuantizer.QT_8bit
+        return self.faiss.IndexIDMap2(self.faiss.IndexScalarQuantizer(dim, quantizer_type, self.faiss.METRIC_L2))
+
+    def _writable_index(self, dim):
+        if self.index is None:
+            self.index = self._new_index(dim)
+            if self.vector_dtype != "float32":
+                self.vector_file = VectorFile(self.vectors_path, dim)
+        elif self.mmapped:
+            self.index = self.faiss.read_index(self.index_path)
+            self.mmapped = False
+        return self.index
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"faiss-{self.next_id + offset}" for offset in range(len(texts))]
+        vectors = embed_documents_array(self.embedding, texts)
+
+        with self.lock:
+            # Re-adding an existing id replaces it
+            self.delete([chunk_id for chunk_id in ids if chunk_id in self.id_map])
+            index = self._writable_index(vectors.shape[1])
+            int_ids = np.arange(self.next_id, self.next_id + len(texts), dtype=np.int64)
+            if self.vector_file is not None:
+                self.vector_file.write(self.next_id, vectors)
+            if not index.is_trained:
+                index.train(vectors)
+                self.trained_on = len(vectors)
+            index.add_with_ids(vectors, int_ids)
+            for int_id, chunk_id, text, metadata in zip(int_ids.tolist(), ids, texts, metadatas):
+                self.documents[int_id] = (chunk_id, text, metadata)
+                self.id_map[chunk_id] = int_id
+            self.next_id += len(texts)
+            self.dirty = True
+            if self.vector_dtype == "int8" and index.ntotal >= 2 * self.trained_on:
+                self._retrain()
+        return ids
+
+    def _retrain(self):
+        """
+        Rebuild the int8 index with a quantizer trained on every stored vector, so that its
+        value ranges cover vectors added after the first batch.
+        """
+        int_ids = np.fromiter(self.documents.keys(), dtype=np.int64, count=len(self.documents))
+        vectors = self.vector_file.read(int_ids)
+        index = self._new_index(self.vector_file.dim)
+        index.train(vectors)
+        index.add_with_ids(vectors, int_ids)
+        self.index = index
+        self.trained_on = len(int_ids)
+
+    def delete(self, ids):
+        with self.lock:
+            int_ids = [self.id_map.pop(chunk_id) for chunk_id in ids if chunk_id in self.id_map]
+            if not int_ids or self.index is None:
+                return
+            index = self._writable_index(self.index.d)
+            index.remove_ids(np.asarray(int_ids, dtype=np.int64))
+            for int_id in int_ids:
+                self.documents.pop(int_id, None)
+            self.dirty = True
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        from langchain.schema import Document
+
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+            # Over-fetch when filtering, widening the search until enough documents match
+            fetch = k if not filter else min(self.index.ntotal, k * 4)
+            while True:
+                distances, int_ids = self._search(query, fetch)
+                results = []
+                for distance, int_id in zip(distances, int_ids):
+                    if int_id < 0 or int_id not in self.documents:
+                        continue
+                    _, text, metadata = self.documents[int_id]
+                    if matches_filter(metadata, filter):
+                        results.append((Document(page_content=text, metadata=dict(metadata or {})), float(distance)))
+                if len(results) >= k or fetch >= self.index.ntotal:
+                    return results[:k]
+                fetch = min(self.index.ntotal, fetch * 4)
+
+    def _search(self, query, fetch):
+        """
+        The fetch nearest ids and their distances. Compact indexes are searched for more
+        candidates, which are then ranked by their full-precision distances.
+        """
+        if self.vector_file is None:
+            distances, int_ids = self.index.search(query, fetch)
+            return distances[0], int_ids[0]
+        _, int_ids = self.index.search(query, min(self.index.ntotal, fetch * self.rescore_factor))
+        int_ids = int_ids[0][int_ids[0] >= 0]
+        distances = np.square(self.vector_file.read(int_ids) - query[0]).sum(axis=1)
+        order = np.argsort(distances)[:fetch]
+        return distances[order], int_ids[order]
+
+    def index_bytes(self):
+        """
+        Memory taken by the vector codes of the index, excluding the full-precision side file.
+        """
+        with self.lock:
+            return 0 if self.index is None else self.index.sa_code_size() * self.index.ntotal
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+            self.mmapped = False
+            self.documents = {}
+            self.id_map = {}
+            self.next_id = 0
+            self.trained_on = 0
+            if self.vector_file is not None:
+                self.vector_file.remove()
+                self.vector_file = None
+            for path in (self.index_path, self.docstore_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.dirty = False
+
+    def drop(self):
+        self.reset()
+        # The collection's own directory goes too, unless something else was put in it
+        try:
+            os.rmdir(self.persist_directory)
+        except OSError:
+            pass
+
+    def persist(self):
+        with self.lock:
+            if not self.dirty or self.index is None:
+                return
+            os.makedirs(self.persist_directory, exist_ok=True)
+            self.faiss.write_index(self.index, f"{self.index_path}.tmp")
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            with open(f"{self.docstore_path}.tmp", "wb") as f:
+                pickle.dump({"documents": self.documents, "next_id": self.next_id, "vector_dtype": self.vector_dtype,
+                             "dim": self.index.d, "trained_on": self.trained_on}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{self.docstore_path}.tmp", self.docstore_path)
+            self.dirty = False
+
+    def count(self):
+        with self.lock:
+            return 0 if self.index is None else self.index.ntotal
@@ -0,0 +1,212 @@
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+
+from tracing import tracer
+
+
+class IndexingJob:
+    """
+    One background indexing run of a repository, with its progress so far.
+
+    status is one of "queued", "running", "done", "failed" or "cancelled".
+    """
+
+    def __init__(self, repo_path, active_repositories):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.repo_path = os.path.abspath(repo_path)
+        self.active_repositories = active_repositories
+        self.status = "queued"
+        self.stats = {}
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the job has finished. Returns False on timeout.
+        """
+        return self.finished.wait(timeout)
+
+    def update(self, stats):
+        self.stats = stats
+
+    def progress(self):
+        """
+        Files done, chunks embedded and throughput so far.
+        """
+        stats = self.stats
+        files_done = stats.get("files_indexed", 0) + stats.get("files_unchanged", 0) + stats.get("files_failed", 0)
+        seconds = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "repository": self.repo_path,
+            "status": self.status,
+            "files_done": files_done,
+            "files_total": stats.get("files_total"),
+            "chunks_embedded": stats.get("chunks_added", 0),
+            "seconds": round(seconds, 3),
+            "files_per_second": round(files_done / seconds, 2) if seconds else 0.0,
+            "chunks_per_second": round(stats.get("chunks_added", 0) / seconds, 2) if seconds else 0.0,
+            "error": self.error,
+        }
+
+    def describe(self):
+        """
+        One-line progress report for the chat.
+        """
+        progress = self.progress()
+        total = progress["files_total"] if progress["files_total"] is not None else "?"
+        description = (f"Job {self.job_id} ({self.repo_path}): {self.status}, {progress['files_done']}/{total} files, "
+                       f"{progress['chunks_embedded']} chunks embedded, {progress['chunks_per_second']} chunks/s")
+        if self.error:
+            description += f", error: {self.error}"
+        return description
+
+
+class IndexingJobQueue:
+    """
+    Runs indexing jobs in background worker threads so that indexing a large repository
+    does not block the chat. index_repository(repo_path, active_repositories, progress=, cancel=)
+    does the actual work; it is RAGHandler.update_vectorstore.
+
+    A repository with a queued or running job is not queued again; submitting it returns
+    the existing job. Only the latest max_finished finished jobs are remembered.
+    """
+
+    def __init__(self, index_repository, **kwargs):
+        self.index_repository = index_repository
+        self.workers = kwargs.get("workers", 1)
+        self.max_finished = kwargs.get("max_finished", 50)
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()  # job id -> job, in submission order
+        self.pending = queue.Queue()
+        self.threads = []
+
+    def _start_workers(self):
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"indexing-{len(self.threads)}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, repo_path, active_repositories):
+        """
+        Queue the indexing of a repository and return its job right away.
+        """
+        repo_path = os.path.abspath(repo_path)
+        with self.lock:
+            for job in self.jobs.values():
+                if job.active and job.repo_path == repo_path:
+                    if repo_path not in active_repositories:
+                        active_repositories.append(repo_path)
+                    return job
+            job = IndexingJob(repo_path, active_repositories)
+            self.jobs[job.job_id] = job
+            self._forget_finished()
+            self._start_workers()
+        self.pending.put(job)
+        print(f"Queued indexing job {job.job_id} for {repo_path}")
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self, repo_path=None, active_only=False):
+        """
+        Jobs in submission order, optionally only those of repo_path or those still queued or running.
+        """
+        repo_path = os.path.abspath(repo_path) if repo_path else None
+        with self.lock:
+            return [job for job in self.jobs.values()
+                    if (repo_path is None or job.repo_path == repo_path) and (job.active or not active_only)]
+
+    def cancel(self, job_id=None, repo_path=None, wait=False):
+        """
+        Cancel one job, the jobs of repo_path, or every active job if neither is given.
+        Queued jobs finish right away; with wait, this blocks until the cancelled jobs that
+        were already running have stopped, but never on jobs of other repositories.
+
+        Returns:
+            list: The jobs that were cancelled.
+        """
+        if job_id:
+            job = self.get(job_id)
+            jobs = [job] if job is not None and job.active else []
+        else:
+            jobs = self.list(repo_path, active_only=True)
+        running = []
+        for job in jobs:
+            with self.lock:
+                job.cancel()
+                if job.status == "queued":
+                    self._finish(job, "cancelled")
+                else:
+                    running.append(job)
+        if wait:
+            for job in running:
+                job.wait()
+        return jobs
+
+    def _work(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.finished.set()
+
+    def _run(self, job):
+        with self.lock:
+            # A job cancelled while queued has finished already
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+        with tracer.span("indexing_job", job=job.job_id, repository=job.repo_path) as span:
+            try:
+                stats = self.index_repository(job.repo_path, job.active_repositories,
+                                              progress=job.update, cancel=job.cancel_event)
+                job.update(stats)
+                job.status = "cancelled" if stats.get("cancelled") else "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"Indexing job {job.job_id} for {job.repo_path} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                span.set(**job.progress())
+                job.finished.set()
+        print(job.describe())
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
+
+    def close(self, timeout=None):
+        """
+        Cancel every job and stop the workers.
+        """
+        for job in self.cancel():
+            job.wait(timeout)
+        for _ in self.threads:
+            self.pending.put(None)
+        self.threads = []
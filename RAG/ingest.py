@@ -0,0 +1,296 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from RAG.manifest import hash_content, chunk_ids_for
+from RAG.chunker import split_code, CODE_EXTENSIONS
+from tracing import tracer
+
+
+_DONE = object()
+
+
+def load_and_split(file_path, known_hash, chunk_size, chunk_overlap):
+    """
+    Read one file and split it into chunks. Runs inside a worker process, so it only
+    returns plain data.
+
+    Returns:
+        dict: {"status": "unchanged" | "changed" | "error", "seconds", ...}
+    """
+    start_time = time.perf_counter()
+    result = _load_and_split(file_path, known_hash, chunk_size, chunk_overlap)
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+def _load_and_split(file_path, known_hash, chunk_size, chunk_overlap):
+    try:
+        stat = os.stat(file_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except Exception as e:
+        return {"status": "error", "file_path": file_path, "error": str(e)}
+
+    content_hash = hash_content(content)
+    if content_hash == known_hash:
+        return {"status": "unchanged", "file_path": file_path, "stat": stat}
+
+    metadata = {
+        "source": file_path,
+        "file_path": file_path,
+        "doc_type": os.path.splitext(file_path)[-1][1:],
+        "file_name": os.path.basename(file_path),
+    }
+    if os.path.splitext(file_path)[1] in CODE_EXTENSIONS:
+        # Source files are split on definitions, without overlap, and carry symbol metadata
+        code_chunks = split_code(content, file_path, max_chars=chunk_size)
+        texts = [text for text, _ in code_chunks]
+        metadatas = [{**metadata, **chunk_metadata} for _, chunk_metadata in code_chunks]
+    else:
+        from langchain.text_splitter import CharacterTextSplitter
+
+        text_splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        texts = text_splitter.split_text(content)
+        metadatas = [dict(metadata) for _ in texts]
+
+    return {
+        "status": "changed",
+        "file_path": file_path,
+        "stat": stat,
+        "sha256": content_hash,
+        "texts": texts,
+        "metadatas": metadatas,
+    }
+
+
+class IngestionPipeline:
+    """
+    Staged indexing pipeline: files are read and chunked in a worker pool, results flow
+    through a bounded queue to a single writer, and the writer embeds and stores the
+    chunks in fixed-size batches as they arrive. Memory stays bounded by the queue size
+    and the batch size rather than by the size of the repository.
+
+    Every batch is searchable as soon as it is written, so the index can be queried while a
+    run is still in progress. progress, if given, is called with a copy of the statistics
+    after every file and batch; setting the cancel event stops the run after committing
+    what has been read so far.
+
+    The manifest is saved at most every checkpoint_seconds and when the run ends, each time
+    right after commit() (if given) has written the stores to disk. A run that dies midway
+    therefore never leaves files in the manifest whose chunks were not saved.
+    """
+
+    def __init__(self, vectorstore, manifest, **kwargs):
+        self.vectorstore = vectorstore
+        self.manifest = manifest
+        self.lexical_index = kwargs.get("lexical_index")
+        self.workers = kwargs.get("workers") or os.cpu_count() or 1
+        self.use_processes = kwargs.get("use_processes", True)
+        self.batch_size = kwargs.get("batch_size", 256)
+        self.queue_size = kwargs.get("queue_size", 4 * self.workers)
+        self.chunk_size = kwargs.get("chunk_size", 1000)
+        self.chunk_overlap = kwargs.get("chunk_overlap", 200)
+        self.progress = kwargs.get("progress")
+        self.cancel = kwargs.get("cancel")
+        self.commit = kwargs.get("commit")
+        self.checkpoint_seconds = kwargs.get("checkpoint_seconds", 30)
+        self.last_checkpoint = time.time()
+
+        self.texts, self.metadatas, self.ids = [], [], []
+        self.pending_files = []
+        self.ids_to_delete = []
+        self.stats = {}
+
+    def run(self, files, file_stats=None, truncated=False):
+        """
+        Index the given absolute file paths and return ingestion statistics.
+        file_stats optionally maps paths to the os.stat results taken while scanning.
+        truncated means files is only part of the repository (the scan stopped early), so
+        files missing from it are kept in the index instead of being deleted as removed.
+        """
+        self.start_time = time.time()
+        self.stats = {"files_total": len(files), "files_indexed": 0, "files_unchanged": 0,
+                      "files_failed": 0, "chunks_added": 0, "chunks_deleted": 0, "cancelled": False}
+
+        if truncated:
+            print("Repository scan was truncated, keeping indexed files that were not scanned")
+        else:
+            for file_path in self.manifest.stale_files(files):
+                self.ids_to_delete.extend(self.manifest.forget(file_path))
+
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(files, file_stats or {}, results, stop), daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                if self.cancel is not None and self.cancel.is_set():
+                    self.stats["cancelled"] = True
+                    break
+                try:
+                    result = results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if result is _DONE:
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                self._consume(result)
+                self._report()
+            self._flush(final=True)
+            self._report()
+        finally:
+            stop.set()
+            producer.join()
+            self._checkpoint(force=True)
+
+        self.stats["seconds"] = round(time.time() - self.start_time, 3)
+        return self.stats
+
+    def _delete_pending(self):
+        """
+        Delete the chunks of changed and removed files, which the manifest has already forgotten.
+        """
+        if not self.ids_to_delete:
+            return
+        self.vectorstore.delete(ids=self.ids_to_delete)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(self.ids_to_delete)
+        self.stats["chunks_deleted"] += len(self.ids_to_delete)
+        self.ids_to_delete = []
+
+    def _checkpoint(self, force=False):
+        """
+        Commit the stores, then save the manifest, if checkpoint_seconds have passed since the last checkpoint.
+        """
+        if not force and time.time() - self.last_checkpoint < self.checkpoint_seconds:
+            return
+        with tracer.span("ingest.checkpoint", files=len(self.manifest.files)):
+            # The manifest no longer lists the chunks to delete, so they must be gone first
+            self._delete_pending()
+            if self.commit is not None:
+                self.commit()
+            self.manifest.save()
+        self.last_checkpoint = time.time()
+
+    def _report(self):
+        if self.progress is not None:
+            self.stats["seconds"] = round(time.time() - self.start_time, 3)
+            self.progress(dict(self.stats))
+
+    def _produce(self, files, file_stats, results, stop):
+        """
+        Submit changed files to the worker pool, keeping a bounded number in flight,
+        and hand the results to the writer in submission order.
+        """
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        if self.use_processes:
+            # Spawned, not forked: this runs in a worker thread of a process that already has
+            # other threads (UI, metrics, torch), whose locks a forked child would inherit
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            with executor:
+                in_flight = deque()
+                for file_path in files:
+                    if stop.is_set():
+                        break
+                    try:
+                        stat = file_stats.get(file_path) or os.stat(file_path)
+                    except OSError as e:
+                        put({"status": "error", "file_path": file_path, "error": str(e)})
+                        continue
+                    if self.manifest.is_unchanged(file_path, stat):
+                        put({"status": "skipped", "file_path": file_path})
+                        continue
+
+                    known_hash = self.manifest.files.get(file_path, {}).get("sha256")
+                    in_flight.append(executor.submit(load_and_split, file_path, known_hash,
+                                                     self.chunk_size, self.chunk_overlap))
+                    if len(in_flight) >= self.queue_size:
+                        put(in_flight.popleft().result())
+
+                while in_flight and not stop.is_set():
+                    put(in_flight.popleft().result())
+                for future in in_flight:
+                    future.cancel()
+        except BaseException as e:
+            put(e)
+        put(_DONE)
+
+    def _consume(self, result):
+        status = result["status"]
+        file_path = result["file_path"]
+        if "seconds" in result:
+            # Files are loaded in worker processes, which report their own timing
+            tracer.record("ingest.file", result["seconds"], file_path=file_path, status=status,
+                          chunks=len(result.get("texts", [])), error=result.get("error"))
+
+        if status == "error":
+            self.stats["files_failed"] += 1
+            print(f"Error loading file {file_path}: {result['error']}")
+            return
+        if status == "skipped":
+            self.stats["files_unchanged"] += 1
+            return
+        if status == "unchanged":
+            self.manifest.touch(file_path, result["stat"])
+            self.stats["files_unchanged"] += 1
+            return
+
+        self.ids_to_delete.extend(self.manifest.forget(file_path))
+        chunk_ids = chunk_ids_for(file_path, result["sha256"], len(result["texts"]))
+        self.texts.extend(result["texts"])
+        self.metadatas.extend(result["metadatas"])
+        self.ids.extend(chunk_ids)
+        self.pending_files.append([file_path, result["stat"], result["sha256"], chunk_ids, len(self.ids)])
+        self.stats["files_indexed"] += 1
+        self._flush()
+
+    def _flush(self, final=False):
+        """
+        Write full batches to the vector store. A file is recorded in the manifest only
+        once all of its chunks have been written.
+        """
+        if final or len(self.ids) >= self.batch_size:
+            self._delete_pending()
+
+        while len(self.ids) >= self.batch_size or (final and self.ids):
+            count = min(self.batch_size, len(self.ids))
+            with tracer.span("ingest.batch", chunks=count):
+                self.vectorstore.add_texts(texts=self.texts[:count], metadatas=self.metadatas[:count], ids=self.ids[:count])
+                if self.lexical_index is not None:
+                    self.lexical_index.add(self.ids[:count], self.texts[:count], self.metadatas[:count])
+            del self.texts[:count], self.metadatas[:count], self.ids[:count]
+            self.stats["chunks_added"] += count
+
+            still_pending = []
+            for pending in self.pending_files:
+                pending[4] -= count
+                if pending[4] <= 0:
+                    self.manifest.record(*pending[:4])
+                else:
+                    still_pending.append(pending)
+            self.pending_files = still_pending
+            self._checkpoint()
+            self._report()
+
+        if final:
+            # Files that produced no chunks (e.g. empty files) still belong in the manifest
+            for pending in self.pending_files:
+                self.manifest.record(*pending[:4])
+            self.pending_files = []
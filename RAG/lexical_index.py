@@ -0,0 +1,201 @@
+import os
+import re
+import math
+import pickle
+import threading
+from collections import Counter, defaultdict
+
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+# Something that looks like a code identifier rather than an English word
+IDENTIFIER_PATTERN = re.compile(r"`([^`]+)`|\b([A-Za-z_]\w*(?:_\w+|[a-z][A-Z]\w*|\.\w+)+|_\w+)\b")
+# Dotted abbreviations such as e.g. and i.e.
+ABBREVIATION_PATTERN = re.compile(r"^(?:\w\.)+\w$")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "does", "do", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "the", "this", "that", "to", "what", "when", "where", "which", "who", "why", "with",
+}
+
+
+def tokenize(text):
+    """
+    Tokenize text for code search. Every identifier is kept whole (lowercased) and also
+    split into its snake_case / camelCase / dotted parts.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        word = match.group(0)
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = [part for piece in re.split(r"[._]", word) for part in CAMEL_BOUNDARY.split(piece) if part]
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return [token for token in tokens if token not in STOPWORDS and len(token) > 1]
+
+
+def extract_identifiers(query):
+    """
+    Return identifiers mentioned in the query, e.g. `reset_vectorstore_data` or RAGHandler.chat.
+    """
+    identifiers = []
+    for quoted, bare in IDENTIFIER_PATTERN.findall(query):
+        identifier = (quoted or bare).strip().rstrip("()")
+        if identifier and not ABBREVIATION_PATTERN.match(identifier):
+            identifiers.append(identifier.lower())
+    return identifiers
+
+
+def names_symbol(identifiers, symbol):
+    """
+    True if one of the (lowercased) identifiers names the symbol of a chunk, e.g. chat or
+    raghandler.chat for RAGHandler.chat. Merged chunks list their symbols separated by commas.
+    """
+    names = [name.strip().lower() for name in str(symbol or "").split(",")]
+    return any(name == identifier or name.endswith(f".{identifier}") for name in names if name for identifier in identifiers)
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over the same chunks as the vector store.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self.clear()
+        if path:
+            self.load()
+
+    def clear(self):
+        with self.lock:
+            self.postings = defaultdict(dict)  # term -> {chunk id: term frequency}
+            self.documents = {}  # chunk id -> (text, metadata, token count)
+            self.total_length = 0
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            with self.lock:
+                self.postings = defaultdict(dict, data["postings"])
+                self.documents = data["documents"]
+                self.total_length = data["total_length"]
+        except Exception as e:
+            print(f"Ignoring unreadable lexical index {self.path}: {e}")
+            self.clear()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            data = {"postings": dict(self.postings), "documents": self.documents, "total_length": self.total_length}
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def add(self, ids, texts, metadatas):
+        with self.lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in self.documents:
+                    self._remove(chunk_id)
+                tokens = tokenize(text)
+                # Symbol names are searchable even when they appear only in the metadata
+                tokens.extend(tokenize(str((metadata or {}).get("symbol", ""))))
+                for term, frequency in Counter(tokens).items():
+                    self.postings[term][chunk_id] = frequency
+                self.documents[chunk_id] = (text, metadata, len(tokens))
+                self.total_length += len(tokens)
+
+    def delete(self, ids):
+        with self.lock:
+            for chunk_id in ids:
+                if chunk_id in self.documents:
+                    self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        text, metadata, length = self.documents.pop(chunk_id)
+        tokens = set(tokenize(text)) | set(tokenize(str((metadata or {}).get("symbol", ""))))
+        for term in tokens:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= length
+
+    def search(self, query, k=5, filter_fn=None):
+        """
+        BM25 search.
+
+        Returns:
+            list: (chunk id, score) pairs, best first.
+        """
+        with self.lock:
+            count = len(self.documents)
+            if not count:
+                return []
+            average_length = self.total_length / count
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    length = self.documents[chunk_id][2]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] += idf * frequency * (self.k1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            if filter_fn:
+                ranked = [item for item in ranked if filter_fn(self.documents[item[0]][1])]
+            return ranked[:k]
+
+    def lookup(self, identifiers, k=5, filter_fn=None):
+        """
+        Exact identifier lookup straight from the postings, without scoring the whole query.
+
+        Returns:
+            list: (chunk id, term frequency) pairs, best first.
+        """
+        with self.lock:
+            hits = Counter()
+            for identifier in identifiers:
+                for chunk_id, frequency in self.postings.get(identifier, {}).items():
+                    hits[chunk_id] += frequency
+            ranked = hits.most_common()
+            if filter_fn:
+                ranked = [item for item in ranked if filter_fn(self.documents[item[0]][1])]
+            return ranked[:k]
+
+    def get(self, chunk_id):
+        """
+        Return (text, metadata) of a chunk, or None if it has been deleted, e.g. by a re-index
+        since it was found.
+        """
+        with self.lock:
+            document = self.documents.get(chunk_id)
+        return document[:2] if document else None
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def reciprocal_rank_fusion(*ranked_lists, k=60):
+    """
+    Fuse ranked lists of ids into one ranking with reciprocal rank fusion.
+
+    Returns:
+        list: Ids ordered by fused score.
+    """
+    scores = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, item_id in enumerate(ranked):
+            scores[item_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
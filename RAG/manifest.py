@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+
+class IndexManifest:
+    """
+    Persisted record of what has been indexed for a single repository.
+
+    Every indexed file is stored as path -> {sha256, mtime, size, chunk_ids} so that
+    a re-index only has to embed new or changed files and can delete the chunks of
+    files that were modified or removed.
+    """
+
+    def __init__(self, manifest_dir, repo_path):
+        self.repo_path = os.path.abspath(repo_path)
+        repo_key = hashlib.sha1(self.repo_path.encode("utf-8")).hexdigest()[:16]
+        self.manifest_path = os.path.join(manifest_dir, f"{os.path.basename(self.repo_path) or 'root'}-{repo_key}.json")
+        self.files = {}
+        self.load()
+
+    def load(self):
+        """
+        Load the manifest from disk. A missing or corrupt manifest is treated as empty.
+        """
+        if not os.path.exists(self.manifest_path):
+            self.files = {}
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+            self.files = {}
+
+    def save(self):
+        """
+        Atomically write the manifest to disk.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"repository_path": self.repo_path, "files": self.files}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_unchanged(self, file_path, stat):
+        """
+        Cheap check that skips reading a file whose size and mtime match the manifest.
+        """
+        entry = self.files.get(file_path)
+        return bool(entry) and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+    def content_matches(self, file_path, content_hash):
+        entry = self.files.get(file_path)
+        return bool(entry) and entry.get("sha256") == content_hash
+
+    def touch(self, file_path, stat):
+        """
+        Refresh the stat fields of an entry whose content did not change.
+        """
+        entry = self.files[file_path]
+        entry["size"] = stat.st_size
+        entry["mtime"] = stat.st_mtime
+
+    def record(self, file_path, stat, content_hash, chunk_ids):
+        self.files[file_path] = {
+            "sha256": content_hash,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    def forget(self, file_path):
+        """
+        Drop a file from the manifest and return the chunk ids that belonged to it.
+        """
+        entry = self.files.pop(file_path, None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    def stale_files(self, current_files):
+        """
+        Files that are in the manifest but no longer present in the repository.
+        """
+        current = set(current_files)
+        return [path for path in self.files if path not in current]
+
+
+def hash_content(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def chunk_ids_for(file_path, content_hash, count):
+    """
+    Deterministic chunk ids so that the same file content always maps to the same ids.
+    """
+    path_key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+    return [f"{path_key}-{content_hash[:16]}-{i}" for i in range(count)]
@@ -1,84 +1,150 @@
 import os
 import json
-import requests
 import time
-
-from RAG.embedding import SentenceTransformerEmbeddings
-
-
-from langchain.vectorstores import Chroma
-from langchain.text_splitter import CharacterTextSplitter
-import glob
-from langchain.document_loaders import DirectoryLoader, TextLoader
-from langchain.schema import Document
-import gradio as gr
-from chromadb.config import Settings
-
+import threading
+
+from ollama_client import get_client
+from context_builder import ContextBuilder
+from startup import timer as startup_timer
+from tracing import tracer, TOKEN_BUCKETS
+from repo_scanner import RepositoryScanner
+from model_residency import canonical_system_prompt
+from RAG.embedding import get_embedding_model, embed_query_array, flush_embedding_cache, DEFAULT_EMBEDDING_MODEL
+from RAG.repository_collections import CollectionRegistry
+from RAG.ingest import IngestionPipeline
+from RAG.context_packer import ContextPacker
+from RAG.indexing_jobs import IndexingJobQueue
+from RAG.query_cache import LRUCache, normalize_query
+from RAG.lexical_index import extract_identifiers, names_symbol, reciprocal_rank_fusion
+from RAG.response_cache import SemanticResponseCache, fingerprint
+
+# The vector store backends and sentence-transformers are imported lazily in
+# initialize_vectorstore so that they do not slow down application startup.
+
+
+def document_sources(documents):
+    """
+    File paths the documents were retrieved from.
+    """
+    return [str((doc.metadata or {}).get("file_path") or (doc.metadata or {}).get("source", "")) for doc in documents]
 
 
 class RAGHandler:
     def __init__(self, **kwargs):
         self.model_url = kwargs.get("model_url", "http://localhost:11434/api/chat")
         self.model = kwargs.get("model", "llama3.2")
-        self.system_message = kwargs.get("system_message", """You are a helpful RAG assistant. 
+        self.system_message = canonical_system_prompt(kwargs.get("system_message", """You are a helpful RAG assistant. 
                                          Use retrival augment geberation only if the user message is relevant to anything stored in vector score. Don't hallucinate. 
-                                         Return the exact string 'VOID RAG RESPONSE', don;t add any explaination or string to it. This string will be compared in an if else statemnet, and the control will be transfered to default LLM repose if it is 'VOID RAG RESPONSE'. if the user messsage is not related to the retrieved documents or the retrieved document is dummy document with file_name dummy.txt
-                                         """)
+                                         Return the exact string 'VOID RAG RESPONSE', don;t add any explaination or string to it. This string will be compared in an if else statemnet, and the control will be transfered to default LLM repose if it is 'VOID RAG RESPONSE'. if the user messsage is not related to the retrieved documents.
+                                         """))
         self.db_name = kwargs.get("db_name", "developer_assistant_vectorstore")
-        self.vectorstore = None
-        
-
-        self.initialize_vectorstore()
+        self.manifest_dir = kwargs.get("manifest_dir", os.path.join(self.db_name, "manifests"))
+        self.ingest_options = {
+            "workers": kwargs.get("ingest_workers"),
+            "batch_size": kwargs.get("ingest_batch_size", 256),
+            "use_processes": kwargs.get("ingest_use_processes", True),
+        }
+        # Finds the files to index, skipping ignored, oversized and binary files
+        self.scanner = kwargs.get("scanner") or RepositoryScanner(
+            max_file_size=kwargs.get("max_file_size", 1024 * 1024),
+            max_total_size=kwargs.get("max_total_size", 256 * 1024 * 1024),
+        )
+        # Maximum vector distance (lower is closer) for a retrieved chunk to count as relevant
+        self.relevance_threshold = kwargs.get("relevance_threshold", 1.0)
+        self.retrieval_k = kwargs.get("retrieval_k", 5)
+        # Candidates retrieved for a RAG answer; the context packer picks from them what fits the budget
+        self.retrieval_candidates = max(kwargs.get("retrieval_candidates", 20), self.retrieval_k)
+        self.last_gate = None
+        self.client = get_client()
+        self.context_builder = ContextBuilder()
+        # Maximum number of tokens of retrieved context sent with a question
+        self.context_budget = kwargs.get("context_budget", 3000)
+        self.context_packer = ContextPacker(
+            lambda_mult=kwargs.get("mmr_lambda", 0.7),
+            max_chunks=self.retrieval_candidates,
+        )
+        self.last_packing = None
+        self.embedding_model_name = kwargs.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        self.embedding_batch_size = kwargs.get("embedding_batch_size")
+        # "chroma" or "faiss"
+        self.vector_backend = kwargs.get("vector_backend", "chroma")
+        # FAISS only: "float16" or "int8" store compact vectors, rescoring rescore_factor x k candidates exactly
+        self.store_options = {
+            "vector_dtype": kwargs.get("vector_dtype", "float32"),
+            "rescore_factor": kwargs.get("rescore_factor", 4),
+        }
+        # One collection (vector store + BM25 lexical index + manifest) per indexed repository
+        self.collections = None
+        # Repositories indexed in this session; queries that name no repository search these
+        self.active_repositories = []
+        # Indexing requested from the chat runs as background jobs
+        self.indexing_jobs = IndexingJobQueue(self.update_vectorstore, workers=kwargs.get("indexing_workers", 1))
+        self.ready = threading.Event()
+        # False until the embedding model has loaded; ready is also set when loading failed
+        self.embedding_ready = False
+        # In-memory caches for repeated questions; the generation counter invalidates retrieval results
+        self.index_generation = 0
+        self.query_embedding_cache = LRUCache(kwargs.get("query_cache_size", 1024))
+        self.retrieval_cache = LRUCache(kwargs.get("query_cache_size", 1024))
+        # Opt-in persistent cache of answers to repeated or near-duplicate questions
+        self.response_cache = None
+        if kwargs.get("response_cache", False):
+            self.response_cache = SemanticResponseCache(
+                kwargs.get("response_cache_path", os.path.join(self.db_name, "response_cache.pkl")),
+                similarity_threshold=kwargs.get("response_cache_threshold", 0.95),
+                ttl=kwargs.get("response_cache_ttl", 7 * 24 * 3600),
+                max_entries=kwargs.get("response_cache_size", 1000),
+            )
+
+        # With background_init the embedding model and vector store load in a worker thread
+        # while the UI starts; RAG answers are skipped until they are ready.
+        if kwargs.get("background_init", False):
+            threading.Thread(target=self._initialize_in_background, name="rag-warmup", daemon=True).start()
+        else:
+            self.initialize_vectorstore()
         
+    def _initialize_in_background(self):
+        try:
+            self.initialize_vectorstore()
+            with startup_timer.stage("embedding warm-up"):
+                get_embedding_model(self.embedding_model_name).embed_query("warm-up")
+        except Exception as e:
+            print(f"Background vectorstore initialization failed: {e}")
+            self.ready.set()
 
-        # if os.path.exists(self.db_name):
-        #     Chroma(persist_directory=self.db_name, embedding_function=embedding_model).delete_collection()
 
-    def initialize_vectorstore(self):
+    def wait_until_ready(self, timeout=None):
         """
-        Initialize the vector store with a dummy document if it doesn't exist.
+        Block until the vector store has been initialized. Returns False on timeout.
         """
+        return self.ready.wait(timeout)
 
-        # chroma_settings = Settings(persist_directory=os.path.abspath(self.db_name), allow_reset=True)  # Enable reset
-
-        # Define a dummy document
-        dummy_document = {
-            "page_content": "This is a dummy document for initialization purposes.",
-            "metadata": {"file_name": "dummy.txt", "file_path": "/dummy/path", "doc_type": "txt"}
-        }
 
-        embedding_model = SentenceTransformerEmbeddings("sentence-transformers/all-MiniLM-L6-v2")
+    def initialize_vectorstore(self):
+        """
+        Load the embedding model and open the collections of every indexed repository.
+        """
+        with startup_timer.stage("load embedding model"):
+            embedding_model = get_embedding_model(self.embedding_model_name, self.embedding_batch_size)
+        self.embedding_ready = True
         retry_attempts = 3
 
-        # Check if the vector store already exists
-        if not os.path.exists(self.db_name):
-            # Create a new vector store with the dummy document
-            for attempt in range(retry_attempts):
-                try:
-                    dummy_chunk = Document(page_content=dummy_document["page_content"], metadata=dummy_document["metadata"])
-                    self.vectorstore = Chroma.from_documents(
-                        documents=[dummy_chunk],
-                        embedding=embedding_model,
-                        # client_settings=chroma_settings,
-                        persist_directory=self.db_name
-                        
-                    )
-                    print(f"Vectorstore initialized with a dummy document at following path.")
-                    print(os.path.abspath(self.vectorstore._persist_directory))
-                    os.system(f"chmod -R u+w {os.path.abspath(self.vectorstore._persist_directory)}")
-                    break
-                except Exception as e:
-                    if attempt < retry_attempts - 1:
-                        print(f"Retrying vectorstore initialization... Attempt {attempt + 1}")
-                        time.sleep(2)  # Small delay before retrying
-                    else:
-                        print(f"Failed to initialize vectorstore after {retry_attempts} attempts. Error: {e}")
-        else:
-            # Load existing vector store
-            self.vectorstore = Chroma(embedding_function=embedding_model,
-                                    #    client_settings=chroma_settings, 
-                                       persist_directory=self.db_name)
-            print("Vectorstore loaded successfully.")
+        for attempt in range(retry_attempts):
+            try:
+                with startup_timer.stage(f"load {self.vector_backend} collections"):
+                    self.collections = CollectionRegistry(self.db_name, self.vector_backend, embedding_model, self.manifest_dir,
+                                                          self.store_options)
+                    for repo_path in self.collections.repo_paths():
+                        self.collections.get(repo_path)
+                print(f"Vectorstore loaded with {len(self.collections.repo_paths())} repository collections from {os.path.abspath(self.db_name)}")
+                break
+            except Exception as e:
+                if attempt < retry_attempts - 1:
+                    print(f"Retrying vectorstore initialization... Attempt {attempt + 1}")
+                    time.sleep(2)  # Small delay before retrying
+                else:
+                    print(f"Failed to initialize vectorstore after {retry_attempts} attempts. Error: {e}")
+        self.ready.set()
 
     
     def update_vectorstore(self, arguments):
@@ -89,145 +155,402 @@ class RAGHandler:
         self.update_vectorstore(repository_path)
 
 
-    def reset_vectorstore_data(self):
+    def reset_vectorstore_data(self, repo_path=None):
         """
-        Clear all data from the Chroma vector store and add dummy data.
+        Drop the collection of one repository, or of every repository if repo_path is None.
+        Each collection is dropped as a whole instead of fetching and deleting its vectors.
         """
+        self.wait_until_ready()
+        # Indexing jobs of the dropped collections are stopped first; only a running one is waited for
+        self.indexing_jobs.cancel(repo_path=repo_path, wait=True)
         try:
-            # List existing collections
-            collections = self.vectorstore._client.list_collections()
-            print("List of collections in vectorstore:", collections)
-
-            # Check if the vector store has a collection
-            if self.vectorstore._collection:
-                collection_name = self.vectorstore._collection.name
-                print(f"Clearing all vectors from the collection: {collection_name}")
-
-                # Retrieve all vector IDs
-                all_vectors = self.vectorstore._collection.get()  # Fetch all vectors without a filter
-                vector_ids = all_vectors.get("ids", [])
-
-                if vector_ids:
-                    self.vectorstore._collection.delete(ids=vector_ids)
-                    print(f"All vectors deleted from the collection: {collection_name}")
+            repo_paths = [repo_path] if repo_path else self.collections.repo_paths()
+            for path in repo_paths:
+                if self.collections.drop(path):
+                    print(f"Dropped the collection of {path}")
                 else:
-                    print("No vectors found in the collection to delete.")
-            else:
-                print("No collection found in the vector store.")
-
-            # Add dummy data to the vectorstore
-            dummy_texts = ["This is a dummy document.", "Another dummy document."]
-            dummy_metadatas = [{"source": "dummy1"}, {"source": "dummy2"}]
-
-            print("Adding dummy data to the vectorstore...")
-            self.vectorstore.add_texts(texts=dummy_texts, metadatas=dummy_metadatas)
-            print("Dummy data added successfully.")
-
+                    print(f"No collection found for {path}")
+                if os.path.abspath(path) in self.active_repositories:
+                    self.active_repositories.remove(os.path.abspath(path))
+                if self.response_cache:
+                    self.response_cache.invalidate(path)
         except Exception as e:
             print(f"Error resetting vector store: {e}")
+        finally:
+            self.bump_index_generation()
 
 
-    def update_vectorstore(self, repo_path):
-        """
-        Creates or updates the vector store by processing the repository.
-        """
-        def collect_files_recursive(path):
-            """
-            Collect files recursively in the directory and filter only the required file types.
-            """
-            allowed_extensions = [".py", ".java", ".js", ".rs", ".sh", ".txt", ".log", ".md"]
-            files = []
-            for root, _, filenames in os.walk(path):
-                for filename in filenames:
-                    file_path = os.path.join(root, filename)
-                    if "node_modules" in file_path:
-                        continue
-                    if any(filename.endswith(ext) for ext in allowed_extensions):
-                        files.append(file_path)
-            return files
-
-        def add_metadata(doc, file_path):
-            doc.metadata["file_path"] = file_path
-            doc.metadata["doc_type"] = os.path.splitext(file_path)[-1][1:]
-            doc.metadata["file_name"] = os.path.basename(file_path)
-            return doc
-
-        # Load files and split into chunks
-        text_loader_kwargs = {'encoding': 'utf-8'}
-        documents = []
-        files = collect_files_recursive(repo_path)
+    def update_vectorstore(self, repo_path, active_repositories=None, progress=None, cancel=None):
+        """
+        Creates or updates the collection of a repository by processing its files.
+
+        The repository becomes active in active_repositories (a session's list), or in
+        this handler's own list when none is given. Batches are searchable as soon as they
+        are written. progress and cancel are passed on to the IngestionPipeline.
+        """
+        self.wait_until_ready()
+        if not self.collections:
+            self.initialize_vectorstore()
 
-        for file_path in files:
+        collection = self.collections.get(repo_path, create=True)
+        active_repositories = self.active_repositories if active_repositories is None else active_repositories
+        if collection.repo_path not in active_repositories:
+            active_repositories.append(collection.repo_path)
+
+        # Only new or changed files are loaded, split and embedded; the manifest remembers the rest
+        with tracer.span("scan", repository=collection.repo_path) as span:
+            scanned, scan_stats = self.scanner.scan(collection.repo_path)
+            span.set(**scan_stats)
+        file_stats = {scanned_file.path: scanned_file.stat for scanned_file in scanned}
+        written = [0]
+
+        def on_progress(stats):
+            # Retrieval results cached before a batch was written are stale
+            if stats["chunks_added"] + stats["chunks_deleted"] != written[0]:
+                written[0] = stats["chunks_added"] + stats["chunks_deleted"]
+                self.bump_index_generation()
+            if progress is not None:
+                progress(stats)
+
+        with collection.ingest_lock, tracer.span("ingest", repository=collection.repo_path, backend=self.vector_backend) as span:
+            manifest = collection.manifest()
+            pipeline = IngestionPipeline(collection.store, manifest, lexical_index=collection.lexical_index,
+                                         progress=on_progress, cancel=cancel, commit=collection.commit,
+                                         **self.ingest_options)
             try:
-                loader = TextLoader(file_path, **text_loader_kwargs)
-                file_docs = loader.load()
-                documents.extend([add_metadata(doc, file_path) for doc in file_docs])
-            except Exception as e:
-                print(f"Error loading file {file_path}: {str(e)}")
+                stats = pipeline.run(list(file_stats), file_stats, truncated=scan_stats["truncated"])
+            finally:
+                flush_embedding_cache(get_embedding_model(self.embedding_model_name))
+                self.bump_index_generation()
+            span.set(**stats)
+        if self.response_cache and (stats["chunks_added"] or stats["chunks_deleted"]):
+            self.response_cache.invalidate(collection.repo_path)
+        return stats
 
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = text_splitter.split_documents(documents)
 
-        if not os.path.exists(self.db_name):
-            self.initialize_vectorstore()
-        else:
-            texts = [chunk.page_content for chunk in chunks]
-            metadatas = [chunk.metadata for chunk in chunks]
-            self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
-            print(f"{len(texts)} new docs added to the vector database.")
+    def submit_indexing(self, repo_path, active_repositories=None):
+        """
+        Index a repository in the background. Returns the IndexingJob right away.
+        """
+        active_repositories = self.active_repositories if active_repositories is None else active_repositories
+        return self.indexing_jobs.submit(repo_path, active_repositories)
+
+
+    def select_repositories(self, message, active_repositories=None):
+        """
+        Repositories a message should search: named in the message, else active in this session, else all.
+        """
+        if not self.collections:
+            return []
+        return self.collections.select(message, self.active_repositories if active_repositories is None else active_repositories)
 
 
     def retrieve_documents(self, query):
         """
         Retrieve relevant documents from the vector store using the query.
         """
-        if not self.vectorstore:
+        if not self.collections:
             return "No vector store found. Please create one first."
-        retriever = self.vectorstore.as_retriever(search_kwargs={"k": 5})
-        return retriever.get_relevant_documents(query)
+        return [doc for doc, _ in self.similarity_search_with_score(query, self.retrieval_k, self.select_repositories(query))]
+
+
+    def embed_query(self, query):
+        """
+        Embed a query, reusing the embedding of an identical (normalized) earlier query.
+        """
+        key = (self.embedding_model_name, normalize_query(query))
+        with tracer.span("embedding", model=self.embedding_model_name) as span:
+            embedding = self.query_embedding_cache.get(key)
+            span.set(cache_hit=embedding is not None)
+            if embedding is None:
+                embedding = embed_query_array(get_embedding_model(self.embedding_model_name), query)
+                self.query_embedding_cache.put(key, embedding)
+        return embedding
+
+
+    def similarity_search_with_score(self, query, k, repo_paths):
+        """
+        Scored vector search over the collections of repo_paths, cached per
+        (normalized query, k, repositories, index generation).
+
+        Returns:
+            list: (document, distance) pairs, closest first.
+        """
+        key = (normalize_query(query), k, tuple(sorted(repo_paths)), self.index_generation)
+        with tracer.span("vector_search", k=k, repositories=len(repo_paths)) as span:
+            results = self.retrieval_cache.get(key)
+            span.set(cache_hit=results is not None)
+            if results is None:
+                embedding = self.embed_query(query)
+                results = []
+                for repo_path in repo_paths:
+                    collection = self.collections.get(repo_path)
+                    if collection:
+                        results.extend(collection.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k))
+                results = sorted(results, key=lambda result: result[1])[:k]
+                self.retrieval_cache.put(key, results)
+        return results
+
+
+    def bump_index_generation(self):
+        """
+        Mark the index as changed so that cached retrieval results are no longer used.
+        """
+        self.index_generation += 1
+        self.retrieval_cache.clear()
+
+
+    def cache_stats(self):
+        return {
+            "index_generation": self.index_generation,
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "retrieval_results": self.retrieval_cache.stats(),
+            "responses": self.response_cache.stats() if self.response_cache else None,
+        }
+
+
+    def cached_response(self, key, query):
+        """
+        Cached answer to query (or a near-duplicate of it) under key, or None.
+        Always None when the response cache is off or the embedding model is still loading.
+        """
+        if self.response_cache is None or not self.ready.is_set():
+            return None
+        with tracer.span("response_cache.lookup") as span:
+            response = self.response_cache.lookup(key, self.embed_query(query))
+            span.set(hit=response is not None)
+        return response
+
+
+    def cache_response(self, key, query, response, sources=()):
+        """
+        Remember a complete answer. Void RAG answers are never cached.
+        """
+        if self.response_cache is None or not self.ready.is_set() or not response or "VOID RAG RESPONSE" in response:
+            return
+        self.response_cache.store(key, query, self.embed_query(query), response, sources)
+
+
+    def rag_cache_key(self, retrieved_documents):
+        """
+        Response cache key of an answer from these documents: model, system prompt and a fingerprint of the documents.
+        """
+        return fingerprint(self.model, self.system_message, *sorted(doc.page_content for doc in retrieved_documents))
     
 
-    def generate_response(self, query, retrieved_documents):
+    def pack_context(self, query, retrieved_documents):
         """
-        Generate a response using the LLM with retrieved documents as context.
+        Pack the retrieved documents into at most context_budget tokens of context with the
+        context packer. The query embedding is reused if the query was embedded already;
+        otherwise (identifier lookups) the order of the documents stands in for relevance.
+        The result is also stored on self.last_packing.
+        """
+        query_embedding = self.query_embedding_cache.get((self.embedding_model_name, normalize_query(query)))
+        with tracer.span("context_pack") as span:
+            packing = self.context_packer.pack(retrieved_documents, self.context_budget,
+                                               get_embedding_model(self.embedding_model_name), query_embedding)
+            span.set(candidates=packing["candidates"], selected=packing["selected"], merged=len(packing["documents"]),
+                     tokens=packing["tokens"], tokens_saved=packing["tokens_saved"])
+        tracer.observe("context_tokens_saved", self.model, packing["tokens_saved"], buckets=TOKEN_BUCKETS)
+        self.last_packing = packing
+        return packing["context"]
+
+
+    def rag_payload(self, query, retrieved_documents):
         """
-        context = "\n\n".join([doc.page_content for doc in retrieved_documents])
+        Chat payload answering query from the retrieved documents, packed into the context budget.
+        """
+        context = self.pack_context(query, retrieved_documents)
         prompt = f"Context: {context}\n\nQuestion: {query}\n\nAnswer:"
-        
-        payload = {
+        return {
             "model": self.model,
             "messages": [{"role": "system", "content": self.system_message}, {"role": "user", "content": prompt}],
-            "stream": False
         }
-        response = requests.post(self.model_url, json=payload)
-        if response.status_code == 200:
-            return response.json().get("message", {}).get("content", "No content returned.")
-        else:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
+
+
+    def generate_response(self, query, retrieved_documents):
+        """
+        Generate a response using the LLM with retrieved documents as context.
+        """
+        key = self.rag_cache_key(retrieved_documents)
+        response = self.cached_response(key, query)
+        if response is None:
+            response = self.client.chat_content(self.model_url, self.rag_payload(query, retrieved_documents))
+            self.cache_response(key, query, response, document_sources(retrieved_documents))
+        return response or "No content returned."
         
 
-    def chat(self, message):
+    def stream_response(self, query, retrieved_documents):
+        """
+        Stream a response using the LLM with retrieved documents as context.
+
+        Yields:
+            str: Accumulated content of the response so far.
+        """
+        key = self.rag_cache_key(retrieved_documents)
+        response = self.cached_response(key, query)
+        if response is not None:
+            yield response
+            return
+
+        response = ""
+        for response in self.client.stream_chat(self.model_url, self.rag_payload(query, retrieved_documents)):
+            yield response
+        # Only reached when the whole answer was consumed
+        self.cache_response(key, query, response, document_sources(retrieved_documents))
+
+
+    def relevance_gate(self, query, active_repositories=None):
+        """
+        Decide whether the query is worth a RAG generation, using scored retrieval.
+
+        Only the collections of the repositories selected for the query are searched, and
+        chunks farther than relevance_threshold are dropped. The decision is also stored on
+        self.last_gate so it can be inspected when tuning the threshold.
+
+        Returns:
+            dict: {"passed", "reason", "best_distance", "retrieved", "documents", "seconds"}
+        """
+        with tracer.span("retrieval") as span:
+            gate = self._relevance_gate(query, active_repositories)
+            span.set(passed=gate["passed"], reason=gate["reason"], best_distance=gate["best_distance"],
+                     retrieved=gate["retrieved"], kept=len(gate["documents"]))
+        self.last_gate = gate
+        return gate
+
+
+    def _relevance_gate(self, query, active_repositories):
+        start_time = time.time()
+        gate = {"passed": False, "reason": "", "best_distance": None, "retrieved": 0, "documents": []}
+        repo_paths = self.select_repositories(query, active_repositories) if self.ready.is_set() else []
+
+        if not self.ready.is_set():
+            gate["reason"] = "warming_up"
+        elif not repo_paths:
+            gate["reason"] = "no_collections"
+        elif self._identifier_lookup(query, gate, repo_paths):
+            pass
+        else:
+            scored_docs = self.similarity_search_with_score(query, self.retrieval_candidates, repo_paths)
+            gate["retrieved"] = len(scored_docs)
+            if not scored_docs:
+                gate["reason"] = "nothing_retrieved"
+            else:
+                relevant = [doc for doc, score in scored_docs if score <= self.relevance_threshold]
+                gate["best_distance"] = min(score for _, score in scored_docs)
+                if relevant:
+                    gate["passed"] = True
+                    gate["reason"] = "relevant"
+                    gate["documents"] = self._fuse_with_lexical(query, relevant, repo_paths)
+                else:
+                    gate["reason"] = "too_distant"
+
+        gate["seconds"] = time.time() - start_time
+        return gate
+
+
+    def _lexical_search(self, search, repo_paths, k):
+        """
+        Run search(lexical_index) on the lexical index of every repository in repo_paths and merge the best k results.
+
+        Returns:
+            list: langchain Documents, best first.
+        """
+        from langchain.schema import Document
+
+        ranked = []
+        with tracer.span("lexical_search") as span:
+            for repo_path in repo_paths:
+                collection = self.collections.get(repo_path)
+                if collection:
+                    ranked.extend((score, collection, chunk_id) for chunk_id, score in search(collection.lexical_index))
+            ranked.sort(key=lambda item: item[0], reverse=True)
+            span.set(matches=len(ranked))
+
+        documents = []
+        for _, collection, chunk_id in ranked:
+            found = collection.lexical_index.get(chunk_id)
+            if found is None:
+                continue
+            text, metadata = found
+            documents.append(Document(page_content=text, metadata=dict(metadata or {})))
+            if len(documents) == k:
+                break
+        return documents
+
+
+    def _identifier_lookup(self, query, gate, repo_paths):
+        """
+        Answer queries that name exact identifiers from the lexical index alone, skipping the query embedding.
+        Only chunks that define one of the identifiers (it names their symbol) count, so words
+        that merely look like identifiers, e.g. os.path or node.js, go through the relevance
+        threshold instead. Fills in gate and returns True if the lookup found anything.
+        """
+        identifiers = extract_identifiers(query)
+        if not identifiers:
+            return False
+        k = self.retrieval_candidates
+
+        def defines(metadata):
+            return names_symbol(identifiers, (metadata or {}).get("symbol"))
+
+        documents = self._lexical_search(lambda index: index.lookup(identifiers, k=k, filter_fn=defines), repo_paths, k)
+        if not documents:
+            return False
+        gate["passed"] = True
+        gate["reason"] = "identifier_lookup"
+        gate["retrieved"] = len(documents)
+        gate["documents"] = documents
+        return True
+
+
+    def _fuse_with_lexical(self, query, vector_documents, repo_paths):
+        """
+        Combine the relevant vector results with BM25 results using reciprocal rank fusion.
+        """
+        k = self.retrieval_candidates
+        lexical_documents = self._lexical_search(lambda index: index.search(query, k=k), repo_paths, k)
+        by_content = {}
+        for doc in vector_documents + lexical_documents:
+            by_content.setdefault(doc.page_content, doc)
+        fused = reciprocal_rank_fusion([doc.page_content for doc in vector_documents],
+                                       [doc.page_content for doc in lexical_documents])
+        return [by_content[content] for content in fused[:k]]
+
+
+    def stream_chat(self, message, active_repositories=None):
+        """
+        Streaming variant of chat. Yields nothing if the relevance gate finds no relevant document.
+        """
+        gate = self.relevance_gate(message, active_repositories)
+        if not gate["passed"]:
+            return
+
+        yield from self.stream_response(message, gate["documents"])
+
+
+    def chat(self, message, active_repositories=None):
         """
         Unified chat function for general queries and RAG-based responses.
+
+        Returns 'VOID RAG RESPONSE' without calling the LLM when the relevance gate finds no relevant document.
         """
-        if self.vectorstore:
-            # RAG workflow
-            retrieved_docs = self.retrieve_documents(message)
-            print(f"Retrieved Docs {retrieved_docs}")
-            if retrieved_docs:
-                return self.generate_response(message, retrieved_docs)
-            
-            print(f"No document retrieved: {retrieved_docs}")
-            return ""
-        
-        print(f"Vector store not initiaized: {self.vectorstore}")
-        return ""
+        gate = self.relevance_gate(message, active_repositories)
+        if not gate["passed"]:
+            return "VOID RAG RESPONSE"
+
+        return self.generate_response(message, gate["documents"])
     
     def close_vectorstore(self):
-        if self.vectorstore:
+        self.indexing_jobs.close()
+        if self.embedding_ready:
+            flush_embedding_cache(get_embedding_model(self.embedding_model_name))
+        if self.response_cache and self.response_cache.dirty:
+            self.response_cache.save()
+        if self.collections:
             try:
-                self.vectorstore._client.reset()  # Gracefully shut down Chroma
-                print("Chroma vectorstore closed.")
+                self.collections.close()
+                print(f"{self.vector_backend} vectorstore closed.")
             except Exception as e:
                 print(f"Error closing vectorstore: {e}")
             
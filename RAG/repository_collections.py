@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import hashlib
+import threading
+
+from RAG.manifest import IndexManifest
+from RAG.lexical_index import LexicalIndex
+from RAG.vector_store import create_vector_store
+
+
+def collection_name_for(repo_path):
+    """
+    Stable, backend-safe collection name for a repository: 3-63 characters of [a-zA-Z0-9_-].
+    """
+    repo_path = os.path.abspath(repo_path)
+    base = re.sub(r"[^a-zA-Z0-9_-]", "-", os.path.basename(repo_path) or "root").strip("-_")[:40] or "repo"
+    digest = hashlib.sha1(repo_path.encode("utf-8")).hexdigest()[:12]
+    return f"repo-{base}-{digest}"
+
+
+class RepositoryCollection:
+    """
+    Everything indexed for one repository: its vector store collection, lexical index and manifest.
+    """
+
+    def __init__(self, repo_path, name, store, lexical_index, manifest_dir):
+        self.repo_path = repo_path
+        self.name = name
+        self.store = store
+        self.lexical_index = lexical_index
+        self.manifest_dir = manifest_dir
+        # Serializes indexing runs, e.g. two sessions indexing the same repository
+        self.ingest_lock = threading.Lock()
+
+    def manifest(self):
+        return IndexManifest(self.manifest_dir, self.repo_path)
+
+    def commit(self):
+        """
+        Write the vector store and lexical index to disk. Runs before every manifest save,
+        so the manifest never lists files whose chunks are not on disk.
+        """
+        self.store.persist()
+        self.lexical_index.save()
+
+
+class CollectionRegistry:
+    """
+    Keeps one named collection per indexed repository, persisted as repo path -> collection
+    name in collections.json. Collections are opened lazily and cached. store_options are
+    passed on to the vector store backend (e.g. vector_dtype for FAISS).
+    """
+
+    def __init__(self, db_name, backend, embedding, manifest_dir, store_options=None):
+        self.db_name = db_name
+        self.backend = backend
+        self.embedding = embedding
+        self.manifest_dir = manifest_dir
+        self.store_options = store_options or {}
+        self.registry_path = os.path.join(db_name, "collections.json")
+        self.lock = threading.RLock()
+        self.open_collections = {}
+        self.registry = {}
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.registry_path):
+            try:
+                with open(self.registry_path, "r", encoding="utf-8") as f:
+                    self.registry = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable collection registry {self.registry_path}: {e}")
+
+    def _save(self):
+        os.makedirs(self.db_name, exist_ok=True)
+        tmp_path = f"{self.registry_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def repo_paths(self):
+        with self.lock:
+            return list(self.registry)
+
+    def get(self, repo_path, create=False):
+        """
+        Return the collection of a repository, or None if it was never indexed and create is False.
+        """
+        repo_path = os.path.abspath(repo_path)
+        with self.lock:
+            if repo_path in self.open_collections:
+                return self.open_collections[repo_path]
+            if repo_path not in self.registry:
+                if not create:
+                    return None
+                self.registry[repo_path] = collection_name_for(repo_path)
+                self._save()
+
+            name = self.registry[repo_path]
+            store = create_vector_store(self.backend, self.db_name, self.embedding, collection_name=name, **self.store_options)
+            lexical_index = LexicalIndex(os.path.join(self.db_name, "lexical", f"{name}.pkl"))
+            collection = RepositoryCollection(repo_path, name, store, lexical_index, self.manifest_dir)
+            self.open_collections[repo_path] = collection
+            return collection
+
+    def drop(self, repo_path):
+        """
+        Drop a repository's collection, lexical index and manifest. Only that repository is touched.
+        Waits for an indexing run of the repository to finish, so it never resets a store that
+        is being written; cancel the run first to drop the collection sooner.
+        """
+        repo_path = os.path.abspath(repo_path)
+        collection = self.get(repo_path)
+        if collection is None:
+            return False
+        # ingest_lock before the registry lock; indexing never holds them the other way round
+        with collection.ingest_lock, self.lock:
+            if self.open_collections.get(repo_path) is not collection:
+                return False
+            collection.store.drop()
+            collection.lexical_index.clear()
+            if os.path.exists(collection.lexical_index.path):
+                os.remove(collection.lexical_index.path)
+            manifest_path = collection.manifest().manifest_path
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            del self.open_collections[repo_path]
+            del self.registry[repo_path]
+            self._save()
+            return True
+
+    def select(self, message, active_repositories=None):
+        """
+        Pick the repositories a query should search: those named in the message (by path or
+        directory name), otherwise the active ones, otherwise every indexed repository.
+        """
+        repo_paths = self.repo_paths()
+        lowered = message.lower()
+        named = [
+            repo_path for repo_path in repo_paths
+            if repo_path.lower() in lowered
+            or re.search(rf"(?<![\w/-]){re.escape(os.path.basename(repo_path).lower())}(?![\w-])", lowered)
+        ]
+        if named:
+            return named
+        active = [repo_path for repo_path in active_repositories or [] if repo_path in self.registry]
+        return active or repo_paths
+
+    def close(self):
+        with self.lock:
+            for collection in self.open_collections.values():
+                collection.store.close()
@@ -0,0 +1,156 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+
+import numpy as np
+
+
+def fingerprint(*parts):
+    """
+    Stable hash of the given strings, used to key cached responses by model, prompt and context.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SemanticResponseCache:
+    """
+    Persistent cache of model responses for repeated (or near-duplicate) questions.
+
+    Responses are grouped by an exact key over model, system prompt and context fingerprint.
+    Within a group, a cached response is reused when the cosine similarity between the
+    question's embedding and the cached question's embedding reaches similarity_threshold.
+    Entries expire after ttl seconds, the least recently used are evicted beyond
+    max_entries, and entries are dropped when a repository they were answered from changes.
+
+    New responses are written to disk by maybe_save() at most every save_interval seconds,
+    and by save().
+    """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.similarity_threshold = kwargs.get("similarity_threshold", 0.95)
+        self.ttl = kwargs.get("ttl", 7 * 24 * 3600)
+        self.max_entries = kwargs.get("max_entries", 1000)
+        self.save_interval = kwargs.get("save_interval", 30)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_save = time.time()
+        self.entries = {}  # key -> list of entries
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                self.entries = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable response cache {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        # The temporary file is shared, so it is moved into place before another save can write it
+        with self.lock:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+            self.last_save = time.time()
+
+    def maybe_save(self):
+        """
+        Save if there are unsaved changes and save_interval seconds have passed since the last save.
+        """
+        if self.dirty and time.time() - self.last_save >= self.save_interval:
+            self.save()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, key, query_embedding):
+        """
+        Return the cached response closest to query_embedding under key, or None.
+        """
+        vector = self._normalize(query_embedding)
+        now = time.time()
+        with self.lock:
+            candidates = [entry for entry in self.entries.get(key, []) if now - entry["created"] <= self.ttl]
+            best, best_similarity = None, self.similarity_threshold
+            for entry in candidates:
+                similarity = float(np.dot(entry["embedding"], vector))
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            best["last_used"] = now
+            self.hits += 1
+            return best["response"]
+
+    def store(self, key, query, query_embedding, response, sources=()):
+        """
+        Cache a response. sources are the file paths the response was answered from, used for invalidation.
+        """
+        now = time.time()
+        entry = {"query": query, "embedding": self._normalize(query_embedding), "response": response,
+                 "sources": sorted(set(sources)), "created": now, "last_used": now}
+        with self.lock:
+            self.entries.setdefault(key, []).append(entry)
+            self._evict(now)
+            self.dirty = True
+        self.maybe_save()
+
+    def invalidate(self, repo_path=None):
+        """
+        Drop every entry answered from files under repo_path, or everything if repo_path is None.
+
+        Returns:
+            int: Number of entries dropped.
+        """
+        prefix = os.path.join(os.path.abspath(repo_path), "") if repo_path else None
+        dropped = 0
+        with self.lock:
+            for key in list(self.entries):
+                kept = [entry for entry in self.entries[key]
+                        if prefix and not any(source.startswith(prefix) for source in entry["sources"])]
+                dropped += len(self.entries[key]) - len(kept)
+                if kept:
+                    self.entries[key] = kept
+                else:
+                    del self.entries[key]
+        if dropped:
+            self.save()
+        return dropped
+
+    def _evict(self, now):
+        for key in list(self.entries):
+            self.entries[key] = [entry for entry in self.entries[key] if now - entry["created"] <= self.ttl]
+            if not self.entries[key]:
+                del self.entries[key]
+        all_entries = [(entry["last_used"], entry) for entries in self.entries.values() for entry in entries]
+        if len(all_entries) > self.max_entries:
+            all_entries.sort(key=lambda item: item[0])
+            evicted = {id(entry) for _, entry in all_entries[:len(all_entries) - self.max_entries]}
+            for key in list(self.entries):
+                self.entries[key] = [entry for entry in self.entries[key] if id(entry) not in evicted]
+                if not self.entries[key]:
+                    del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": sum(len(entries) for entries in self.entries.values()), "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,89 @@
+from abc import ABC, abstractmethod
+
+
+class VectorStore(ABC):
+    """
+    Interface RAGHandler uses to talk to a vector database.
+
+    Method names follow langchain's vector stores so that either a backend or a plain
+    langchain store can be passed where only add_texts/delete are needed.
+    """
+
+    @abstractmethod
+    def add_texts(self, texts, metadatas=None, ids=None):
+        """
+        Embed and store texts. Returns the ids of the stored texts.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, ids):
+        pass
+
+    @abstractmethod
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        """
+        Scored search by query embedding. Lower scores are closer (squared L2 distance).
+
+        Args:
+            filter (dict, optional): Metadata filter, {key: value} or {key: {"$in": [values]}}.
+
+        Returns:
+            list: (langchain Document, distance) pairs, closest first.
+        """
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """
+        Remove every stored vector.
+        """
+        pass
+
+    @abstractmethod
+    def persist(self):
+        pass
+
+    @abstractmethod
+    def count(self):
+        pass
+
+    def drop(self):
+        """
+        Remove the collection for good; the store is not used afterwards.
+        """
+        self.reset()
+
+    def close(self):
+        self.persist()
+
+
+def matches_filter(metadata, filter):
+    """
+    Evaluate the subset of Chroma's metadata filter syntax the backends support.
+    """
+    if not filter:
+        return True
+    metadata = metadata or {}
+    for key, condition in filter.items():
+        if isinstance(condition, dict):
+            if "$in" in condition and metadata.get(key) not in condition["$in"]:
+                return False
+            if "$eq" in condition and metadata.get(key) != condition["$eq"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def create_vector_store(backend, persist_directory, embedding, **kwargs):
+    """
+    Create the vector store backend named by backend ("chroma" or "faiss").
+    """
+    if backend == "chroma":
+        from RAG.chroma_store import ChromaStore
+        return ChromaStore(persist_directory, embedding, **kwargs)
+    if backend == "faiss":
+        from RAG.faiss_store import FaissStore
+        return FaissStore(persist_directory, embedding, **kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -1,14 +1,42 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+from ollama_client import get_client
+from tracing import tracer
+from repo_scanner import RepositoryScanner
+from model_residency import canonical_system_prompt
 from .tool import Tool
+from .summary_cache import SummaryCache
+
+FILE_SUMMARY_PROMPT = """You are supposed to analyze and summarize the content of a file from a repository,
+which could be code or text. Summarize what's happening, mentioning variable names, class names and imports.
+Start with the path of the file.
+Here is the content of {label}:
+
+{content}"""
+
+COMBINE_SUMMARY_PROMPT = """You are given summaries of the files and subdirectories of {label} in a repository.
+Combine them into one summary of that directory, keeping the important file, class and variable names
+and explaining how the different components interact.
+
+{content}"""
+
+TOOL_SYSTEM_PROMPT = canonical_system_prompt("You are a helpful assistant. Use all the given tools")
+
 
 class RepoAnalyzer(Tool):
     def __init__(self, **kwargs):
         self.localApiUrl = kwargs.get('localApiUrl', 'http://localhost:11434/api/chat')
         self.model = kwargs.get('model')
         self.header = kwargs.get("header", {"Content-Type": "application/json"})
+        self.client = kwargs.get("client") or get_client()
+        self.knowledge_base_dir = kwargs.get("knowledge_base_dir", "knowledge_base")
+        # Number of summaries generated concurrently, and the largest text sent in one prompt
+        self.max_workers = kwargs.get("max_workers", 4)
+        self.max_chunk_chars = kwargs.get("max_chunk_chars", 12000)
+        self.summary_cache = SummaryCache(os.path.join(self.knowledge_base_dir, "summaries"))
+        self.scanner = kwargs.get("scanner") or RepositoryScanner()
         self.tool_function = {
             "name": "analyze_repository",
             "description": (
@@ -32,97 +60,151 @@ class RepoAnalyzer(Tool):
     
     def get_tool_function_object(self):
         return self.tool_function
-    
-        
-        
 
-    def handle_tool_call(self, arguments):
-        """
-        Handles the invocation of the summarize_repository tool.
-        """
-        def chat(message):
-            messages = [{"role": "system", "content": "You are a helpful assistant. Use all the given tools"}] + [{"role": "user", "content": message}]
-            payload = {
+
+    def chat(self, message):
+        messages = [{"role": "system", "content": TOOL_SYSTEM_PROMPT}] + [{"role": "user", "content": message}]
+        payload = {
             "model": self.model,
             "messages": messages,
-            "stream": False
         }
+        return self.client.chat_content(self.localApiUrl, payload)
 
-            response = requests.post(self.localApiUrl, json=payload, headers=self.header, stream=True)
 
-            if response.status_code == 200:
-                return response.content
-            else:
-                raise Exception(f"Error: {response.status_code}, {response.text}")
-            
-        # Function to read all files in a repository
-        def read_repository_files(repo_path):
-
-            directory_path = "knowledge_base"
-            os.makedirs(directory_path, exist_ok=True)
-            print(f"Directory '{directory_path}' is ready.")
-            
+    def read_repository_files(self, repo_path):
+        """
+        Read the files the scanner finds in the repository.
 
-            content = None
+        Returns:
+            dict: Relative file path -> file content.
+        """
+        with tracer.span("scan", repository=repo_path) as span:
+            scanned, scan_stats = self.scanner.scan(repo_path)
+            span.set(**scan_stats)
+        contents = {}
+        for scanned_file in scanned:
             try:
-                for root, dirs, files in os.walk(repo_path):
-                    allowed_extensions = {".py", ".java", ".js", ".rs", ".sh", ".txt", ".log", ".md"}  # Allowed file extensions
-                    for file in files:
-                        file_extension = os.path.splitext(file)[1]
-                        if file_extension not in allowed_extensions:
-                            continue
-                        file_path = os.path.join(root, file)
-                        if "node_modules" in file_path:
-                            continue
-                        try:
-                            # Read the file content
-                            with open(file_path, 'r', encoding="utf-8") as f:
-                                content = f.read()
-                                f.close()
-                                                            
-                            with open(f"./knowledge_base/{os.path.basename(repo_path)}.txt", "a", encoding="utf-8") as f:
-                                print(f"{file_path} being read.....")
-                                f.write(f"\n\n{file_path}\n")
-                                f.write(content)
-                                f.close()
-                        except Exception as e:
-                            print(f"Error reading file {file_path}: {str(e)}")
+                with open(scanned_file.path, 'r', encoding="utf-8") as f:
+                    contents[scanned_file.relative_path] = f.read()
             except Exception as e:
-                return {"error": f"Failed to read repository: {str(e)}"}
-
-        # Function to summarize the repository
-        def summarize_repository(repo_content):
-            message = f"""You are supposed to analyze and summarize the content of a repositoy, 
-                which could be code or text given. You should be able to answer any question or generate additional 
-                content based upon this. The content is such that each file name is followed by it's content. 
-                Summarize what's happenning, mentioning variable names, class names, imports and creating a short summary of how different compenents are interacting.
-                    First mention the path and name of the file followed by the content.
-                Here is the content \n\n {repo_content}"""
-            
-            return chat(message)
+                print(f"Error reading file {scanned_file.path}: {str(e)}")
+        return contents
+
+
+    def summarize(self, prompt_template, label, content):
+        """
+        Summarize content with the given prompt, using the on-disk cache keyed by model, prompt and content.
+        Content larger than max_chunk_chars is summarized in pieces which are then combined.
+        """
+        key = SummaryCache.key_for(self.model or "", prompt_template, content)
+        summary = self.summary_cache.get(key)
+        if summary is not None:
+            return summary
+
+        with tracer.span("summarize", label=label, chars=len(content)):
+            summary = self._summarize_uncached(prompt_template, label, content)
+        self.summary_cache.put(key, summary, label)
+        return summary
+
+
+    def _summarize_uncached(self, prompt_template, label, content):
+        if len(content) > self.max_chunk_chars:
+            pieces = [content[i:i + self.max_chunk_chars] for i in range(0, len(content), self.max_chunk_chars)]
+            piece_summaries = [
+                self.summarize(prompt_template, f"{label} (part {index + 1} of {len(pieces)})", piece)
+                for index, piece in enumerate(pieces)
+            ]
+            return self.summarize(COMBINE_SUMMARY_PROMPT, label, "\n\n".join(piece_summaries))
+        return self.chat(prompt_template.format(label=label, content=content))
 
+
+    def summarize_files(self, contents):
+        """
+        Map step: summarize every file concurrently.
+
+        Returns:
+            dict: Relative file path -> summary.
+        """
+        paths = sorted(contents)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            summarize_file = tracer.propagate(lambda path: self.summarize(FILE_SUMMARY_PROMPT, path, contents[path]))
+            summaries = executor.map(summarize_file, paths)
+            return dict(zip(paths, summaries))
+
+
+    def summarize_directories(self, repo_name, file_summaries):
+        """
+        Reduce step: combine summaries directory by directory, deepest directories first,
+        until a single summary for the repository remains.
+        """
+        def depth(directory):
+            return directory.count(os.sep) + 1 if directory else 0
+
+        children = {"": {}}
+        for path, summary in file_summaries.items():
+            children.setdefault(os.path.dirname(path), {})[path] = summary
+
+        # Make sure every ancestor directory exists so that summaries can bubble up to the root
+        for directory in list(children):
+            while directory:
+                directory = os.path.dirname(directory)
+                children.setdefault(directory, {})
+
+        def combine(directory):
+            entries = children[directory]
+            if len(entries) == 1:
+                return next(iter(entries.values()))
+            content = "\n\n".join(f"{path}:\n{summary}" for path, summary in sorted(entries.items()))
+            return self.summarize(COMBINE_SUMMARY_PROMPT, directory or repo_name, content)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for level in sorted({depth(directory) for directory in children}, reverse=True):
+                directories = [directory for directory in children if depth(directory) == level]
+                for directory, summary in zip(directories, executor.map(tracer.propagate(combine), directories)):
+                    if not directory:
+                        return summary
+                    children[os.path.dirname(directory)][f"{directory}{os.sep}"] = summary
+        return ""
+
+
+    def handle_tool_call(self, arguments, knowledge_base_dir=None):
+        """
+        Handles the invocation of the analyze_repository tool.
+
+        The summary is written to knowledge_base_dir (e.g. a session's scratch directory),
+        defaulting to the analyzer's own knowledge base.
+        """
         # Handle the tool call dynamically
         repository_path = arguments.get("repository_path", "")
 
-        print(f"Repository Path found: {repository_path}")
-        
         if not repository_path or not os.path.exists(repository_path):
             return json.dumps({"error": "Invalid or non-existent repository path provided."})
 
-        # Read the repository files
-        read_repository_files(repository_path)
-        with open(f"knowledge_base/{os.path.basename(repository_path)}.txt", "rb") as f:
-            repo_content = f.read()
-            try:
-                repo_content = repo_content.decode('utf-8')  # Decode bytes to string
-            except UnicodeDecodeError:
-                repo_content = "Error decoding content as UTF-8."
-            f.close()
+        repo_name = os.path.basename(os.path.normpath(repository_path))
+        try:
+            with tracer.span("read_repository", repository=repository_path) as span:
+                contents = self.read_repository_files(repository_path)
+                span.set(files=len(contents))
+        except Exception as e:
+            return json.dumps({"error": f"Failed to read repository: {str(e)}"})
+        if not contents:
+            return json.dumps({"error": "No readable files found in the repository."})
+
+        # Summarize each file, then combine the summaries directory by directory
+        with tracer.span("summarize_repository", files=len(contents)) as span:
+            hits, misses = self.summary_cache.hits, self.summary_cache.misses
+            file_summaries = self.summarize_files(contents)
+            repo_summary = self.summarize_directories(repo_name, file_summaries)
+            span.set(cache_hits=self.summary_cache.hits - hits, cache_misses=self.summary_cache.misses - misses)
+
+        # Keep the latest summary in the knowledge base, replacing any previous run
+        knowledge_base_dir = knowledge_base_dir or self.knowledge_base_dir
+        os.makedirs(knowledge_base_dir, exist_ok=True)
+        with open(os.path.join(knowledge_base_dir, f"{repo_name}.txt"), "w", encoding="utf-8") as f:
+            f.write(repo_summary)
 
-        # Summarize the repository
-        repo_summary = summarize_repository(repo_content)
         tool_response = {
             "repository_path": repository_path,
-            "summary": repo_summary.decode('utf-8') if isinstance(repo_summary, bytes) else repo_summary
+            "summary": repo_summary
         }
-        return json.dumps(tool_response)
\ No newline at end of file
+        return json.dumps(tool_response)
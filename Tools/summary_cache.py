@@ -0,0 +1,48 @@
+import os
+import json
+import hashlib
+import threading
+
+
+class SummaryCache:
+    """
+    On-disk cache of LLM summaries keyed by a hash of everything that produced them
+    (model, prompt and input content), so unchanged files are never summarized twice.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f).get("summary")
+        except (OSError, ValueError):
+            summary = None
+        if summary is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return summary
+
+    def put(self, key, summary, label=""):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"label": label, "summary": summary}, f)
+        os.replace(tmp_path, path)
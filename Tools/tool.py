@@ -2,7 +2,10 @@ from abc import ABC, abstractmethod
 
 class Tool(ABC):
     @abstractmethod
-    def handle_tool_call(self, arguments):
+    def handle_tool_call(self, arguments, knowledge_base_dir=None):
+        """
+        Run the tool. Files it produces go to knowledge_base_dir when given (e.g. a session's scratch directory).
+        """
         pass
 
     @abstractmethod
@@ -0,0 +1,162 @@
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from tracing import tracer
+from .tool import Tool
+
+
+class ToolRegistry:
+    """
+    Holds the tools the model may call, by function name, and runs the calls of one
+    assistant turn concurrently in a worker pool with per-tool timeouts.
+
+    A call that fails, names an unknown tool or times out gets a JSON error as its
+    response instead of failing the turn. A call's timeout starts when a worker starts
+    running it, so calls queued behind others are not penalized. A timed-out call keeps
+    its worker thread until it finishes on its own, since threads cannot be interrupted,
+    so a call that still has no worker for its timeout after the call before it got a
+    response is cancelled.
+    """
+
+    def __init__(self, tools=None, **kwargs):
+        self.default_timeout = kwargs.get("default_timeout", 600)
+        self.executor = ThreadPoolExecutor(max_workers=kwargs.get("max_workers", 4), thread_name_prefix="tool")
+        self.tools = {}
+        self.timeouts = {}
+        for tool in tools or []:
+            self.register(tool)
+
+    def register(self, tool: Tool, timeout=None):
+        """
+        Add a tool, optionally with its own timeout in seconds.
+        """
+        name = tool.get_tool_function_object()["name"]
+        self.tools[name] = tool
+        self.timeouts[name] = timeout or getattr(tool, "timeout", None) or self.default_timeout
+        return tool
+
+    def names(self):
+        return list(self.tools)
+
+    def get(self, name):
+        return self.tools.get(name)
+
+    def function_objects(self):
+        """
+        Tool definitions in the format of the chat API's "tools" field.
+        """
+        return [{"type": "function", "function": tool.get_tool_function_object()} for tool in self.tools.values()]
+
+    @staticmethod
+    def call_name(tool_call):
+        return tool_call.get("function", {}).get("name", "")
+
+    def _run_call(self, tool_call, knowledge_base_dir=None):
+        name = self.call_name(tool_call)
+        arguments = tool_call.get("function", {}).get("arguments") or {}
+        tool = self.tools.get(name)
+        if tool is None:
+            return json.dumps({"error": f"Unknown tool '{name}'. Available tools: {', '.join(self.tools)}"})
+
+        with tracer.span("tool", tool=name, arguments=arguments) as span:
+            try:
+                if isinstance(arguments, str):
+                    arguments = json.loads(arguments)
+                return tool.handle_tool_call(arguments, knowledge_base_dir=knowledge_base_dir)
+            except Exception as e:
+                span.set(failed=str(e))
+                return json.dumps({"error": f"Tool '{name}' failed: {e}"})
+
+    def timeout_for(self, tool_call):
+        return self.timeouts.get(self.call_name(tool_call), self.default_timeout)
+
+    def _timeout_response(self, tool_call, started=True):
+        name = self.call_name(tool_call)
+        if not started:
+            return json.dumps({"error": f"Tool '{name}' could not start within {self.timeout_for(tool_call)} seconds, all tool workers were busy."})
+        return json.dumps({"error": f"Tool '{name}' did not finish within {self.timeout_for(tool_call)} seconds."})
+
+    def _submit(self, tool_call, knowledge_base_dir, on_start):
+        """
+        Submit one call to the worker pool. on_start is called from the worker when the call
+        starts running.
+
+        Returns:
+            tuple: (future, started), where started receives the monotonic start time.
+        """
+        started = []
+
+        def run():
+            started.append(time.monotonic())
+            on_start()
+            return self._run_call(tool_call, knowledge_base_dir)
+
+        return self.executor.submit(tracer.propagate(run)), started
+
+    def run_calls(self, tool_calls, knowledge_base_dir=None):
+        """
+        Run all tool calls concurrently.
+
+        Returns:
+            list: The response of each call, in the order of tool_calls.
+        """
+        submitted = []
+        for tool_call in tool_calls:
+            event = threading.Event()
+            submitted.append((tool_call, event) + self._submit(tool_call, knowledge_base_dir, event.set))
+
+        responses = []
+        for tool_call, event, future, started in submitted:
+            timeout = self.timeout_for(tool_call)
+            # The calls before this one have their responses now
+            if not event.wait(timeout):
+                if future.cancel():
+                    responses.append(self._timeout_response(tool_call, started=False))
+                    continue
+                # It started just now
+                event.wait()
+            try:
+                responses.append(future.result(timeout=max(timeout - (time.monotonic() - started[0]), 0)))
+            except TimeoutError:
+                responses.append(self._timeout_response(tool_call))
+        return responses
+
+    async def arun_calls(self, tool_calls, knowledge_base_dir=None):
+        """
+        asyncio variant of run_calls, for use from an event loop.
+        """
+        loop = asyncio.get_running_loop()
+        answered = [asyncio.Event() for _ in tool_calls]
+
+        async def wait_started(event, previous_answered, timeout):
+            if previous_answered is not None:
+                waits = [asyncio.ensure_future(event.wait()), asyncio.ensure_future(previous_answered.wait())]
+                await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                for wait in waits:
+                    wait.cancel()
+            await asyncio.wait_for(event.wait(), timeout)
+
+        async def run_one(index, tool_call):
+            timeout = self.timeout_for(tool_call)
+            event = asyncio.Event()
+            future, started = self._submit(tool_call, knowledge_base_dir, lambda: loop.call_soon_threadsafe(event.set))
+            try:
+                try:
+                    await wait_started(event, answered[index - 1] if index else None, timeout)
+                except asyncio.TimeoutError:
+                    if future.cancel():
+                        return self._timeout_response(tool_call, started=False)
+                    await event.wait()
+                return await asyncio.wait_for(asyncio.wrap_future(future), max(timeout - (time.monotonic() - started[0]), 0))
+            except asyncio.TimeoutError:
+                return self._timeout_response(tool_call)
+            finally:
+                answered[index].set()
+
+        return list(await asyncio.gather(*(run_one(index, tool_call) for index, tool_call in enumerate(tool_calls))))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,201 @@
+import os
+import time
+import asyncio
+
+from ollama_client import AsyncOllamaClient
+from model_handler import SCOUT_SYSTEM_PROMPT, ANALYSIS_SYSTEM_PROMPT, with_icon
+from intent_router import CLEAR, INDEX, ANALYZE, RAG_QUESTION
+from RAG.rag_handler import document_sources
+from scheduler import FairScheduler, SchedulerFull
+from sessions import SessionManager
+from Tools.tool_registry import ToolRegistry
+from tracing import tracer
+
+VOID_RAG_RESPONSE = "VOID RAG RESPONSE"
+
+
+class AsyncModelhandler:
+    """
+    asyncio front end over a Modelhandler for serving several users at once.
+
+    Every session gets its own history, active repositories and scratch directory, so one
+    user's "clear history" only touches that user's data. Model calls go through the
+    non-blocking client and a fair scheduler that bounds concurrency and queue depth
+    towards Ollama; retrieval, indexing and tools, which are CPU- or disk-bound, run in
+    worker threads so they never block the event loop.
+    """
+
+    def __init__(self, model_handler, **kwargs):
+        self.handler = model_handler
+        self.sessions = kwargs.get("sessions") or SessionManager(
+            root_dir=kwargs.get("sessions_dir", "sessions"),
+            idle_timeout=kwargs.get("session_idle_timeout", 3600),
+        )
+        self.scheduler = FairScheduler(
+            max_concurrency=kwargs.get("max_concurrency", 4),
+            max_queue_depth=kwargs.get("max_queue_depth", 32),
+            max_queued_per_session=kwargs.get("max_queued_per_session", 4),
+        )
+        # Sent with every model request, e.g. "30m", to keep the model loaded between requests
+        self.keep_alive = kwargs.get("keep_alive")
+        # Created on first use, so that it belongs to the serving event loop
+        self.client = None
+
+    def _client(self):
+        if self.client is None:
+            self.client = AsyncOllamaClient(max_concurrency=self.scheduler.max_concurrency, keep_alive=self.keep_alive)
+        return self.client
+
+    async def _stream_chat(self, session, url, payload, tool_calls=None):
+        async with self.scheduler.slot(session.session_id):
+            async for partial in self._client().stream_chat(url, payload, tool_calls):
+                yield partial
+
+    async def _stream_cached_chat(self, session, url, payload, message, key, sources=()):
+        """
+        Async counterpart of Modelhandler._stream_cached_chat, with an explicit cache key.
+        """
+        rag_handler = self.handler.rag_handler
+        response = await asyncio.to_thread(rag_handler.cached_response, key, message)
+        if response is not None:
+            yield response
+            return
+
+        response = ""
+        async for response in self._stream_chat(session, url, payload):
+            yield response
+        await asyncio.to_thread(rag_handler.cache_response, key, message, response, sources)
+
+    async def _stream_rag_response(self, session, message):
+        """
+        Async counterpart of Modelhandler._stream_rag_response, searching the session's repositories.
+        """
+        rag_handler = self.handler.rag_handler
+        gate = await asyncio.to_thread(rag_handler.relevance_gate, message, session.active_repositories)
+        if not gate["passed"]:
+            return
+
+        streamed = False
+        with tracer.span("rag_answer") as span:
+            # Packing embeds the candidate chunks, so it runs off the event loop
+            payload = await asyncio.to_thread(rag_handler.rag_payload, message, gate["documents"])
+            key = rag_handler.rag_cache_key(gate["documents"])
+            async for partial in self._stream_cached_chat(session, rag_handler.model_url, payload, message, key,
+                                                          document_sources(gate["documents"])):
+                stripped = partial.strip()
+                if VOID_RAG_RESPONSE in stripped:
+                    span.set(void_response=True, streamed=streamed)
+                    if streamed:
+                        yield None
+                    return
+                if VOID_RAG_RESPONSE.startswith(stripped):
+                    continue
+                streamed = True
+                yield partial
+            span.set(streamed=streamed)
+
+    def clear_session(self, session, repo_path=None):
+        """
+        Clear a session's history and scratch directory, and drop the collections of its
+        repositories (or only repo_path) that no other session is using.
+        """
+        session.clear()
+        repo_paths = [os.path.abspath(repo_path)] if repo_path else list(session.active_repositories)
+        for path in repo_paths:
+            if path in session.active_repositories:
+                session.active_repositories.remove(path)
+            if self.sessions.sessions_using(path, exclude=session):
+                print(f"Keeping the collection of {path}, other sessions are using it")
+                continue
+            self.handler.rag_handler.reset_vectorstore_data(path)
+
+    async def chat(self, message, history, session):
+        """
+        Answer one message for a session, following the same routes as Modelhandler.chat_with_tool.
+
+        Yields:
+            str: The response so far.
+        """
+        handler = self.handler
+        route, repository_path = await asyncio.to_thread(handler.route_message, message, session.active_repositories)
+        session.last_intent = route["intent"]
+
+        if route["intent"] == CLEAR:
+            await asyncio.to_thread(self.clear_session, session, repository_path)
+            yield "Reset the history and cleared stored data"
+            return
+
+        if route["intent"] == INDEX:
+            yield handler.indexing_reply(message, repository_path, session.active_repositories)
+            return
+
+        if route["intent"] == RAG_QUESTION:
+            answered_from_rag = False
+            async for partial in self._stream_rag_response(session, message):
+                answered_from_rag = partial is not None
+                if answered_from_rag:
+                    yield partial
+            if answered_from_rag:
+                return
+
+        if route["intent"] == ANALYZE:
+            messages = handler.context_builder.build(ANALYSIS_SYSTEM_PROMPT, history, message, model=handler.model)
+            async for partial in self.run_agent(session, messages, handler.analysis_tool_calls(repository_path)):
+                yield partial
+            return
+
+        payload = {
+            "model": handler.model,
+            "messages": handler.context_builder.build(SCOUT_SYSTEM_PROMPT, history, message, model=handler.model),
+        }
+        async for partial in self._stream_cached_chat(session, handler.localAPIUrl, payload, message,
+                                                      handler.chat_cache_key(payload)):
+            yield partial
+
+    async def run_agent(self, session, messages, tool_calls=None):
+        """
+        Async counterpart of Modelhandler.run_agent. Tool files go to the session's scratch directory.
+        """
+        handler = self.handler
+        round_number, content = 0, ""
+        while True:
+            if tool_calls:
+                yield f"Running {', '.join(ToolRegistry.call_name(tool_call) for tool_call in tool_calls)}..."
+                with tracer.span("tool_round", round=round_number + 1, calls=len(tool_calls)):
+                    responses = await handler.tool_registry.arun_calls(tool_calls, session.knowledge_base_dir)
+                handler.append_tool_results(messages, content, tool_calls, responses)
+                round_number += 1
+
+            payload = handler.agent_payload(messages, round_number)
+            tool_calls = []
+            content = ""
+            async for content in self._stream_chat(session, handler.localAPIUrl, payload, tool_calls):
+                yield content
+            if not tool_calls or "tools" not in payload:
+                return
+
+    async def chat_with_tool_icon(self, message, history, session_id=None):
+        """
+        Gradio entry point: like Modelhandler.chat_with_tool_icon, for the session session_id.
+        The session keeps its own copy of the history, so that clearing it takes effect.
+        """
+        session = self.sessions.get(session_id)
+        with tracer.span("chat_turn", session=session.session_id) as span:
+            response = ""
+            try:
+                async for partial in self.chat(message, session.history_for(history), session):
+                    if not response:
+                        span.set(first_yield_seconds=time.perf_counter() - span.start)
+                    response = partial
+                    yield with_icon(partial)
+            except SchedulerFull as e:
+                span.set(rejected=str(e))
+                yield with_icon("I'm answering a lot of questions right now, please try again in a moment.")
+                return
+            if session.last_intent != CLEAR:
+                session.add_turn(message, response, history)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+
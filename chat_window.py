@@ -1,16 +1,75 @@
-from model_handler import Modelhandler
-from Tools.repo_analyzer import RepoAnalyzer
-import gradio as gr
+from startup import timer as startup_timer
+from tracing import tracer
+import os
+import threading
+
+with startup_timer.stage("import handlers"):
+    from model_handler import Modelhandler
+    from async_model_handler import AsyncModelhandler
+    from Tools.repo_analyzer import RepoAnalyzer
+    from model_residency import ModelResidencyManager
+    from ollama_client import get_client
 
 
 OLLAMA_API = "http://localhost:11434/api/chat"
 # MODEL = "deepseek-r1"
 MODEL = "llama3.2"
+# Per-stage latency histograms are served on http://127.0.0.1:<port>/metrics; 0 disables the endpoint
+METRICS_PORT = int(os.environ.get("ASSISTANT_METRICS_PORT", "9464"))
+# Model requests in flight at once across all users, and how many may wait for a slot
+OLLAMA_CONCURRENCY = int(os.environ.get("ASSISTANT_OLLAMA_CONCURRENCY", "4"))
+OLLAMA_QUEUE_DEPTH = int(os.environ.get("ASSISTANT_OLLAMA_QUEUE_DEPTH", "32"))
+# How long Ollama keeps the model loaded after a request, and seconds between warm pings (0 disables them)
+OLLAMA_KEEP_ALIVE = os.environ.get("ASSISTANT_KEEP_ALIVE", "30m")
+WARM_PING_INTERVAL = float(os.environ.get("ASSISTANT_WARM_PING_INTERVAL", "240"))
+
+
+def report_when_warm(api, residency):
+    """
+    Print the startup report again once the background warm-up has finished.
+    """
+    api.rag_handler.wait_until_ready()
+    residency.preloaded.wait()
+    startup_timer.report()
+
 
 if __name__ == "__main__":
-    # Initialize the tool and model handler
-    tool = RepoAnalyzer(model=MODEL, localApiUrl=OLLAMA_API)
-    api = Modelhandler(localAPIUrl=OLLAMA_API, model=MODEL, tool=tool)
+    # Initialize the tool and model handler; the vector store warms up in the background
+    with startup_timer.stage("create handlers"):
+        tool = RepoAnalyzer(model=MODEL, localApiUrl=OLLAMA_API)
+        api = Modelhandler(localAPIUrl=OLLAMA_API, model=MODEL, tool=tool, background_init=True)
+        # Each browser session gets its own history, repositories and scratch directory
+        # Load the models while the UI starts and keep them loaded
+        residency = ModelResidencyManager(OLLAMA_API, [MODEL, api.rag_handler.model, tool.model],
+                                          keep_alive=OLLAMA_KEEP_ALIVE, ping_interval=WARM_PING_INTERVAL)
+        residency.attach(get_client())
+        residency.start()
+        async_api = AsyncModelhandler(api, max_concurrency=OLLAMA_CONCURRENCY, max_queue_depth=OLLAMA_QUEUE_DEPTH,
+                                      keep_alive=residency.keep_alive)
+
+    with startup_timer.stage("import gradio"):
+        import gradio as gr
+
+    async def chat(message, history, request: gr.Request):
+        async for response in async_api.chat_with_tool_icon(message, history, request.session_hash):
+            yield response
+
+    def end_session(request: gr.Request):
+        async_api.sessions.close(request.session_hash)
+
+    with startup_timer.stage("launch UI"):
+        # No Gradio-level concurrency limit: the scheduler bounds the requests sent to Ollama
+        demo = gr.ChatInterface(fn=chat, type="messages", concurrency_limit=None)
+        demo.unload(end_session)
+        demo.launch(prevent_thread_lock=True)
 
-    gr.ChatInterface(fn=api.chat_with_tool_icon, type="messages").launch()
+    if METRICS_PORT:
+        tracer.start_metrics_server(METRICS_PORT)
 
+    startup_timer.report()
+    threading.Thread(target=report_when_warm, args=(api, residency), daemon=True).start()
+    try:
+        demo.block_thread()
+    finally:
+        residency.close(timeout=1)
+        residency.report()
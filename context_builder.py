@@ -0,0 +1,116 @@
+from functools import lru_cache
+
+
+# Context window (in tokens) assumed for each model; unknown models use DEFAULT_CONTEXT_BUDGET
+MODEL_CONTEXT_BUDGETS = {
+    "llama3.2": 8192,
+    "deepseek-r1": 8192,
+}
+DEFAULT_CONTEXT_BUDGET = 4096
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable, estimating token counts from characters: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """
+    Count tokens with tiktoken's cl100k_base encoding. It is not the exact tokenizer of
+    local models, but it is close enough for budgeting.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Truncate text to at most max_tokens tokens.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        # The longest prefix that count_tokens still estimates at max_tokens
+        return text[:max(max_tokens * 4 - 1, 0)]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def message_tokens(message):
+    # A few tokens of per-message overhead for the role and separators
+    return count_tokens(str(message.get("content") or "")) + 4
+
+
+class ContextBuilder:
+    """
+    Assembles chat messages within a per-model token budget.
+
+    The system prompt always comes first and old history is dropped in blocks of
+    trim_step messages, so the start of the prompt stays identical from turn to turn
+    until the budget is exceeded again. That keeps Ollama's prompt cache effective.
+    """
+
+    def __init__(self, **kwargs):
+        self.budgets = {**MODEL_CONTEXT_BUDGETS, **kwargs.get("budgets", {})}
+        self.default_budget = kwargs.get("default_budget", DEFAULT_CONTEXT_BUDGET)
+        self.response_reserve = kwargs.get("response_reserve", 1024)
+        self.trim_step = kwargs.get("trim_step", 8)
+
+    def budget_for(self, model):
+        """
+        Tokens available for the prompt, after reserving room for the response.
+        """
+        base_model = (model or "").split(":")[0]
+        budget = self.budgets.get(model, self.budgets.get(base_model, self.default_budget))
+        return max(budget - self.response_reserve, 256)
+
+    def build(self, system_prompt, history, message, model=None):
+        """
+        Build [system] + history + [user] so that it fits in the model's budget.
+
+        Returns:
+            list: Messages ready for the chat API.
+        """
+        budget = self.budget_for(model)
+        system_message = {"role": "system", "content": system_prompt}
+        user_message = {"role": "user", "content": truncate_to_tokens(message, budget // 2)}
+        history = [{"role": turn.get("role"), "content": str(turn.get("content") or "")} for turn in history or []]
+
+        available = budget - message_tokens(system_message) - message_tokens(user_message)
+        history_tokens = [message_tokens(turn) for turn in history]
+
+        # Drop the oldest messages in whole blocks until the rest fits
+        cut = 0
+        remaining = sum(history_tokens)
+        while remaining > available and cut < len(history):
+            step = min(self.trim_step, len(history) - cut)
+            remaining -= sum(history_tokens[cut:cut + step])
+            cut += step
+
+        messages = [system_message]
+        if cut:
+            messages.append({"role": "system", "content": f"[{cut} earlier messages omitted]"})
+        return messages + history[cut:] + [user_message]
+
+    def fit_tool_responses(self, messages, contents, model=None):
+        """
+        Truncate several tool responses so that together they fit in what is left of the
+        budget after messages. The budget is shared evenly; what a short response does not
+        use goes to the longer ones.
+        """
+        remaining = self.budget_for(model) - sum(message_tokens(message) for message in messages) - 4 * len(contents)
+        fitted = [None] * len(contents)
+        by_length = sorted(range(len(contents)), key=lambda index: count_tokens(contents[index]))
+        for position, index in enumerate(by_length):
+            share = max(remaining, 0) // (len(contents) - position)
+            fitted[index] = truncate_to_tokens(contents[index], share)
+            remaining -= count_tokens(fitted[index])
+        return fitted
@@ -0,0 +1,161 @@
+import re
+
+import numpy as np
+
+from tracing import tracer
+from RAG.embedding import get_embedding_model, embed_documents_array
+
+CLEAR = "clear"
+INDEX = "index"
+ANALYZE = "analyze"
+RAG_QUESTION = "rag"
+GENERAL = "general"
+
+# Clearing deletes the index and the knowledge base, so it needs one of these exact phrases
+CLEAR_PHRASES = ("clear history", "clear context", "clear data")
+
+# Example messages of each intent, without paths; their mean embedding is the intent's centroid
+DEFAULT_EXAMPLES = {
+    INDEX: [
+        "use rag",
+        "use retrieval augmented generation on this folder",
+        "index the repository",
+        "using rag for this project",
+        "add this directory to the knowledge base",
+        "indexing status",
+        "how far along is the indexing",
+        "cancel indexing",
+        "stop indexing the repository",
+    ],
+    ANALYZE: [
+        "analyze",
+        "analyze the repository at",
+        "summarize the codebase in",
+        "what is in the directory",
+        "give me an overview of the folder",
+        "review the code in this folder and explain its structure",
+    ],
+    RAG_QUESTION: [
+        "what does the session_cache function do",
+        "where is the database connection configured in the code",
+        "how does this repository handle authentication",
+        "explain the UserService class",
+        "which files call parse_config",
+        "why does the retry loop in the client sleep",
+        "show me how errors are logged in the project",
+    ],
+    GENERAL: [
+        "hi there",
+        "tell me a short story about a puppy",
+        "what is the capital of france",
+        "write a poem about the sea",
+        "explain what recursion is",
+        "how do I reverse a list in python",
+        "thanks, that helps",
+    ],
+}
+
+# Minimum cosine similarity to an intent's centroid for the intent to be chosen
+DEFAULT_THRESHOLDS = {INDEX: 0.35, ANALYZE: 0.35, RAG_QUESTION: 0.25, GENERAL: 0.0}
+
+
+def is_clear_request(message):
+    text = message.lower()
+    return any(phrase in text for phrase in CLEAR_PHRASES)
+
+
+class IntentRouter:
+    """
+    Classifies a message as index, analyze, RAG question or general by its cosine
+    similarity to the centroid of each intent's example messages, embedded with the RAG
+    handler's embedding model. Clearing is destructive and is never chosen by similarity:
+    it needs one of CLEAR_PHRASES. Paths are removed from the message first, since the path
+    tells nothing about the intent. Message embeddings go through the RAG handler's query
+    cache, so retrieval for a RAG question without a path reuses them.
+
+    Intents that need a repository path, or indexed repositories, are only chosen when
+    those exist; a message that matches no intent closely enough is general. Until the
+    embedding model has loaded, or if it failed to load, routing falls back to keyword checks.
+    """
+
+    def __init__(self, rag_handler, **kwargs):
+        self.rag_handler = rag_handler
+        self.examples = {intent: list(examples) for intent, examples in DEFAULT_EXAMPLES.items()}
+        for intent, examples in (kwargs.get("examples") or {}).items():
+            self.examples.setdefault(intent, []).extend(examples)
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(kwargs.get("thresholds") or {})}
+        self.intents = None
+        self.centroids = None
+
+    def _load_centroids(self):
+        embedding_model = get_embedding_model(self.rag_handler.embedding_model_name)
+        intents, centroids = [], []
+        for intent, examples in self.examples.items():
+            vectors = embed_documents_array(embedding_model, examples)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            centroid = vectors.mean(axis=0)
+            intents.append(intent)
+            centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+        self.intents, self.centroids = intents, np.stack(centroids)
+
+    def scores(self, message):
+        """
+        Cosine similarity of the message to each intent's centroid.
+        """
+        if self.centroids is None:
+            self._load_centroids()
+        text = re.sub(r"(?<!\S)/\S+", " ", message).strip()
+        vector = np.asarray(self.rag_handler.embed_query(text or message), dtype=np.float32)
+        vector = vector / max(np.linalg.norm(vector), 1e-12)
+        return dict(zip(self.intents, (self.centroids @ vector).tolist()))
+
+    def route(self, message, repository_path=None, active_repositories=None):
+        """
+        Pick the one path a message takes.
+
+        Returns:
+            dict: {"intent", "similarity", "scores", "method"}
+        """
+        with tracer.span("route") as span:
+            route = None
+            if is_clear_request(message):
+                route = {"intent": CLEAR, "similarity": None, "scores": {}, "method": "keywords"}
+            elif self.rag_handler.ready.is_set() and self.rag_handler.embedding_ready:
+                try:
+                    route = self._route_by_embedding(message, repository_path, active_repositories)
+                except Exception as e:
+                    print(f"Routing by embedding failed, falling back to keywords: {e}")
+            if route is None:
+                route = self._route_by_keywords(message, repository_path)
+            span.set(intent=route["intent"], similarity=route["similarity"], method=route["method"])
+        return route
+
+    def _allowed(self, intent, repository_path, active_repositories):
+        if intent == CLEAR:
+            # Only ever chosen by phrase, see is_clear_request
+            return False
+        if intent == ANALYZE:
+            return bool(repository_path)
+        if intent == RAG_QUESTION:
+            return bool(self.rag_handler.select_repositories("", active_repositories) or repository_path)
+        return True
+
+    def _route_by_embedding(self, message, repository_path, active_repositories):
+        scores = self.scores(message)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        for intent, similarity in ranked:
+            if similarity >= self.thresholds.get(intent, 0.0) and self._allowed(intent, repository_path, active_repositories):
+                return {"intent": intent, "similarity": round(similarity, 4), "scores": scores, "method": "embedding"}
+        return {"intent": GENERAL, "similarity": round(scores.get(GENERAL, 0.0), 4), "scores": scores, "method": "embedding"}
+
+    def _route_by_keywords(self, message, repository_path):
+        text = message.lower()
+        if any(phrase in text for phrase in ("use rag", "using rag", "use retrieval augmented generation",
+                                               "indexing status", "index status", "indexing progress",
+                                               "cancel indexing", "stop indexing")):
+            intent = INDEX
+        elif repository_path:
+            intent = ANALYZE
+        else:
+            intent = GENERAL
+        return {"intent": intent, "similarity": None, "scores": {}, "method": "keywords"}
@@ -1,23 +1,63 @@
 import json
-import requests
-from Tools.tool import Tool
+from Tools.tool_registry import ToolRegistry
+from ollama_client import get_client, parse_stream_line
+from context_builder import ContextBuilder
+from tracing import tracer, traced_generator
 from RAG.rag_handler import RAGHandler
+from RAG.response_cache import fingerprint
+from intent_router import IntentRouter, CLEAR, INDEX, ANALYZE, RAG_QUESTION
+from model_residency import canonical_system_prompt
 import re
 import os
-import gradio as gr
 import shutil
 import random
 
+IMAGES = [
+    "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout.jpg",
+    "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout2.jpg",
+    "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout3.jpg"
+
+]
+ICON_HTML = f'<img src="{IMAGES[0]}" alt="icon" style="width:50px; height:40px;">'
+
+# Sent byte for byte the same on every request, so Ollama can reuse their KV cache
+SCOUT_SYSTEM_PROMPT = canonical_system_prompt("You are a helpful assistant puppy named Scout. Be cute but accurate. Be kind, helpful and loving")
+ANALYSIS_SYSTEM_PROMPT = canonical_system_prompt("You are a helpful assistant that analyzes code, folders, and repositories for their content")
+GENERAL_SYSTEM_PROMPT = canonical_system_prompt("You are a helpful assistant")
+
+
+def with_icon(content):
+    """
+    Wrap content as a chat message prefixed with Scout's icon.
+    """
+    return [{"role": "assistant", "content": f"{ICON_HTML} {content}"}]
+
+
 class Modelhandler:
-    def __init__(self, localAPIUrl, model, tool:Tool):
+    def __init__(self, localAPIUrl, model, tool, **rag_kwargs):
         self.localAPIUrl = localAPIUrl
         self.model = model
         self.header = {"Content-Type": "application/json"}
-        self.tools = [
-            {"type": "function", "function": tool.get_tool_function_object()}
-        ]
-        self.tool = tool
-        self.rag_handler = RAGHandler(model=model)
+        self.client = get_client()
+        self.context_builder = ContextBuilder()
+        # tool is a single Tool, a list of tools or a ToolRegistry
+        tool_workers = rag_kwargs.pop("tool_workers", 4)
+        tool_timeout = rag_kwargs.pop("tool_timeout", 600)
+        if isinstance(tool, ToolRegistry):
+            self.tool_registry = tool
+        else:
+            tools = list(tool) if isinstance(tool, (list, tuple)) else [tool]
+            self.tool_registry = ToolRegistry(tools, max_workers=tool_workers, default_timeout=tool_timeout)
+        self.tools = self.tool_registry.function_objects()
+        # Rounds of tool calls the model may make before it has to answer
+        self.max_tool_rounds = rag_kwargs.pop("max_tool_rounds", 3)
+        # Tool run directly, without asking the model first, when a message asks to analyze a path
+        self.analyze_tool = rag_kwargs.pop("analyze_tool", "analyze_repository")
+        router_options = {"thresholds": rag_kwargs.pop("router_thresholds", None),
+                          "examples": rag_kwargs.pop("router_examples", None)}
+        # Extra keyword arguments (e.g. relevance_threshold) configure the RAG handler
+        self.rag_handler = RAGHandler(model=model, **rag_kwargs)
+        self.router = IntentRouter(self.rag_handler, **router_options)
 
 
     
@@ -43,28 +83,64 @@ class Modelhandler:
         return None
 
 
-    def _is_code_analysis_request(self, message):
+    def _is_cancel_indexing_request(self, message):
         """
-        Check if the message is likely a request for repository analysis.
+        Check if the user wants to stop background indexing
         """
-        keywords = ["analyze", "repository", "codebase", "directory"]
-        return any(keyword in message.lower() for keyword in keywords)
-    
-    def _is_rag_request(self, message):
+        return any(phrase in message.lower() for phrase in ("cancel indexing", "stop indexing"))
+
+    def indexing_reply(self, message, repository_path, active_repositories=None):
         """
-        Check if the message is likely a request for repository analysis.
+        Answer a message routed to indexing: cancel jobs if asked to, else start indexing the
+        repository in the message, else report on the jobs. Only the jobs started with
+        active_repositories (a session's list, or the handler's own) are reported or cancelled.
+
+        Returns:
+            str: The reply.
         """
-        if "using rag" in message.lower() or "use rag" in message.lower() or "use retrieval augmented generation" in message.lower() or "use retrieval augmented generation" in message.lower():
-            return True
-        
-    
-    def _is_clear_history_request(self, message):
+        rag_handler = self.rag_handler
+        active_repositories = rag_handler.active_repositories if active_repositories is None else active_repositories
+        jobs = [job for job in rag_handler.indexing_jobs.list(repository_path)
+                if job.active_repositories is active_repositories]
+
+        if self._is_cancel_indexing_request(message):
+            named = [job for job in jobs if job.job_id in message.split()]
+            cancelled = [job for job in named or jobs if job.active]
+            for job in cancelled:
+                job.cancel()
+            if not cancelled:
+                return "No indexing job is running"
+            return "\n".join(f"Cancelling job {job.job_id} ({job.repo_path}); what is indexed so far stays searchable" for job in cancelled)
+
+        if repository_path:
+            job = rag_handler.submit_indexing(repository_path, active_repositories)
+            return (f"Indexing {job.repo_path} in the background as job {job.job_id}. Questions are answered from "
+                    f"what is indexed so far; ask for the indexing status to follow its progress.")
+
+        if not jobs:
+            return "No indexing jobs"
+        return "\n".join(job.describe() for job in jobs)
+
+    def route_message(self, message, active_repositories=None):
         """
-        Check if the user wants to clear hostory
+        Extract the repository path of a message and route it to one intent.
+
+        Returns:
+            tuple: (route dict from IntentRouter.route, repository path or None)
         """
-        if "clear history" in message.lower() or "clear context" in message.lower() or "clear data" in message.lower():  
-            return True
-        
+        with tracer.span("extract_path") as span:
+            repository_path = self.extract_local_directory_path(message)
+            span.set(repository_path=repository_path)
+        return self.router.route(message, repository_path, active_repositories), repository_path
+
+    def analysis_tool_calls(self, repository_path):
+        """
+        The tool call an analyze request makes, run without a model round to decide on it.
+        None if the analysis tool is not registered.
+        """
+        if self.analyze_tool not in self.tool_registry.names():
+            return None
+        return [{"function": {"name": self.analyze_tool, "arguments": {"repository_path": repository_path}}}]
 
     
     def delete_directory_with_files(self, directory_path):
@@ -85,213 +161,215 @@ class Modelhandler:
             return f"Directory '{directory_path}' does not exist."
 
     
-    def chat_with_tool(self, message, history):
-        # Build the conversation history with system, previous messages, and the current user input
+    def _stream_chat(self, payload, tool_calls=None):
+        """
+        Send a streaming chat request to the model.
 
-        if self._is_clear_history_request(message):
+        Args:
+            payload (dict): Request payload; "stream" is forced to True.
+            tool_calls (list, optional): Collects any tool calls the model makes while streaming.
 
-            # Restart the application
-            gr.update(history=[])
-            self.delete_directory_with_files("knowledge_base")
-            self.rag_handler.reset_vectorstore_data()
-            return "Reset the history and cleared stored data"
+        Yields:
+            str: Accumulated content from the streamed response.
+        """
+        yield from self.client.stream_chat(self.localAPIUrl, payload, tool_calls)
 
 
-        
-        repository_path = self.extract_local_directory_path(message)
-        print(f"Extracted repository: {repository_path}")
+    def chat_cache_key(self, payload):
+        """
+        Response cache key of a chat payload: the model, the system prompt and the conversation before the question.
+        """
+        return fingerprint(payload["model"], json.dumps(payload["messages"][:-1], sort_keys=True, default=str))
 
-        if repository_path and self._is_rag_request(message):
-            self.rag_handler.update_vectorstore(repository_path)
-            return "Rag vector store updated"
-        
-        rag_response = self.rag_handler.chat(message).strip()
-        print(f"Response from rag_handler object: \n{rag_response}")
-        if  rag_response != "NIL":
-            print(f"Responding through rag vector store which gave the following response \n\n {rag_response}")
-            return rag_response
-
-        if not repository_path:
-            # Skip tool processing and directly respond to general messages
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "system", "content": "You are a helpful assistant"}] + history + [{"role": "user", "content": message}],
-                "stream": False
-            }
-            response = requests.post(self.localAPIUrl, json=payload, headers=self.header)
-            if response.status_code == 200:
-                return response.json().get("message", {}).get("content", "")
-            else:
-                raise Exception(f"Error: {response.status_code}, {response.text}")
-            
-       
-
-        messages = [{"role": "system", "content": "You are a helpful assistant to that analyzes code, folders repositories for their content"}] + history + [{"role": "user", "content": message}]
-
-        # Prepare the payload
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "tools": self.tools,  # Pass tools to the model
-            "stream": False       # Non-streaming request
-        }
 
-        # Make the API request
-        response = requests.post(self.localAPIUrl, json=payload, headers=self.header)
+    def _stream_cached_chat(self, payload, message):
+        """
+        Stream a chat without tools, answering repeated questions from the response cache when it is enabled.
+        """
+        key = self.chat_cache_key(payload)
+        response = self.rag_handler.cached_response(key, message)
+        if response is not None:
+            yield response
+            return
 
+        response = ""
+        for response in self._stream_chat(payload):
+            yield response
+        self.rag_handler.cache_response(key, message, response)
 
-        if response.status_code == 200:
-            response_data = response.json()
-            assistant_message = response_data.get("message", {})
-            
-            # Check if a tool is being called
-            tool_calls = assistant_message.get("tool_calls", [])
-            print(f"Tool calls: {tool_calls}")
-            if tool_calls:
-                tool_call = tool_calls[0]  # Assume a single tool call for simplicity
-                
-
-                arguments = tool_call["function"]["arguments"]
-                # Call the corresponding tool handler
-                tool_response = self.tool.handle_tool_call(arguments)
-                
-                # Append the tool response to the conversation
-                messages.append({"role": "assistant", "content": "", "tool_calls": [tool_call]})
-                messages.append({"role": "tool", "content": tool_response})
-
-                # Make a follow-up API call with updated messages
-                follow_up_payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "stream": False
-                }
-                follow_up_response = requests.post(self.localAPIUrl, json=follow_up_payload, headers=self.header)
-                if follow_up_response.status_code == 200:
-                    follow_up_data = follow_up_response.json()
-                    final_content = follow_up_data.get("message", {}).get("content", "")
-                    return final_content  # Return the assistant's final response
-                else:
-                    raise Exception(f"Follow-up Error: {follow_up_response.status_code}, {follow_up_response.text}")
-
-            else:
-                # If no tool is called, return the assistant's content directly
-                return assistant_message.get("content", "")
-        else:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
-        
 
-    def chat_with_tool_icon(self, message, history):
+    def agent_payload(self, messages, round_number):
+        """
+        Payload of one agent round. The round after the last allowed tool round offers no
+        tools, so the model has to answer.
+        """
+        payload = {"model": self.model, "messages": messages}
+        if round_number < self.max_tool_rounds:
+            payload["tools"] = self.tools
+        return payload
 
-        IMAGES = [
-            "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout.jpg",
-            "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout2.jpg",
-            "https://raw.githubusercontent.com/gitpranjal/PersonalAssistant/main/static/scout3.jpg"
 
-        ]
- 
-         # Randomly select an icon URL
-        ICON_URL = IMAGES[0]
-        ICON_HTML = f'<img src="{ICON_URL}" alt="icon" style="width:50px; height:40px;">'
+    def append_tool_results(self, messages, content, tool_calls, responses):
+        """
+        Append an assistant turn with its tool calls, followed by the tool responses fitted to the context budget.
+        """
+        messages.append({"role": "assistant", "content": content, "tool_calls": tool_calls})
+        fitted = self.context_builder.fit_tool_responses(messages, responses, model=self.model)
+        for tool_call, response in zip(tool_calls, fitted):
+            messages.append({"role": "tool", "content": response, "tool_name": ToolRegistry.call_name(tool_call)})
 
 
-        # Check if the history needs to be cleared
-        if self._is_clear_history_request(message):
+    def run_agent(self, messages, knowledge_base_dir=None, tool_calls=None):
+        """
+        Agent loop: stream the model's answer and, while it asks for tools, run all tool calls
+        of the turn concurrently and feed their responses back, for up to max_tool_rounds rounds.
+        tool_calls, if given, are run first as the first round, as if the model had made them.
+
+        Yields:
+            str: The streamed content of each round, and a status line before each batch of tool calls.
+        """
+        round_number, content = 0, ""
+        while True:
+            if tool_calls:
+                yield f"Running {', '.join(ToolRegistry.call_name(tool_call) for tool_call in tool_calls)}..."
+                with tracer.span("tool_round", round=round_number + 1, calls=len(tool_calls)):
+                    responses = self.tool_registry.run_calls(tool_calls, knowledge_base_dir)
+                self.append_tool_results(messages, content, tool_calls, responses)
+                round_number += 1
+
+            payload = self.agent_payload(messages, round_number)
+            tool_calls = []
+            content = ""
+            for content in self._stream_chat(payload, tool_calls):
+                yield content
+            if not tool_calls or "tools" not in payload:
+                return
+
+
+    def _stream_rag_response(self, message):
+        """
+        Stream the RAG handler's response, holding it back while it could still turn out to be 'VOID RAG RESPONSE'.
+
+        Yields nothing if the RAG handler has no relevant answer, and a final None if the response
+        turned out to be void after part of it was already streamed.
+        """
+        void_response = "VOID RAG RESPONSE"
+        streamed = False
+        with tracer.span("rag_answer") as span:
+            for partial in self.rag_handler.stream_chat(message):
+                stripped = partial.strip()
+                if void_response in stripped:
+                    span.set(void_response=True, streamed=streamed)
+                    if streamed:
+                        yield None
+                    return
+                if void_response.startswith(stripped):
+                    continue
+                streamed = True
+                yield partial
+            span.set(streamed=streamed)
+
+
+    @traced_generator("chat_turn")
+    def chat_with_tool(self, message, history):
+        # Only the path the router picks runs, so each turn makes as few model calls as possible
+        route, repository_path = self.route_message(message)
+
+        if route["intent"] == CLEAR:
+
+            # Restart the application
+            import gradio as gr
             gr.update(history=[])
             self.delete_directory_with_files("knowledge_base")
-            self.rag_handler.reset_vectorstore_data()
-            return [{"role": "assistant", "content": f"{ICON_HTML} Reset the history and cleared stored data"}]
-
-        repository_path = self.extract_local_directory_path(message)
-        print(f"Extracted repository: {repository_path}")
-
-        # Update vectorstore if necessary
-        if repository_path and self._is_rag_request(message):
-            self.rag_handler.update_vectorstore(repository_path)
-            return [{"role": "assistant", "content": f"{ICON_HTML} Rag vector store updated"}]
-
-        # Check RAG handler response
-        rag_response = self.rag_handler.chat(message).strip()
-        print(f"Response from rag_handler object: \n{rag_response}")
-        if  "VOID RAG RESPONSE" not in rag_response:
-            print(f"Responding through rag vector store which gave the following response \n\n {rag_response}")
-            return [{"role": "assistant", "content": f"{ICON_HTML} {rag_response}"}]
-
-        # Handle cases without repository path
-        if not repository_path:
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "system", "content": "You are a helpful assistant puppy named Scout. Be cute but accurate. Be kind, helpful and loving"}]
-                            + history
-                            + [{"role": "user", "content": message}],
-                "stream": False
-            }
-            response = requests.post(self.localAPIUrl, json=payload, headers=self.header)
-            if response.status_code == 200:
-                assistant_response = response.json().get("message", {}).get("content", "")
-                return [{"role": "assistant", "content": f"{ICON_HTML} {assistant_response}"}]
-            else:
-                raise Exception(f"Error: {response.status_code}, {response.text}")
-
-        # Prepare messages for the API call
-        messages = [{"role": "system", "content": "You are a helpful assistant that analyzes code, folders, and repositories for their content"}]
-        messages += history + [{"role": "user", "content": message}]
-
-        # Prepare the payload
+            # Only the named repository's collection is dropped if the message names one
+            self.rag_handler.reset_vectorstore_data(repository_path)
+            yield "Reset the history and cleared stored data"
+            return
+
+        # Indexing runs as a background job; its progress can be asked for while chatting
+        if route["intent"] == INDEX:
+            yield self.indexing_reply(message, repository_path)
+            return
+
+        if route["intent"] == RAG_QUESTION:
+            answered_from_rag = False
+            for partial in self._stream_rag_response(message):
+                answered_from_rag = partial is not None
+                if answered_from_rag:
+                    yield partial
+            if answered_from_rag:
+                return
+
+        if route["intent"] == ANALYZE:
+            messages = self.context_builder.build(ANALYSIS_SYSTEM_PROMPT, history, message, model=self.model)
+
+            # Run the analysis right away; the model may still call tools, possibly several at once and over several rounds
+            yield from self.run_agent(messages, tool_calls=self.analysis_tool_calls(repository_path))
+            return
+
+        # Respond to general messages without tools
         payload = {
             "model": self.model,
-            "messages": messages,
-            "tools": self.tools,
-            "stream": False
+            "messages": self.context_builder.build(GENERAL_SYSTEM_PROMPT, history, message, model=self.model),
         }
+        yield from self._stream_cached_chat(payload, message)
+        
 
-        # Make the API call
-        response = requests.post(self.localAPIUrl, json=payload, headers=self.header)
-        if response.status_code == 200:
-            response_data = response.json()
-            assistant_message = response_data.get("message", {})
+    @traced_generator("chat_turn")
+    def chat_with_tool_icon(self, message, history):
+        # Only the path the router picks runs, so each turn makes as few model calls as possible
+        route, repository_path = self.route_message(message)
 
-            # Check if a tool is being called
-            tool_calls = assistant_message.get("tool_calls", [])
-            print(f"Tool calls: {tool_calls}")
-            if tool_calls:
-                tool_call = tool_calls[0]
-                arguments = tool_call["function"]["arguments"]
-
-                # Call the tool handler
-                tool_response = self.tool.handle_tool_call(arguments)
-
-                # Append tool response to messages
-                messages.append({"role": "assistant", "content": "", "tool_calls": [tool_call]})
-                messages.append({"role": "tool", "content": tool_response})
-
-                # Make a follow-up API call
-                follow_up_payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "stream": False
-                }
-                follow_up_response = requests.post(self.localAPIUrl, json=follow_up_payload, headers=self.header)
-                if follow_up_response.status_code == 200:
-                    follow_up_data = follow_up_response.json()
-                    final_content = follow_up_data.get("message", {}).get("content", "")
-                    return [{"role": "assistant", "content": f"{ICON_HTML} {final_content}"}]
-                else:
-                    raise Exception(f"Follow-up Error: {follow_up_response.status_code}, {follow_up_response.text}")
-
-            else:
-                # Return the assistant's content with an icon
-                return [{"role": "assistant", "content": f"{ICON_HTML} {assistant_message.get('content', '')}"}]
-        else:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
+        # Check if the history needs to be cleared
+        if route["intent"] == CLEAR:
+            import gradio as gr
+            gr.update(history=[])
+            self.delete_directory_with_files("knowledge_base")
+            # Only the named repository's collection is dropped if the message names one
+            self.rag_handler.reset_vectorstore_data(repository_path)
+            yield with_icon("Reset the history and cleared stored data")
+            return
+
+        # Start, report on or cancel background indexing
+        if route["intent"] == INDEX:
+            yield with_icon(self.indexing_reply(message, repository_path))
+            return
+
+        # Stream the RAG handler response if it has a relevant answer
+        if route["intent"] == RAG_QUESTION:
+            answered_from_rag = False
+            for partial in self._stream_rag_response(message):
+                answered_from_rag = partial is not None
+                if answered_from_rag:
+                    yield with_icon(partial)
+            if answered_from_rag:
+                return
+
+        if route["intent"] == ANALYZE:
+            messages = self.context_builder.build(ANALYSIS_SYSTEM_PROMPT, history, message, model=self.model)
+
+            # Run the analysis right away; the model may still call tools, possibly several at once and over several rounds
+            for partial in self.run_agent(messages, tool_calls=self.analysis_tool_calls(repository_path)):
+                yield with_icon(partial)
+            return
+
+        # General messages are answered without tools
+        payload = {
+            "model": self.model,
+            "messages": self.context_builder.build(SCOUT_SYSTEM_PROMPT, history, message, model=self.model),
+        }
+        for partial in self._stream_cached_chat(payload, message):
+            yield with_icon(partial)
 
 
 
-    def stream_responses(self, response):
+    def stream_responses(self, response, tool_calls=None):
         """
         Stream responses from a given HTTP response.
 
         Args:
             response (requests.Response): The HTTP response object with streaming enabled.
+            tool_calls (list, optional): Extended with any tool calls found in the streamed messages.
 
         Yields:
             str: Accumulated content from the streamed response.
@@ -300,10 +378,6 @@ class Modelhandler:
 
         for line in response.iter_lines(decode_unicode=True):
             if line:
-                data = json.loads(line)  # Parse each line as JSON
-                message = data.get("message", {})
-                content = message.get("content", "")
-
+                accumulated_content, content, _ = parse_stream_line(line, accumulated_content, tool_calls)
                 if content:
-                    accumulated_content += content  # Accumulate content
                     yield accumulated_content  # Yield the accumulated content
@@ -0,0 +1,159 @@
+import re
+import time
+import threading
+
+from ollama_client import get_client, OllamaError
+from startup import timer as startup_timer
+from tracing import tracer, COLD_LOAD_SECONDS
+
+
+def canonical_system_prompt(prompt):
+    """
+    Normalize a system prompt to one exact text: every line stripped, runs of whitespace
+    collapsed and blank lines dropped. Ollama reuses the KV cache of a previous request for
+    the longest identical token prefix, so the same prompt must always be sent byte for byte.
+    """
+    lines = (re.sub(r"\s+", " ", line).strip() for line in (prompt or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def parse_keep_alive(value):
+    """
+    keep_alive as Ollama expects it: a duration string such as "30m", or a number of seconds
+    (negative keeps the model loaded for ever). Numeric strings, e.g. from the environment,
+    become numbers, since Ollama would reject them as durations without a unit.
+    """
+    if isinstance(value, str) and re.fullmatch(r"\s*-?\d+(\.\d+)?\s*", value):
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return value
+
+
+class ModelResidencyManager:
+    """
+    Keeps the assistant's Ollama models loaded, so that a question after idle time does not
+    pay for loading the model.
+
+    start() preloads every model in a background thread (a chat request without messages
+    only loads the model) and then pings each one every ping_interval seconds, which resets
+    its keep-alive and reloads it if Ollama evicted it. attach() makes a client send
+    keep_alive with every request, so the models stay resident between pings as well.
+
+    First-token latencies of streamed requests are split into cold (the model had to be
+    loaded) and warm by tracing; latency_report() summarizes them per model.
+    """
+
+    def __init__(self, url, models, **kwargs):
+        self.url = url
+        self.models = list(dict.fromkeys(model for model in models if model))
+        # How long Ollama keeps a model loaded after a request, e.g. "30m", "1h" or -1 for ever
+        self.keep_alive = parse_keep_alive(kwargs.get("keep_alive", "30m"))
+        # Seconds between warm pings; 0 only preloads
+        self.ping_interval = kwargs.get("ping_interval", 240)
+        self.client = kwargs.get("client") or get_client()
+        self.timeout = kwargs.get("timeout", (5, 600))
+        self.loads = {}  # model -> result of its latest preload or ping
+        self.preloaded = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def attach(self, client):
+        """
+        Make client send this manager's keep_alive with every request that does not set one.
+        """
+        client.keep_alive = self.keep_alive
+        return client
+
+    def preload(self, model):
+        """
+        Load a model, or refresh its keep-alive if it is loaded already.
+
+        Returns:
+            dict: {"model", "seconds", "load_seconds", "error"}
+        """
+        payload = {"model": model, "messages": [], "keep_alive": self.keep_alive}
+        result = {"model": model, "seconds": None, "load_seconds": None, "error": None}
+        start = time.perf_counter()
+        with tracer.span("model_preload", model=model) as span:
+            try:
+                data = self.client.chat(self.url, payload, timeout=self.timeout)
+                if "load_duration" in data:
+                    result["load_seconds"] = round(data["load_duration"] / 1e9, 3)  # nanoseconds
+            except OllamaError as e:
+                result["error"] = str(e)
+                print(f"Could not preload model {model}: {e}")
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            span.set(**result)
+        self.loads[model] = result
+        return result
+
+    def preload_all(self):
+        for model in self.models:
+            with startup_timer.stage(f"preload {model}"):
+                self.preload(model)
+
+    def _run(self):
+        self.preload_all()
+        self.preloaded.set()
+        while self.ping_interval and not self.stop_event.wait(self.ping_interval):
+            for model in self.models:
+                previous = self.loads.get(model) or {}
+                result = self.preload(model)
+                if result["error"] is None and previous.get("error") is None and (result["load_seconds"] or 0) >= COLD_LOAD_SECONDS:
+                    print(f"Model {model} had been unloaded, reloaded in {result['load_seconds']}s")
+
+    def start(self):
+        """
+        Preload the models and keep pinging them from a daemon thread.
+        """
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="model-residency", daemon=True)
+            self.thread.start()
+        return self
+
+    def close(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def latency_report(self):
+        """
+        Cold and warm first-token latency of streamed requests per model, and the latest preload.
+
+        Returns:
+            dict: model -> {"cold": {"count", "mean_seconds"}, "warm": {...}, "preload": {...}}
+        """
+        report = {model: {} for model in self.models}
+        with tracer.lock:
+            histograms = dict(tracer.histograms)
+        for (metric, model), histogram in histograms.items():
+            for residency in ("cold", "warm"):
+                if metric == f"ollama_{residency}_first_token_seconds":
+                    report.setdefault(model, {})[residency] = {
+                        "count": histogram.count,
+                        "mean_seconds": round(histogram.sum / histogram.count, 3) if histogram.count else None,
+                    }
+        for model, stats in report.items():
+            for residency in ("cold", "warm"):
+                stats.setdefault(residency, {"count": 0, "mean_seconds": None})
+            stats["preload"] = self.loads.get(model)
+        return report
+
+    def report(self):
+        """
+        Print the latency report.
+        """
+        def seconds(value):
+            return f"{value:.3f}s" if value is not None else "-"
+
+        report = self.latency_report()
+        print("Model residency report:")
+        for model, stats in report.items():
+            cold, warm = stats["cold"], stats["warm"]
+            preload = stats["preload"] or {}
+            print(f"  {model:<24} cold first token {seconds(cold['mean_seconds']):>7} ({cold['count']} requests)  "
+                  f"warm first token {seconds(warm['mean_seconds']):>7} ({warm['count']} requests)  "
+                  f"preload {seconds(preload.get('seconds')):>7}")
+        return report
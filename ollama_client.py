@@ -0,0 +1,269 @@
+import json
+import time
+import random
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import tracer, record_ollama_stats
+
+
+DEFAULT_HEADERS = {"Content-Type": "application/json"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class OllamaError(Exception):
+    """
+    Raised when the Ollama endpoint returns an error or cannot be reached after all retries.
+    """
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    Exponential backoff with jitter for the given (zero-based) retry attempt.
+    """
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_stream_line(line, accumulated_content, tool_calls=None):
+    """
+    Parse one line of an Ollama streaming response.
+
+    Returns:
+        tuple: (accumulated content, new content in this line, parsed line data)
+    """
+    data = json.loads(line)
+    message = data.get("message", {})
+    content = message.get("content", "")
+    if tool_calls is not None and message.get("tool_calls"):
+        tool_calls.extend(message["tool_calls"])
+    return accumulated_content + content, content, data
+
+
+def request_payload(payload, stream, keep_alive=None):
+    """
+    Payload as sent: with the stream flag, and keep_alive unless the caller set one.
+    """
+    payload = {**payload, "stream": stream}
+    if keep_alive is not None and "keep_alive" not in payload:
+        payload["keep_alive"] = keep_alive
+    return payload
+
+
+def span_attributes(payload, stream):
+    return {"model": payload.get("model", ""), "stream": stream, "messages": len(payload.get("messages", [])),
+            "tools": len(payload.get("tools") or [])}
+
+
+class OllamaClient:
+    """
+    Shared synchronous client for the Ollama chat API.
+
+    Keeps connections alive in a pooled session, applies per-call timeouts, retries
+    connection failures and retryable status codes with backoff, and caps the number
+    of requests in flight towards the endpoint.
+    """
+
+    def __init__(self, **kwargs):
+        self.connect_timeout = kwargs.get("connect_timeout", 5)
+        self.read_timeout = kwargs.get("read_timeout", 300)
+        self.max_retries = kwargs.get("max_retries", 3)
+        self.backoff_base = kwargs.get("backoff_base", 0.5)
+        self.backoff_max = kwargs.get("backoff_max", 8)
+        self.max_concurrency = kwargs.get("max_concurrency", 4)
+        self.headers = kwargs.get("headers", DEFAULT_HEADERS)
+        # Sent with every request that sets none, e.g. "30m"; None leaves Ollama's default
+        self.keep_alive = kwargs.get("keep_alive")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(self.max_concurrency, 4))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    def _payload(self, payload, stream):
+        return request_payload(payload, stream, self.keep_alive)
+
+    def _post(self, url, payload, stream, timeout):
+        """
+        POST with retries. Only connection failures (including connect timeouts) and retryable
+        status codes are retried: after a read timeout Ollama may still be generating, and a
+        retry would run the same generation twice.
+        """
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, headers=self.headers, stream=stream, timeout=timeout)
+                if response.status_code == 200:
+                    return response
+                last_error = OllamaError(f"Error: {response.status_code}, {response.text}")
+                response.close()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise last_error
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout, but not ReadTimeout
+                last_error = OllamaError(f"Error: could not reach {url}: {e}")
+            except requests.Timeout as e:
+                raise OllamaError(f"Error: {url} did not respond in time: {e}") from e
+
+            if attempt < self.max_retries:
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+        raise last_error
+
+    def chat(self, url, payload, timeout=None):
+        """
+        Non-streaming chat request.
+
+        Returns:
+            dict: The parsed response body.
+        """
+        with tracer.span("ollama.chat", **span_attributes(payload, False)) as span:
+            with self.semaphore:
+                span.set(queue_seconds=time.perf_counter() - span.start)
+                response = self._post(url, self._payload(payload, False), stream=False, timeout=timeout)
+                data = response.json()
+            record_ollama_stats(span, data)
+            return data
+
+    def chat_content(self, url, payload, timeout=None):
+        """
+        Non-streaming chat request returning only the assistant message content.
+        """
+        return self.chat(url, payload, timeout=timeout).get("message", {}).get("content", "")
+
+    def stream_chat(self, url, payload, tool_calls=None, timeout=None):
+        """
+        Streaming chat request.
+
+        Args:
+            tool_calls (list, optional): Extended with any tool calls found in the streamed messages.
+
+        Yields:
+            str: Accumulated content from the streamed response.
+        """
+        with tracer.span("ollama.chat", **span_attributes(payload, True)) as span, self.semaphore:
+            span.set(queue_seconds=time.perf_counter() - span.start)
+            response = self._post(url, self._payload(payload, True), stream=True, timeout=timeout)
+            try:
+                accumulated_content = ""
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        accumulated_content, content, data = parse_stream_line(line, accumulated_content, tool_calls)
+                        if content and "first_token_seconds" not in span.attributes:
+                            span.set(first_token_seconds=time.perf_counter() - span.start)
+                            tracer.observe("ollama_first_token_seconds", span.attributes["model"], span.attributes["first_token_seconds"])
+                        if data.get("done"):
+                            record_ollama_stats(span, data)
+                        if content:
+                            yield accumulated_content
+            finally:
+                response.close()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient built on httpx, with the same timeouts, retries and concurrency cap.
+    """
+
+    def __init__(self, **kwargs):
+        import httpx
+
+        self.httpx = httpx
+        self.max_retries = kwargs.get("max_retries", 3)
+        self.backoff_base = kwargs.get("backoff_base", 0.5)
+        self.backoff_max = kwargs.get("backoff_max", 8)
+        self.max_concurrency = kwargs.get("max_concurrency", 4)
+        self.headers = kwargs.get("headers", DEFAULT_HEADERS)
+        self.keep_alive = kwargs.get("keep_alive")
+        self.timeout = httpx.Timeout(kwargs.get("read_timeout", 300), connect=kwargs.get("connect_timeout", 5))
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _send(self, url, payload, stream):
+        """
+        POST with the same retry rules as OllamaClient._post.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                request = self.client.build_request("POST", url, json=payload)
+                response = await self.client.send(request, stream=stream)
+                if response.status_code == 200:
+                    return response
+                body = await response.aread()
+                await response.aclose()
+                last_error = OllamaError(f"Error: {response.status_code}, {body.decode('utf-8', 'replace')}")
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise last_error
+            except (self.httpx.ConnectError, self.httpx.ConnectTimeout, self.httpx.PoolTimeout) as e:
+                last_error = OllamaError(f"Error: could not reach {url}: {e}")
+            except self.httpx.TimeoutException as e:
+                raise OllamaError(f"Error: {url} did not respond in time: {e}") from e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+        raise last_error
+
+    async def chat(self, url, payload):
+        with tracer.span("ollama.chat", **span_attributes(payload, False)) as span:
+            async with self.semaphore:
+                span.set(queue_seconds=time.perf_counter() - span.start)
+                response = await self._send(url, request_payload(payload, False, self.keep_alive), stream=False)
+                data = response.json()
+            record_ollama_stats(span, data)
+            return data
+
+    async def chat_content(self, url, payload):
+        return (await self.chat(url, payload)).get("message", {}).get("content", "")
+
+    async def stream_chat(self, url, payload, tool_calls=None):
+        """
+        Async generator yielding the accumulated content of a streaming chat request.
+        """
+        with tracer.span("ollama.chat", **span_attributes(payload, True)) as span:
+            async with self.semaphore:
+                span.set(queue_seconds=time.perf_counter() - span.start)
+                response = await self._send(url, request_payload(payload, True, self.keep_alive), stream=True)
+                try:
+                    accumulated_content = ""
+                    async for line in response.aiter_lines():
+                        if line:
+                            accumulated_content, content, data = parse_stream_line(line, accumulated_content, tool_calls)
+                            if content and "first_token_seconds" not in span.attributes:
+                                span.set(first_token_seconds=time.perf_counter() - span.start)
+                                tracer.observe("ollama_first_token_seconds", span.attributes["model"], span.attributes["first_token_seconds"])
+                            if data.get("done"):
+                                record_ollama_stats(span, data)
+                            if content:
+                                yield accumulated_content
+                finally:
+                    await response.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_client(**kwargs):
+    """
+    Return the process-wide OllamaClient, creating it on first use.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = OllamaClient(**kwargs)
+        return _shared_client
@@ -0,0 +1,220 @@
+import os
+import re
+import time
+
+
+# File types read for indexing and analysis; None in RepositoryScanner means every text file
+DEFAULT_EXTENSIONS = {".py", ".java", ".js", ".rs", ".sh", ".txt", ".log", ".md"}
+
+# Directories that never hold sources worth reading. They are pruned before descending,
+# as is any directory containing a pyvenv.cfg (a virtual environment of any name).
+DEFAULT_IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "__pycache__", ".venv", "venv",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".idea", ".vscode", ".gradle",
+    ".next", ".cache", "build", "dist", "target", "site-packages", ".eggs",
+}
+
+
+def _translate(pattern):
+    """
+    Translate a gitignore glob into a regular expression over "/"-separated paths.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            regex += "[^" + body[1:] + "]" if body.startswith("!") else "[" + body + "]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+class GitIgnore:
+    """
+    Rules of one .gitignore file, matched against paths relative to its directory.
+
+    Supports comments, negation with "!", directory-only patterns ending in "/", patterns
+    anchored by a "/", and "*", "?", "[...]" and "**" globs. Later rules override earlier ones.
+    """
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            # A slash anywhere but at the end ties the pattern to this directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self.rules.append((re.compile(_translate(line) + r"\Z"), negated, directory_only, anchored))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, relative_path, is_dir):
+        """
+        Returns:
+            bool: True if ignored, False if re-included by a negated rule, None if no rule matched.
+        """
+        name = relative_path.rsplit("/", 1)[-1]
+        result = None
+        for regex, negated, directory_only, anchored in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.match(relative_path if anchored else name):
+                result = not negated
+        return result
+
+
+class ScannedFile:
+    """
+    A file found by the scanner, with the stat taken while scanning.
+    """
+
+    __slots__ = ("path", "relative_path", "stat")
+
+    def __init__(self, path, relative_path, stat):
+        self.path = path
+        self.relative_path = relative_path
+        self.stat = stat
+
+    @property
+    def size(self):
+        return self.stat.st_size
+
+
+class RepositoryScanner:
+    """
+    Finds the files of a repository worth reading, using os.scandir.
+
+    Ignored directories and those excluded by .gitignore files (at any level) are pruned
+    before descending into them. Files larger than max_file_size bytes are skipped, as are
+    binary files, detected by a NUL byte in their first header_bytes bytes. Scanning stops
+    once the files found add up to max_total_size bytes.
+    """
+
+    def __init__(self, **kwargs):
+        extensions = kwargs.get("extensions", DEFAULT_EXTENSIONS)
+        self.extensions = set(extensions) if extensions is not None else None
+        self.ignored_dirs = set(kwargs.get("ignored_dirs", DEFAULT_IGNORED_DIRS))
+        self.use_gitignore = kwargs.get("use_gitignore", True)
+        self.max_file_size = kwargs.get("max_file_size", 1024 * 1024)
+        self.max_total_size = kwargs.get("max_total_size", 256 * 1024 * 1024)
+        self.header_bytes = kwargs.get("header_bytes", 8192)
+
+    def is_binary(self, path):
+        try:
+            with open(path, "rb") as f:
+                return b"\0" in f.read(self.header_bytes)
+        except OSError:
+            return True
+
+    def _ignored(self, gitignores, relative_path, is_dir):
+        ignored = False
+        for base, gitignore in gitignores:
+            result = gitignore.match(relative_path[len(base):], is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def scan(self, repo_path):
+        """
+        Scan a repository.
+
+        Returns:
+            tuple: (list of ScannedFile in path order, dict of scan statistics)
+        """
+        start_time = time.time()
+        stats = {"directories": 0, "directories_pruned": 0, "files": 0, "files_ignored": 0,
+                 "files_too_large": 0, "files_binary": 0, "bytes": 0, "truncated": False}
+        files = []
+        # (directory, relative path prefix, .gitignore rules in effect from the root down)
+        pending = [(repo_path, "", [])]
+        while pending and not stats["truncated"]:
+            directory, prefix, gitignores = pending.pop()
+            stats["directories"] += 1
+            try:
+                with os.scandir(directory) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Error scanning directory {directory}: {e}")
+                continue
+
+            names = {entry.name for entry in entries}
+            if self.use_gitignore and ".gitignore" in names:
+                gitignore = GitIgnore.load(os.path.join(directory, ".gitignore"))
+                if gitignore is not None and gitignore.rules:
+                    gitignores = gitignores + [(prefix, gitignore)]
+
+            subdirectories = []
+            for entry in entries:
+                relative_path = prefix + entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if (entry.name in self.ignored_dirs or self._ignored(gitignores, relative_path, True)
+                            or os.path.exists(os.path.join(entry.path, "pyvenv.cfg"))):
+                        stats["directories_pruned"] += 1
+                        continue
+                    subdirectories.append((entry.path, relative_path + "/", gitignores))
+                    continue
+
+                if self.extensions is not None and os.path.splitext(entry.name)[1] not in self.extensions:
+                    continue
+                if self._ignored(gitignores, relative_path, False):
+                    stats["files_ignored"] += 1
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if stat.st_size > self.max_file_size:
+                    stats["files_too_large"] += 1
+                    continue
+                if stats["bytes"] + stat.st_size > self.max_total_size:
+                    print(f"Stopped scanning {repo_path} at {self.max_total_size} bytes")
+                    stats["truncated"] = True
+                    break
+                if self.is_binary(entry.path):
+                    stats["files_binary"] += 1
+                    continue
+                files.append(ScannedFile(entry.path, relative_path.replace("/", os.sep), stat))
+                stats["files"] += 1
+                stats["bytes"] += stat.st_size
+
+            # Popped last-in first-out, so push in reverse to visit directories in name order
+            pending.extend(reversed(subdirectories))
+
+        stats["seconds"] = round(time.time() - start_time, 3)
+        return files, stats
@@ -0,0 +1,103 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from tracing import tracer
+
+
+class SchedulerFull(Exception):
+    """
+    Raised when a request cannot even be queued because the queue-depth limits are reached.
+    """
+
+
+class FairScheduler:
+    """
+    Admits requests towards the model endpoint with bounded concurrency.
+
+    Requests that cannot run immediately wait in one queue per session, and free slots are
+    handed out round-robin across sessions, so one user sending many requests cannot starve
+    the others. Queues are bounded both in total and per session; beyond that, callers get
+    SchedulerFull right away instead of waiting indefinitely.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, **kwargs):
+        self.max_concurrency = kwargs.get("max_concurrency", 4)
+        self.max_queue_depth = kwargs.get("max_queue_depth", 32)
+        self.max_queued_per_session = kwargs.get("max_queued_per_session", 4)
+        self.running = 0
+        self.queued = 0
+        self.waiting = OrderedDict()  # session id -> deque of futures, in round-robin order
+
+    @asynccontextmanager
+    async def slot(self, session_id):
+        """
+        Hold one of the max_concurrency slots for the duration of the block.
+        """
+        with tracer.span("scheduler.wait", session=session_id) as span:
+            await self.acquire(session_id)
+            span.set(running=self.running, queued=self.queued)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, session_id):
+        if self.running < self.max_concurrency and not self.queued:
+            self.running += 1
+            return
+
+        queue = self.waiting.get(session_id)
+        if self.queued >= self.max_queue_depth:
+            raise SchedulerFull(f"{self.queued} requests are already waiting")
+        if queue is not None and len(queue) >= self.max_queued_per_session:
+            raise SchedulerFull(f"Session {session_id} already has {len(queue)} requests waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(session_id, deque()).append(future)
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._discard(session_id, future)
+            else:
+                # The slot was granted just before the caller was cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency and self.waiting:
+            session_id, queue = self.waiting.popitem(last=False)
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                # The session goes to the back of the line for its next request
+                self.waiting[session_id] = queue
+            if future.done():
+                continue
+            self.running += 1
+            future.set_result(None)
+
+    def _discard(self, session_id, future):
+        queue = self.waiting.get(session_id)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.queued -= 1
+            if not queue:
+                del self.waiting[session_id]
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "sessions_waiting": len(self.waiting),
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+        }
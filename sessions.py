@@ -0,0 +1,93 @@
+import os
+import re
+import time
+import shutil
+import threading
+
+
+class Session:
+    """
+    State of one user session: its conversation history, the repositories it indexed or
+    is working with, and a scratch directory for files such as repository summaries.
+    """
+
+    def __init__(self, session_id, scratch_dir):
+        self.session_id = session_id
+        self.scratch_dir = scratch_dir
+        self.history = []
+        # Until the session records a turn or is cleared, the client's history is used as is
+        self.tracks_history = False
+        self.active_repositories = []
+        # Intent the router chose for the latest message
+        self.last_intent = None
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    @property
+    def knowledge_base_dir(self):
+        return os.path.join(self.scratch_dir, "knowledge_base")
+
+    def history_for(self, client_history):
+        """
+        History to answer from: the session's own once it tracks one, else the client's.
+        """
+        return self.history if self.tracks_history else client_history
+
+    def add_turn(self, message, response, client_history=None):
+        if not self.tracks_history:
+            self.history = list(client_history or [])
+            self.tracks_history = True
+        self.history.append({"role": "user", "content": message})
+        if response:
+            self.history.append({"role": "assistant", "content": response})
+
+    def clear(self):
+        """
+        Forget the history and remove the scratch directory. Active repositories are left to the caller.
+        """
+        self.history = []
+        self.tracks_history = True
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+class SessionManager:
+    """
+    Creates sessions on first use and expires those idle for longer than idle_timeout seconds.
+    """
+
+    def __init__(self, **kwargs):
+        self.root_dir = kwargs.get("root_dir", "sessions")
+        self.idle_timeout = kwargs.get("idle_timeout", 3600)
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def get(self, session_id):
+        session_id = re.sub(r"[^a-zA-Z0-9_-]", "_", session_id or "default")[:64]
+        with self.lock:
+            self._expire_idle()
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session(session_id, os.path.join(self.root_dir, session_id))
+            session.last_used = time.time()
+            return session
+
+    def close(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session:
+            session.clear()
+
+    def sessions_using(self, repo_path, exclude=None):
+        """
+        Sessions other than exclude that have repo_path active.
+        """
+        with self.lock:
+            return [session for session in self.sessions.values()
+                    if session is not exclude and repo_path in session.active_repositories]
+
+    def _expire_idle(self):
+        now = time.time()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_used > self.idle_timeout:
+                del self.sessions[session_id]
+                session.clear()
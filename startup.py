@@ -0,0 +1,47 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Records how long each startup stage took, including stages that finish in background threads.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage_end = time.perf_counter()
+            with self.lock:
+                self.stages.append({
+                    "stage": name,
+                    "thread": threading.current_thread().name,
+                    "started_at": round(stage_start - self.start_time, 3),
+                    "seconds": round(stage_end - stage_start, 3),
+                })
+
+    def report(self):
+        """
+        Print every recorded stage in the order it started.
+
+        Returns:
+            list: The recorded stages.
+        """
+        with self.lock:
+            stages = sorted(self.stages, key=lambda stage: stage["started_at"])
+        print("Startup time report:")
+        for stage in stages:
+            print(f"  {stage['stage']:<32} started at {stage['started_at']:>7.3f}s  took {stage['seconds']:>7.3f}s  [{stage['thread']}]")
+        return stages
+
+
+# Process-wide timer, started when this module is first imported
+timer = StartupTimer()
@@ -0,0 +1,90 @@
+from RAG.chunker import split_code
+
+
+JAVA_SOURCE = """package demo;
+
+public class Counter {
+    private int count;
+
+    Counter(int start) {
+        count = start;
+    }
+
+    public int next(int step) {
+        if (step < 0) {
+            throw new IllegalArgumentException("negative");
+        } else if (step == 0) {
+            return count;
+        }
+        for (int i = 0; i < step; i++) {
+            count++;
+        }
+        while (count > 1000) {
+            count -= 1000;
+        }
+        return count;
+    }
+
+    public void reset() {
+        count = 0;
+    }
+}
+"""
+
+
+def symbols(chunks):
+    return [metadata["symbol"] for _, metadata in chunks]
+
+
+def test_python_chunks_follow_definitions_without_overlap():
+    source = "import os\n\n\ndef first():\n    return 1\n\n\nclass Second:\n    def method(self):\n        return 2\n"
+    chunks = split_code(source, "module.py", max_chars=100, min_chars=0)
+
+    assert symbols(chunks) == ["<module>", "first", "Second"]
+    assert "".join(text for text, _ in chunks) == source
+    for (_, previous), (_, current) in zip(chunks, chunks[1:]):
+        assert current["start_line"] == previous["end_line"] + 1
+
+
+def test_large_python_class_is_split_into_methods():
+    body = "".join(f"    def method_{i}(self):\n        return {i}\n\n" for i in range(4))
+    source = "class Big:\n" + body.rstrip() + "\n"
+    chunks = split_code(source, "big.py", max_chars=60, min_chars=0)
+
+    assert symbols(chunks) == ["Big", "Big.method_0", "Big.method_1", "Big.method_2", "Big.method_3"]
+    assert "".join(text for text, _ in chunks) == source
+
+
+def test_java_control_flow_does_not_start_chunks():
+    chunks = split_code(JAVA_SOURCE, "Counter.java", max_chars=400, min_chars=0)
+
+    # The class is too large for one chunk, so it is split at its constructor and methods
+    assert symbols(chunks) == ["<module>", "Counter", "Counter", "next", "reset"]
+
+
+def test_java_large_method_is_split_by_lines_not_at_control_flow():
+    # next() is too large for one chunk and has no nested definitions, so it is split
+    # between lines; its if/else if/for/while blocks must not become definitions
+    chunks = split_code(JAVA_SOURCE, "Counter.java", max_chars=200, min_chars=0)
+
+    assert set(symbols(chunks)) == {"<module>", "Counter", "next", "reset"}
+    next_lines = [(metadata["start_line"], metadata["end_line"]) for _, metadata in chunks if metadata["symbol"] == "next"]
+    assert next_lines[0][0] == 10 and next_lines[-1][1] == 24
+
+
+def test_javascript_control_flow_does_not_start_chunks():
+    source = ("function outer(items) {\n"
+              + "".join(f"  if (items[{i}]) {{\n    items[{i}] = {i};\n  }} else if (!items) {{\n    return;\n  }}\n" for i in range(3))
+              + "}\n\nconst inner = (value) => {\n  for (const item of value) {\n    console.log(item);\n  }\n};\n")
+    chunks = split_code(source, "app.js", max_chars=400, min_chars=0)
+
+    assert symbols(chunks) == ["outer", "inner"]
+
+
+def test_small_chunks_are_merged():
+    source = "def a():\n    pass\n\n\ndef b():\n    pass\n"
+    chunks = split_code(source, "small.py", max_chars=1000, min_chars=200)
+
+    assert len(chunks) == 1
+    assert chunks[0][1]["symbol"] == "a, b"
+    assert (chunks[0][1]["start_line"], chunks[0][1]["end_line"]) == (1, 6)
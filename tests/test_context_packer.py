@@ -0,0 +1,86 @@
+import numpy as np
+from langchain.schema import Document
+
+from context_builder import count_tokens
+from RAG.context_packer import ContextPacker, merge_chunks, text_overlap
+
+
+class KeywordEmbedding:
+    """
+    Embeds a text as counts of a few keywords, so similar chunks get similar vectors.
+    """
+    KEYWORDS = ("parser", "cache", "router", "index")
+
+    def embed_documents(self, texts):
+        return [[text.count(keyword) + 0.01 for keyword in self.KEYWORDS] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def code(file_path, start, end):
+    text = "".join(f"line {number}\n" for number in range(start, end + 1))
+    return Document(page_content=text, metadata={"file_path": file_path, "start_line": start, "end_line": end})
+
+
+def test_text_overlap():
+    first = "alpha beta gamma delta epsilon zeta eta"
+    assert text_overlap(first, "delta epsilon zeta eta theta iota") == len("delta epsilon zeta eta")
+    assert text_overlap(first, "zeta eta theta", min_overlap=20) == 0
+    assert text_overlap(first, "something else entirely, no overlap") == 0
+
+
+def test_merge_overlapping_and_adjacent_line_ranges():
+    merged = merge_chunks([code("a.py", 5, 9), code("a.py", 1, 6), code("a.py", 10, 12), code("a.py", 20, 21)])
+    assert [(doc.metadata["start_line"], doc.metadata["end_line"]) for doc in merged] == [(1, 12), (20, 21)]
+    assert merged[0].page_content == code("a.py", 1, 12).page_content
+    assert merged[0].metadata["merged_chunks"] == 3
+    assert "merged_chunks" not in merged[1].metadata
+
+
+def test_merge_keeps_files_apart_and_in_order():
+    merged = merge_chunks([code("b.py", 1, 3), code("a.py", 1, 3), code("b.py", 4, 5)])
+    assert [doc.metadata["file_path"] for doc in merged] == ["b.py", "a.py"]
+    assert merged[0].metadata["end_line"] == 5
+
+
+def test_merge_text_overlap_and_containment():
+    first = Document(page_content="The parser reads tokens one by one and builds a tree.", metadata={"source": "notes.md"})
+    second = Document(page_content="one by one and builds a tree. Then the tree is checked.", metadata={"source": "notes.md"})
+    inside = Document(page_content="reads tokens one by one", metadata={"source": "notes.md"})
+    merged = merge_chunks([first, second, inside])
+    assert len(merged) == 1
+    assert merged[0].page_content == "The parser reads tokens one by one and builds a tree. Then the tree is checked."
+    assert merged[0].metadata["merged_chunks"] == 3
+
+
+def test_mmr_order_prefers_diverse_chunks():
+    documents = [Document(page_content=text) for text in ("parser parser", "parser parser parser", "cache cache")]
+    packer = ContextPacker(lambda_mult=0.5)
+    query = KeywordEmbedding().embed_query("parser cache")
+    order = packer.mmr_order(documents, KeywordEmbedding(), np.asarray(query))
+    # The second parser chunk is nearly a duplicate of the first one chosen, so the cache chunk comes before it
+    assert order.index(2) < order.index(1) or order.index(2) < order.index(0)
+    assert sorted(order) == [0, 1, 2]
+
+
+def test_pack_fits_budget_and_merges():
+    documents = [code("a.py", 1, 10), code("a.py", 8, 14), code("b.py", 1, 40)]
+    budget = count_tokens(code("a.py", 1, 14).page_content) + 5
+    result = ContextPacker().pack(documents, budget, KeywordEmbedding())
+    assert result["tokens"] <= budget
+    assert result["selected"] == 2
+    assert [doc.metadata["file_path"] for doc in result["documents"]] == ["a.py"]
+    assert result["context"] == code("a.py", 1, 14).page_content
+    assert result["tokens_saved"] > 0
+
+
+def test_pack_truncates_when_nothing_fits():
+    documents = [code("a.py", 1, 200)]
+    result = ContextPacker().pack(documents, 10, KeywordEmbedding())
+    assert result["selected"] == 1
+    assert 0 < result["tokens"] <= 10
+
+
+def test_pack_empty():
+    assert ContextPacker().pack([], 100, KeywordEmbedding())["context"] == ""
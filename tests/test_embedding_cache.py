@@ -0,0 +1,44 @@
+import numpy as np
+
+from RAG.embedding_cache import EmbeddingCache
+
+
+def open_cache(tmp_path, max_entries=2):
+    return EmbeddingCache(str(tmp_path), "test-model", 3, max_entries=max_entries, flush_interval=3600)
+
+
+def test_put_get_and_lru_eviction(tmp_path):
+    cache = open_cache(tmp_path)
+    a, b, c = (cache.key_for(text) for text in ("a", "b", "c"))
+    cache.put_many([a, b], np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32))
+    assert cache.get_many([a])[a].tolist() == [1, 0, 0]
+
+    # a was used more recently than b, so b is evicted
+    cache.put_many([c], np.array([[0, 0, 1]], dtype=np.float32))
+    found = cache.get_many([a, b, c])
+    assert sorted(found) == sorted([a, c])
+    assert found[c].tolist() == [0, 0, 1]
+
+
+def test_flush_and_reopen(tmp_path):
+    cache = open_cache(tmp_path)
+    a = cache.key_for("a")
+    cache.put_many([a], np.array([[1, 2, 3]], dtype=np.float32))
+    cache.flush()
+    assert open_cache(tmp_path).get_many([a])[a].tolist() == [1, 2, 3]
+
+
+def test_reused_row_is_not_returned_for_its_old_key_after_a_crash(tmp_path):
+    cache = open_cache(tmp_path)
+    a, b, c = (cache.key_for(text) for text in ("a", "b", "c"))
+    cache.put_many([a, b], np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32))
+    cache.flush()
+    # a's row is reused for c, and the process dies before the index is flushed again
+    cache.put_many([c], np.array([[0, 0, 1]], dtype=np.float32))
+    cache.vectors.flush()
+    cache.keys.flush()
+
+    reopened = open_cache(tmp_path)
+    found = reopened.get_many([a, b, c])
+    assert list(found) == [b]
+    assert a not in reopened.index
@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from RAG.faiss_store import FaissStore
+
+
+class VectorEmbedding:
+    """
+    Reads each text's vector from the text itself, "name: x y z w".
+    """
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(value) for value in text.split(":")[1].split()]
+
+
+EMBEDDING = VectorEmbedding()
+
+
+def open_store(tmp_path, **kwargs):
+    return FaissStore(str(tmp_path), EMBEDDING, collection_name="test", **kwargs)
+
+
+def search(store, vector, k=3, filter=None):
+    results = store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter)
+    return [(doc.page_content.split(":")[0], round(distance, 4)) for doc, distance in results]
+
+
+def add_points(store):
+    store.add_texts(["a: 0 0 0 0", "b: 1 0 0 0", "c: 0 3 0 0"],
+                    [{"file_path": "a.py"}, {"file_path": "b.py"}, {"file_path": "c.py"}], ids=["a", "b", "c"])
+
+
+def test_add_and_search(tmp_path):
+    store = open_store(tmp_path)
+    add_points(store)
+    assert store.count() == 3
+    assert search(store, [0.9, 0, 0, 0]) == [("b", 0.01), ("a", 0.81), ("c", 9.81)]
+
+
+def test_re_adding_an_id_replaces_it(tmp_path):
+    store = open_store(tmp_path)
+    add_points(store)
+    store.add_texts(["b2: 0 0 2 0"], [{"file_path": "b.py"}], ids=["b"])
+    assert store.count() == 3
+    assert search(store, [0, 0, 2, 0], k=1) == [("b2", 0.0)]
+    assert "b" not in [name for name, _ in search(store, [1, 0, 0, 0])]
+
+
+def test_delete(tmp_path):
+    store = open_store(tmp_path)
+    add_points(store)
+    store.delete(["a", "missing"])
+    assert store.count() == 2
+    assert [name for name, _ in search(store, [0, 0, 0, 0])] == ["b", "c"]
+
+
+def test_filtered_search_widens_until_enough_match(tmp_path):
+    store = open_store(tmp_path)
+    texts = [f"near{i}: {i * 0.01} 0 0 0" for i in range(40)] + ["far: 0 0 0 50"]
+    metadatas = [{"file_path": "near.py"}] * 40 + [{"file_path": "far.py"}]
+    store.add_texts(texts, metadatas)
+    # far is the farthest of 41 vectors, beyond the first k * 4 fetched
+    assert search(store, [0, 0, 0, 0], k=1, filter={"file_path": "far.py"}) == [("far", 2500.0)]
+    assert search(store, [0, 0, 0, 0], k=2, filter={"file_path": {"$in": ["far.py", "near.py"]}}) == [("near0", 0.0), ("near1", 0.0001)]
+
+
+def test_persist_reload_memory_mapped_then_write(tmp_path):
+    store = open_store(tmp_path)
+    add_points(store)
+    store.persist()
+
+    reloaded = open_store(tmp_path)
+    assert reloaded.mmapped
+    assert search(reloaded, [1, 0, 0, 0], k=1) == [("b", 0.0)]
+    # The first write copies the read-only index into memory
+    reloaded.add_texts(["d: 0 0 0 1"], ids=["d"])
+    reloaded.delete(["a"])
+    assert not reloaded.mmapped
+    reloaded.persist()
+
+    again = open_store(tmp_path)
+    assert again.count() == 3
+    assert [name for name, _ in search(again, [0, 0, 0, 1])] == ["d", "b", "c"]
+
+
+def test_reset(tmp_path):
+    store = open_store(tmp_path, vector_dtype="float16")
+    add_points(store)
+    store.persist()
+    store.reset()
+    assert store.count() == 0 and search(store, [0, 0, 0, 0]) == []
+    assert os.listdir(store.persist_directory) == []
+    assert open_store(tmp_path).count() == 0
+
+
+def test_drop_removes_the_collection_directory(tmp_path):
+    store = open_store(tmp_path)
+    add_points(store)
+    store.persist()
+    store.drop()
+    assert not os.path.exists(store.persist_directory)
+
+
+@pytest.mark.parametrize("vector_dtype", ["float16", "int8"])
+def test_quantized_search_is_rescored_with_full_precision(tmp_path, vector_dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(64, 4)).astype(np.float32)
+    texts = [f"v{i}: " + " ".join(repr(float(value)) for value in vector) for i, vector in enumerate(vectors)]
+    store = open_store(tmp_path, vector_dtype=vector_dtype)
+    store.add_texts(texts)
+    assert store.index_bytes() == (4 if vector_dtype == "int8" else 8) * 64
+
+    query = vectors[7] + 0.01
+    exact = np.square(vectors - query).sum(axis=1)
+    results = store.similarity_search_by_vector_with_relevance_scores(query, k=3)
+    assert [doc.page_content.split(":")[0] for doc, _ in results] == [f"v{i}" for i in np.argsort(exact)[:3]]
+    # Distances come from the float32 side file, not from the quantized codes
+    assert [distance for _, distance in results] == pytest.approx(np.sort(exact)[:3].tolist(), rel=1e-5)
+
+    store.persist()
+    reloaded = open_store(tmp_path)
+    assert reloaded.vector_dtype == vector_dtype
+    assert [doc.page_content for doc, _ in reloaded.similarity_search_by_vector_with_relevance_scores(query, k=3)] == \
+        [doc.page_content for doc, _ in results]
+
+
+def test_int8_quantizer_is_retrained_when_the_collection_doubles(tmp_path):
+    store = open_store(tmp_path, vector_dtype="int8")
+    store.add_texts([f"small{i}: {i * 0.1} 0 0 0" for i in range(4)])
+    assert store.trained_on == 4
+    # Far outside the range the quantizer was trained on
+    store.add_texts([f"large{i}: 0 {10 + i} 0 0" for i in range(3)])
+    assert store.trained_on == 4
+    store.add_texts(["large3: 0 13 0 0"])
+    assert store.trained_on == 8
+    assert store.count() == 8
+    assert search(store, [0, 12.9, 0, 0], k=1) == [("large3", 0.01)]
+    assert search(store, [0.3, 0, 0, 0], k=1) == [("small3", 0.0)]
@@ -0,0 +1,50 @@
+import threading
+
+from RAG.indexing_jobs import IndexingJobQueue
+
+
+class BlockingIndexer:
+    """
+    index_repository stand-in that runs until its job is cancelled or release is set.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.indexed = []
+
+    def __call__(self, repo_path, active_repositories, progress=None, cancel=None):
+        self.indexed.append(repo_path)
+        self.started.set()
+        while not self.release.is_set():
+            if cancel.wait(0.01):
+                return {"cancelled": True}
+        return {"cancelled": False}
+
+
+def test_cancel_queued_job_does_not_wait_for_other_repositories(tmp_path):
+    indexer = BlockingIndexer()
+    jobs = IndexingJobQueue(indexer, workers=1)
+    running = jobs.submit(str(tmp_path / "a"), [])
+    assert indexer.started.wait(5)
+    queued = jobs.submit(str(tmp_path / "b"), [])
+
+    assert jobs.cancel(repo_path=str(tmp_path / "b"), wait=True) == [queued]
+    assert queued.status == "cancelled" and queued.wait(0)
+    assert running.status == "running"
+
+    indexer.release.set()
+    assert running.wait(5) and running.status == "done"
+    jobs.close(timeout=5)
+    assert indexer.indexed == [running.repo_path]
+
+
+def test_cancel_waits_for_running_job_of_repository(tmp_path):
+    indexer = BlockingIndexer()
+    jobs = IndexingJobQueue(indexer, workers=1)
+    job = jobs.submit(str(tmp_path / "a"), [])
+    assert indexer.started.wait(5)
+
+    assert jobs.cancel(repo_path=str(tmp_path / "a"), wait=True) == [job]
+    assert job.status == "cancelled" and job.wait(0)
+    jobs.close(timeout=5)
@@ -0,0 +1,88 @@
+from RAG.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize, extract_identifiers, names_symbol
+
+
+def build_index(tmp_path=None):
+    index = LexicalIndex(path=str(tmp_path / "lexical.pkl") if tmp_path else None)
+    index.add(
+        ["reset", "chat", "notes"],
+        [
+            "def reset_vectorstore_data(self, repo_path):\n    self.collections.drop(repo_path)\n",
+            "def chat(self, message):\n    return self.model.chat(message)\n",
+            "The vector store keeps one collection per repository.",
+        ],
+        [{"symbol": "RAGHandler.reset_vectorstore_data"}, {"symbol": "RAGHandler.chat"}, {}],
+    )
+    return index
+
+
+def test_tokenize_splits_identifiers():
+    tokens = tokenize("RAGHandler.reset_vectorstore_data getUserName")
+    assert "raghandler.reset_vectorstore_data" in tokens
+    assert {"reset", "vectorstore", "data", "getusername", "get", "user", "name"} <= set(tokens)
+
+
+def test_extract_identifiers():
+    assert extract_identifiers("What does `chat` do in reset_vectorstore_data()?") == ["chat", "reset_vectorstore_data"]
+    assert extract_identifiers("Use a list, e.g. with os.path, i.e. the stdlib") == ["os.path"]
+
+
+def test_names_symbol():
+    assert names_symbol(["chat"], "RAGHandler.chat")
+    assert names_symbol(["raghandler.chat"], "RAGHandler.chat")
+    assert names_symbol(["reset"], "helper, Store.reset")
+    assert not names_symbol(["os.path"], "RAGHandler.chat")
+    assert not names_symbol(["chat"], "RAGHandler.chat_history")
+    assert not names_symbol(["chat"], None)
+
+
+def test_search_ranks_matching_chunk_first():
+    index = build_index()
+    results = index.search("how is the vectorstore data reset", k=3)
+    assert results[0][0] == "reset"
+    assert all(score > 0 for _, score in results)
+    assert [chunk_id for chunk_id, _ in index.search("collection per repository")][0] == "notes"
+
+
+def test_search_prefers_rare_terms():
+    index = LexicalIndex()
+    index.add(["a", "b"], ["message message message", "message retriever"], [{}, {}])
+    index.add(["c", "d"], ["message model", "message handler"], [{}, {}])
+    assert index.search("message retriever", k=1)[0][0] == "b"
+
+
+def test_search_filter_and_delete():
+    index = build_index()
+    index.add(["other"], ["def reset(self): pass"], [{"file_path": "other.py"}])
+    results = index.search("reset", filter_fn=lambda metadata: metadata.get("file_path") == "other.py")
+    assert [chunk_id for chunk_id, _ in results] == ["other"]
+
+    index.delete(["reset", "other"])
+    assert index.search("reset") == []
+    assert len(index) == 2
+
+
+def test_lookup_matches_symbol_metadata():
+    index = build_index()
+    assert index.lookup(["raghandler.chat"])[0][0] == "chat"
+
+
+def test_save_and_load(tmp_path):
+    index = build_index(tmp_path)
+    index.save()
+    loaded = LexicalIndex(path=str(tmp_path / "lexical.pkl"))
+    assert len(loaded) == 3
+    assert loaded.search("vectorstore reset", k=1) == index.search("vectorstore reset", k=1)
+
+
+def test_reciprocal_rank_fusion():
+    # "b" is second in both lists, "a" first in one and missing from the other
+    assert reciprocal_rank_fusion(["a", "b", "c"], ["d", "b", "c"]) == ["b", "c", "a", "d"]
+    assert reciprocal_rank_fusion(["x", "y"]) == ["x", "y"]
+    assert reciprocal_rank_fusion() == []
+
+
+def test_get_deleted_chunk():
+    index = build_index()
+    assert index.get("chat")[1] == {"symbol": "RAGHandler.chat"}
+    index.delete(["chat"])
+    assert index.get("chat") is None
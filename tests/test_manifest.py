@@ -0,0 +1,120 @@
+import os
+
+from RAG.manifest import IndexManifest, hash_content, chunk_ids_for
+from RAG.ingest import IngestionPipeline
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.chunks = {}
+
+    def add_texts(self, texts, metadatas, ids):
+        self.chunks.update(zip(ids, texts))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+
+def write(path, content):
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def index(manifest, store, files):
+    pipeline = IngestionPipeline(store, manifest, use_processes=False, workers=2, batch_size=4)
+    return pipeline.run(files)
+
+
+def test_record_and_is_unchanged(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(tmp_path))
+    path = write(tmp_path / "a.py", "x = 1\n")
+    stat = os.stat(path)
+    assert not manifest.is_unchanged(path, stat)
+
+    content_hash = hash_content("x = 1\n")
+    manifest.record(path, stat, content_hash, chunk_ids_for(path, content_hash, 2))
+    assert manifest.is_unchanged(path, stat)
+    assert manifest.content_matches(path, content_hash)
+
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert not manifest.is_unchanged(path, os.stat(path))
+
+
+def test_stale_files_and_forget(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(tmp_path))
+    stat = os.stat(write(tmp_path / "a.py", "x = 1\n"))
+    manifest.record("a.py", stat, "1" * 64, ["a-0", "a-1"])
+    manifest.record("b.py", stat, "2" * 64, ["b-0"])
+
+    assert manifest.stale_files(["a.py", "c.py"]) == ["b.py"]
+    assert manifest.forget("b.py") == ["b-0"]
+    assert manifest.forget("b.py") == []
+    assert manifest.stale_files(["a.py"]) == []
+
+
+def test_save_and_load(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(tmp_path))
+    manifest.record("a.py", os.stat(write(tmp_path / "a.py", "x = 1\n")), "1" * 64, ["a-0"])
+    manifest.save()
+    assert IndexManifest(str(tmp_path / "manifests"), str(tmp_path)).files == manifest.files
+
+
+def test_corrupt_manifest_is_empty(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(tmp_path))
+    os.makedirs(os.path.dirname(manifest.manifest_path))
+    with open(manifest.manifest_path, "w") as f:
+        f.write("{not json")
+    assert IndexManifest(str(tmp_path / "manifests"), str(tmp_path)).files == {}
+
+
+def test_chunk_ids_are_deterministic():
+    assert chunk_ids_for("a.py", "f" * 64, 2) == chunk_ids_for("a.py", "f" * 64, 2)
+    assert chunk_ids_for("a.py", "f" * 64, 1) != chunk_ids_for("b.py", "f" * 64, 1)
+
+
+def test_reindex_deletes_changed_and_removed_files(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(repo))
+    store = FakeVectorStore()
+    a = write(repo / "a.py", "def a():\n    return 1\n")
+    b = write(repo / "b.py", "def b():\n    return 2\n")
+
+    stats = index(manifest, store, [a, b])
+    assert stats["files_indexed"] == 2
+    old_a_ids = manifest.files[a]["chunk_ids"]
+
+    # Unchanged files are skipped on the stat check alone
+    stats = index(manifest, store, [a, b])
+    assert stats["files_unchanged"] == 2 and stats["chunks_added"] == 0
+
+    write(repo / "a.py", "def a():\n    return 10\n")
+    os.utime(a, (0, os.stat(b).st_mtime + 10))
+    os.remove(b)
+    stats = index(manifest, store, [a])
+    assert stats["files_indexed"] == 1
+    assert list(manifest.files) == [a]
+    assert not set(old_a_ids) & set(store.chunks)
+    assert set(store.chunks) == set(manifest.files[a]["chunk_ids"])
+    assert "return 10" in "".join(store.chunks.values())
+
+    # The saved manifest matches what is in the store
+    assert IndexManifest(str(tmp_path / "manifests"), str(repo)).files == manifest.files
+
+
+def test_truncated_run_keeps_unscanned_files(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    manifest = IndexManifest(str(tmp_path / "manifests"), str(repo))
+    store = FakeVectorStore()
+    a = write(repo / "a.py", "def a():\n    return 1\n")
+    b = write(repo / "b.py", "def b():\n    return 2\n")
+    index(manifest, store, [a, b])
+    b_ids = manifest.files[b]["chunk_ids"]
+
+    pipeline = IngestionPipeline(store, manifest, use_processes=False, workers=2)
+    stats = pipeline.run([a], truncated=True)
+    assert stats["chunks_deleted"] == 0
+    assert manifest.files[b]["chunk_ids"] == b_ids
+    assert set(b_ids) <= set(store.chunks)
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from ollama_client import OllamaClient, AsyncOllamaClient, OllamaError
+
+
+URL = "http://ollama.test/api/chat"
+
+
+def sync_client(errors):
+    client = OllamaClient(max_retries=3, backoff_base=0, backoff_max=0)
+    calls = []
+
+    def post(*args, **kwargs):
+        calls.append(kwargs)
+        if errors:
+            raise errors.pop(0)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"message": {"content": "hi"}}'
+        return response
+
+    client.session.post = post
+    return client, calls
+
+
+def test_connect_failures_are_retried():
+    client, calls = sync_client([requests.ConnectTimeout("slow connect"), requests.ConnectionError("refused")])
+    assert client.chat_content(URL, {"model": "m", "messages": []}) == "hi"
+    assert len(calls) == 3
+
+
+def test_read_timeouts_are_not_retried():
+    client, calls = sync_client([requests.ReadTimeout("still generating")])
+    with pytest.raises(OllamaError):
+        client.chat(URL, {"model": "m", "messages": []})
+    assert len(calls) == 1
+
+
+def async_client(handler):
+    client = AsyncOllamaClient(max_retries=3, backoff_base=0, backoff_max=0)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_async_retries_connect_errors_only():
+    calls = []
+
+    def flaky(request):
+        calls.append(request)
+        if len(calls) < 3:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"message": {"content": "hi"}})
+
+    assert asyncio.run(async_client(flaky).chat_content(URL, {"model": "m", "messages": []})) == "hi"
+    assert len(calls) == 3
+
+    calls.clear()
+
+    def slow(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("still generating", request=request)
+
+    with pytest.raises(OllamaError):
+        asyncio.run(async_client(slow).chat(URL, {"model": "m", "messages": []}))
+    assert len(calls) == 1
+
+
+def test_retryable_status_codes():
+    calls = []
+
+    def busy(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) == 1 else 200, json={"message": {"content": "hi"}})
+
+    assert asyncio.run(async_client(busy).chat_content(URL, {"model": "m", "messages": []})) == "hi"
+    assert len(calls) == 2
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from RAG.lexical_index import LexicalIndex
+from RAG.rag_handler import RAGHandler
+
+
+def handler_with_index(index):
+    collection = SimpleNamespace(lexical_index=index)
+    return SimpleNamespace(collections=SimpleNamespace(get=lambda repo_path: collection))
+
+
+def test_lexical_search_skips_chunks_deleted_after_search():
+    index = LexicalIndex()
+    index.add(["a", "b", "c"], ["reset the store", "reset the index", "reset everything"], [{}, {}, {}])
+
+    def search(lexical_index):
+        results = lexical_index.search("reset", k=3)
+        # A re-index deletes a chunk between the search and reading its text
+        lexical_index.delete(["b"])
+        return results
+
+    documents = RAGHandler._lexical_search(handler_with_index(index), search, ["/repo"], 2)
+    assert sorted(doc.page_content for doc in documents) == ["reset everything", "reset the store"]
+
+
+def test_identifier_lookup_needs_a_defining_chunk():
+    index = LexicalIndex()
+    index.add(["code", "readme"],
+              ["def chat(self, message):\n    return os.path.join(message)\n", "Install node.js and read os.path docs."],
+              [{"symbol": "RAGHandler.chat"}, {}])
+    handler = handler_with_index(index)
+    handler.retrieval_candidates = 5
+    handler._lexical_search = lambda search, repo_paths, k: RAGHandler._lexical_search(handler, search, repo_paths, k)
+
+    gate = {}
+    assert RAGHandler._identifier_lookup(handler, "What does `chat` do?", gate, ["/repo"])
+    assert gate["reason"] == "identifier_lookup"
+    assert [doc.page_content for doc in gate["documents"]] == [index.get("code")[0]]
+
+    # Names that only appear in chunks, without a definition, go through the relevance threshold
+    assert not RAGHandler._identifier_lookup(handler, "How does os.path work, e.g. on node.js?", {}, ["/repo"])
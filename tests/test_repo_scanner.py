@@ -0,0 +1,99 @@
+import os
+
+from repo_scanner import GitIgnore, RepositoryScanner
+
+
+def write(root, relative_path, content="x = 1\n"):
+    path = os.path.join(root, *relative_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+    return path
+
+
+def scanned_paths(files):
+    return [scanned.relative_path.replace(os.sep, "/") for scanned in files]
+
+
+def test_gitignore_negation_and_order():
+    gitignore = GitIgnore(["# logs", "*.log", "!keep.log", "", "debug/keep.log"])
+    assert gitignore.match("app.log", False) is True
+    assert gitignore.match("keep.log", False) is False
+    assert gitignore.match("debug/keep.log", False) is True
+    assert gitignore.match("app.py", False) is None
+
+
+def test_gitignore_anchored_patterns():
+    gitignore = GitIgnore(["/build.py", "docs/*.md"])
+    assert gitignore.match("build.py", False)
+    assert gitignore.match("src/build.py", False) is None
+    assert gitignore.match("docs/index.md", False)
+    assert gitignore.match("docs/api/index.md", False) is None
+    assert gitignore.match("src/docs/index.md", False) is None
+
+
+def test_gitignore_double_star():
+    gitignore = GitIgnore(["**/generated", "assets/**/*.js", "logs/**"])
+    assert gitignore.match("generated", True)
+    assert gitignore.match("src/deep/generated", True)
+    assert gitignore.match("assets/app.js", False)
+    assert gitignore.match("assets/vendor/lib/app.js", False)
+    assert gitignore.match("src/assets/app.js", False) is None
+    assert gitignore.match("logs/2024/app.txt", False)
+
+
+def test_gitignore_directory_only_rules():
+    gitignore = GitIgnore(["out/", "[ab]?.txt"])
+    assert gitignore.match("out", True)
+    assert gitignore.match("out", False) is None
+    assert gitignore.match("src/out", True)
+    assert gitignore.match("a1.txt", False)
+    assert gitignore.match("c1.txt", False) is None
+
+
+def test_scan_applies_nested_gitignores_and_prunes(tmp_path):
+    root = str(tmp_path)
+    write(root, ".gitignore", "*.log\nsecret/\n")
+    write(root, "main.py")
+    write(root, "debug.log")
+    write(root, "secret/key.txt")
+    write(root, "src/.gitignore", "/local.py\n!important.log\n")
+    write(root, "src/local.py")
+    write(root, "src/app.py")
+    write(root, "src/important.log")
+    write(root, "src/nested/local.py")
+    write(root, "node_modules/lib/index.js")
+    write(root, "env/pyvenv.cfg", "home = /usr/bin\n")
+    write(root, "env/lib/site.py")
+    write(root, "image.png", b"\x89PNG")
+
+    files, stats = RepositoryScanner().scan(root)
+    assert scanned_paths(files) == ["main.py", "src/app.py", "src/important.log", "src/nested/local.py"]
+    # secret/ by .gitignore, node_modules by name, env by its pyvenv.cfg
+    assert stats["directories_pruned"] == 3
+    assert stats["files_ignored"] == 2
+    assert not stats["truncated"]
+
+
+def test_scan_skips_large_and_binary_files(tmp_path):
+    root = str(tmp_path)
+    write(root, "small.py", "x = 1\n")
+    write(root, "large.py", "x = 1\n" * 100)
+    write(root, "binary.txt", b"abc\0def")
+
+    files, stats = RepositoryScanner(max_file_size=100).scan(root)
+    assert scanned_paths(files) == ["small.py"]
+    assert stats["files_too_large"] == 1
+    assert stats["files_binary"] == 1
+    assert stats["bytes"] == 6
+
+
+def test_scan_truncates_at_max_total_size(tmp_path):
+    root = str(tmp_path)
+    for name in ("a.py", "b.py", "c/d.py", "e.py"):
+        write(root, name, "x" * 40)
+
+    files, stats = RepositoryScanner(max_total_size=100).scan(root)
+    assert scanned_paths(files) == ["a.py", "b.py"]
+    assert stats["truncated"]
+    assert stats["bytes"] == 80
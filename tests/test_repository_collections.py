@@ -0,0 +1,43 @@
+import threading
+import time
+
+from RAG import repository_collections
+from RAG.repository_collections import CollectionRegistry
+
+
+class FakeStore:
+    def __init__(self):
+        self.dropped_at = None
+
+    def drop(self):
+        self.dropped_at = time.monotonic()
+
+
+def test_drop_waits_for_running_ingest(tmp_path, monkeypatch):
+    monkeypatch.setattr(repository_collections, "create_vector_store", lambda *args, **kwargs: FakeStore())
+    registry = CollectionRegistry(str(tmp_path / "db"), "faiss", None, str(tmp_path / "manifests"))
+    collection = registry.get(str(tmp_path / "repo"), create=True)
+
+    collection.ingest_lock.acquire()
+    released_at = []
+
+    def finish_ingest():
+        time.sleep(0.2)
+        released_at.append(time.monotonic())
+        collection.ingest_lock.release()
+
+    threading.Thread(target=finish_ingest).start()
+    assert registry.drop(str(tmp_path / "repo"))
+    assert collection.store.dropped_at >= released_at[0]
+    assert registry.repo_paths() == []
+    assert not registry.drop(str(tmp_path / "repo"))
+
+
+def test_chroma_drop_does_not_recreate_the_collection():
+    from RAG.chroma_store import ChromaStore
+
+    calls = []
+    store = ChromaStore.__new__(ChromaStore)
+    store.store = type("LangchainChroma", (), {"delete_collection": lambda self: calls.append("delete_collection")})()
+    store.drop()
+    assert calls == ["delete_collection"]
@@ -0,0 +1,88 @@
+import threading
+
+from RAG.response_cache import SemanticResponseCache
+
+
+def test_concurrent_stores_save_safely(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "responses.pkl"), save_interval=0)
+    errors = []
+
+    def store(worker):
+        try:
+            for index in range(20):
+                cache.store("key", f"question {worker} {index}", [1.0, float(worker), float(index)], "answer")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert SemanticResponseCache(str(tmp_path / "responses.pkl")).stats()["size"] == 80
+
+
+def test_saves_are_throttled(tmp_path):
+    path = tmp_path / "responses.pkl"
+    cache = SemanticResponseCache(str(path), save_interval=3600)
+    cache.store("key", "question", [1.0, 0.0], "answer")
+    assert not path.exists() and cache.dirty
+
+    cache.save()
+    assert not cache.dirty
+    assert SemanticResponseCache(str(path)).lookup("key", [1.0, 0.0]) == "answer"
+
+
+def test_similarity_threshold(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "responses.pkl"), similarity_threshold=0.9)
+    cache.store("key", "what does chat do", [1.0, 0.0], "answer")
+    assert cache.lookup("key", [0.99, 0.1]) == "answer"
+    assert cache.lookup("key", [0.5, 0.5]) is None
+    assert cache.lookup("other key", [1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("RAG.response_cache.time.time", lambda: now[0])
+    cache = SemanticResponseCache(str(tmp_path / "responses.pkl"), ttl=60)
+    cache.store("key", "question", [1.0, 0.0], "answer")
+    now[0] += 59
+    assert cache.lookup("key", [1.0, 0.0]) == "answer"
+    now[0] += 2
+    assert cache.lookup("key", [1.0, 0.0]) is None
+    # Expired entries are dropped on the next store
+    cache.store("key", "other question", [0.0, 1.0], "other answer")
+    assert cache.stats()["size"] == 1
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("RAG.response_cache.time.time", lambda: now[0])
+    cache = SemanticResponseCache(str(tmp_path / "responses.pkl"), max_entries=2)
+    cache.store("a", "first", [1.0, 0.0], "first answer")
+    now[0] += 1
+    cache.store("b", "second", [1.0, 0.0], "second answer")
+    now[0] += 1
+    assert cache.lookup("a", [1.0, 0.0]) == "first answer"
+    now[0] += 1
+    cache.store("c", "third", [1.0, 0.0], "third answer")
+    assert cache.lookup("b", [1.0, 0.0]) is None
+    assert cache.lookup("a", [1.0, 0.0]) == "first answer"
+    assert cache.lookup("c", [1.0, 0.0]) == "third answer"
+
+
+def test_invalidate_by_repository_prefix(tmp_path):
+    repo = tmp_path / "repo"
+    cache = SemanticResponseCache(str(tmp_path / "responses.pkl"))
+    cache.store("key", "in repo", [1.0, 0.0], "repo answer", sources=[str(repo / "a.py")])
+    cache.store("key", "in sibling", [0.0, 1.0], "sibling answer", sources=[str(tmp_path / "repo-other" / "a.py")])
+    cache.store("key", "general", [0.6, 0.8], "general answer")
+
+    # repo-other only shares a string prefix with repo, so it is kept
+    assert cache.invalidate(str(repo)) == 1
+    assert cache.lookup("key", [1.0, 0.0]) is None
+    assert cache.lookup("key", [0.0, 1.0]) == "sibling answer"
+    assert cache.invalidate() == 2
+    assert cache.stats()["size"] == 0
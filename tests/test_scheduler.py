@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, SchedulerFull
+
+
+async def queue_request(scheduler, session_id, granted):
+    await scheduler.acquire(session_id)
+    granted.append(session_id)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slots_are_handed_out_round_robin():
+    async def run():
+        scheduler = FairScheduler(max_concurrency=1)
+        await scheduler.acquire("holder")
+        granted = []
+        tasks = [asyncio.ensure_future(queue_request(scheduler, session_id, granted))
+                 for session_id in ("a", "a", "a", "b", "c")]
+        await settle()
+        assert scheduler.stats()["queued"] == 5 and scheduler.stats()["sessions_waiting"] == 3
+
+        for _ in tasks:
+            scheduler.release()
+            await settle()
+        assert granted == ["a", "b", "c", "a", "a"]
+        await asyncio.gather(*tasks)
+        assert scheduler.stats()["running"] == 1 and scheduler.stats()["queued"] == 0
+
+    asyncio.run(run())
+
+
+def test_requests_run_immediately_below_the_limit():
+    async def run():
+        scheduler = FairScheduler(max_concurrency=2)
+        async with scheduler.slot("a"):
+            async with scheduler.slot("a"):
+                assert scheduler.stats()["running"] == 2
+        assert scheduler.stats()["running"] == 0
+
+    asyncio.run(run())
+
+
+def test_queue_depth_limits():
+    async def run():
+        scheduler = FairScheduler(max_concurrency=1, max_queue_depth=3, max_queued_per_session=2)
+        await scheduler.acquire("holder")
+        granted = []
+        tasks = [asyncio.ensure_future(queue_request(scheduler, session_id, granted)) for session_id in ("a", "a")]
+        await settle()
+        with pytest.raises(SchedulerFull, match="Session a"):
+            await scheduler.acquire("a")
+
+        tasks.append(asyncio.ensure_future(queue_request(scheduler, "b", granted)))
+        await settle()
+        with pytest.raises(SchedulerFull, match="3 requests"):
+            await scheduler.acquire("c")
+        # Rejected requests were never queued
+        assert scheduler.stats()["queued"] == 3
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert scheduler.stats()["queued"] == 0 and not scheduler.waiting
+
+    asyncio.run(run())
+
+
+def test_cancelled_while_queued_gives_up_its_place():
+    async def run():
+        scheduler = FairScheduler(max_concurrency=1)
+        await scheduler.acquire("holder")
+        granted = []
+        cancelled = asyncio.ensure_future(queue_request(scheduler, "a", granted))
+        waiting = asyncio.ensure_future(queue_request(scheduler, "b", granted))
+        await settle()
+
+        cancelled.cancel()
+        await settle()
+        assert cancelled.cancelled()
+        assert scheduler.stats()["queued"] == 1 and "a" not in scheduler.waiting
+
+        scheduler.release()
+        await waiting
+        assert granted == ["b"]
+        assert scheduler.stats()["running"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_right_after_being_granted_returns_the_slot():
+    async def run():
+        scheduler = FairScheduler(max_concurrency=1)
+        await scheduler.acquire("holder")
+        granted = []
+        task = asyncio.ensure_future(queue_request(scheduler, "a", granted))
+        await settle()
+
+        # The slot is handed over, but the waiter is cancelled before it resumes
+        scheduler.release()
+        assert scheduler.stats()["running"] == 1
+        task.cancel()
+        await settle()
+        assert task.cancelled() and granted == []
+        assert scheduler.stats()["running"] == 0 and scheduler.stats()["queued"] == 0
+
+        await scheduler.acquire("b")
+        assert scheduler.stats()["running"] == 1
+
+    asyncio.run(run())
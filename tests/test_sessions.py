@@ -0,0 +1,62 @@
+import os
+
+from sessions import SessionManager
+
+
+def test_sessions_are_created_once_with_safe_ids(tmp_path):
+    manager = SessionManager(root_dir=str(tmp_path))
+    session = manager.get("../alice")
+    assert session.session_id == "___alice"
+    assert session.scratch_dir == os.path.join(str(tmp_path), "___alice")
+    assert manager.get("../alice") is session
+    assert manager.get(None).session_id == "default"
+
+
+def test_history_follows_the_client_until_the_session_tracks_it(tmp_path):
+    session = SessionManager(root_dir=str(tmp_path)).get("a")
+    client_history = [{"role": "user", "content": "hi"}]
+    assert session.history_for(client_history) is client_history
+
+    session.add_turn("question", "answer", client_history)
+    assert session.history_for([]) == client_history + [{"role": "user", "content": "question"},
+                                                        {"role": "assistant", "content": "answer"}]
+
+
+def test_clear_removes_history_and_scratch_dir(tmp_path):
+    manager = SessionManager(root_dir=str(tmp_path))
+    session = manager.get("a")
+    os.makedirs(session.knowledge_base_dir)
+    session.add_turn("question", "answer")
+    session.active_repositories.append("/repo")
+
+    session.clear()
+    assert session.history_for([{"role": "user", "content": "old"}]) == []
+    assert not os.path.exists(session.scratch_dir)
+    assert session.active_repositories == ["/repo"]
+
+    manager.close("a")
+    assert manager.get("a") is not session
+
+
+def test_idle_sessions_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("sessions.time.time", lambda: now[0])
+    manager = SessionManager(root_dir=str(tmp_path), idle_timeout=60)
+    idle = manager.get("idle")
+    os.makedirs(idle.knowledge_base_dir)
+    now[0] += 30
+    busy = manager.get("busy")
+
+    now[0] += 45
+    assert manager.get("busy") is busy
+    assert "idle" not in manager.sessions
+    assert not os.path.exists(idle.scratch_dir)
+
+
+def test_sessions_using(tmp_path):
+    manager = SessionManager(root_dir=str(tmp_path))
+    first, second = manager.get("first"), manager.get("second")
+    first.active_repositories.append("/repo")
+    second.active_repositories.append("/repo")
+    assert manager.sessions_using("/repo", exclude=first) == [second]
+    assert manager.sessions_using("/other") == []
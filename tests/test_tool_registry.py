@@ -0,0 +1,50 @@
+import json
+import time
+import asyncio
+
+from Tools.tool import Tool
+from Tools.tool_registry import ToolRegistry
+
+
+class SleepTool(Tool):
+    timeout = 0.5
+
+    def handle_tool_call(self, arguments, knowledge_base_dir=None):
+        time.sleep(arguments["seconds"])
+        return f"slept {arguments['seconds']}"
+
+    def get_tool_function_object(self):
+        return {"name": "sleep", "description": "Sleep", "parameters": {"type": "object", "properties": {}}}
+
+
+def sleep_call(seconds):
+    return {"function": {"name": "sleep", "arguments": {"seconds": seconds}}}
+
+
+def test_queued_calls_get_their_full_timeout():
+    registry = ToolRegistry([SleepTool()], max_workers=1)
+    # Run one after another, 0.9s in total, but each call is well within its 0.5s timeout
+    assert registry.run_calls([sleep_call(0.3)] * 3) == ["slept 0.3"] * 3
+    assert asyncio.run(registry.arun_calls([sleep_call(0.3)] * 3)) == ["slept 0.3"] * 3
+    registry.close()
+
+
+def test_timeouts_and_busy_workers():
+    registry = ToolRegistry([SleepTool()], max_workers=1)
+    responses = registry.run_calls([sleep_call(2.0), sleep_call(0.1)])
+    assert "did not finish" in json.loads(responses[0])["error"]
+    # The only worker stays busy with the first call after it timed out, so the second one never starts
+    assert "could not start" in json.loads(responses[1])["error"]
+    time.sleep(1.6)
+
+    responses = asyncio.run(registry.arun_calls([sleep_call(2.0), sleep_call(0.1)]))
+    assert "did not finish" in json.loads(responses[0])["error"]
+    assert "could not start" in json.loads(responses[1])["error"]
+    registry.close()
+
+
+def test_unknown_tool():
+    registry = ToolRegistry([SleepTool()])
+    response = registry.run_calls([{"function": {"name": "missing", "arguments": {}}}])[0]
+    assert "Unknown tool 'missing'" in json.loads(response)["error"]
+    registry.close()
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import functools
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Histogram bucket upper bounds, in seconds for span durations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384)
+# A request whose model took at least this long to load counts as a cold start
+COLD_LOAD_SECONDS = 0.25
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a request. Spans opened while another span is active become its
+    children and share its trace id, so all stages of one chat turn can be grouped.
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        record = {
+            "span": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start_time, 6),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "thread": threading.current_thread().name,
+            **self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class Tracer:
+    """
+    Records spans to a rotating JSON-lines log and aggregates their durations into
+    histograms served on a local metrics endpoint.
+
+    The log file is only created once the first span finishes, so importing this module
+    has no side effects.
+    """
+
+    def __init__(self, **kwargs):
+        self.log_path = kwargs.get("log_path", os.environ.get("ASSISTANT_TRACE_LOG", os.path.join("logs", "traces.jsonl")))
+        self.max_bytes = kwargs.get("max_bytes", 10 * 1024 * 1024)
+        self.backup_count = kwargs.get("backup_count", 5)
+        self.enabled = kwargs.get("enabled", os.environ.get("ASSISTANT_TRACING", "1") != "0")
+        self.lock = threading.Lock()
+        self.histograms = {}  # (metric, label value) -> Histogram
+        self.counters = {}  # (metric, label value) -> float
+        self.logger = None
+        self.metrics_server = None
+
+    def _get_logger(self):
+        if self.logger is None:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            logger = logging.getLogger("assistant.tracing")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(self.log_path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self.logger = logger
+        return self.logger
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a stage. Attributes can be added while it runs through span.set(...).
+        """
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            # A generator closed early (GeneratorExit) is not an error
+            if not isinstance(e, GeneratorExit):
+                span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.seconds = time.perf_counter() - span.start
+            # Generators may be resumed from another context, so restore the parent explicitly
+            _current_span.set(parent)
+            self.finish(span)
+
+    def current_span(self):
+        return _current_span.get()
+
+    def propagate(self, fn):
+        """
+        Wrap fn so that spans it opens in a worker thread become children of the current span.
+        """
+        parent = _current_span.get()
+
+        def run(*args, **kwargs):
+            _current_span.set(parent)
+            return fn(*args, **kwargs)
+        return run
+
+    def record(self, name, seconds, **attributes):
+        """
+        Record a span that was timed elsewhere, e.g. inside a worker process.
+        """
+        span = Span(name, _current_span.get(), attributes)
+        span.seconds = seconds
+        self.finish(span)
+
+    def finish(self, span):
+        self.observe("span_duration_seconds", span.name, span.seconds)
+        if span.error:
+            self.increment("span_errors_total", span.name)
+        if not self.enabled:
+            return
+        try:
+            self._get_logger().info(json.dumps(span.to_dict(), default=str))
+        except OSError as e:
+            print(f"Could not write trace log {self.log_path}: {e}")
+            self.enabled = False
+
+    def observe(self, metric, label, value, buckets=DEFAULT_BUCKETS):
+        with self.lock:
+            histogram = self.histograms.get((metric, label))
+            if histogram is None:
+                histogram = self.histograms[(metric, label)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, metric, label, value=1):
+        with self.lock:
+            self.counters[(metric, label)] = self.counters.get((metric, label), 0) + value
+
+    def metrics_text(self):
+        """
+        Render all histograms and counters in the Prometheus text exposition format.
+        Every metric has a single "name" label: the span name, model or tool it belongs to.
+        """
+        lines = []
+        with self.lock:
+            declared = set()
+            for (metric, label), histogram in sorted(self.histograms.items()):
+                if metric not in declared:
+                    lines.append(f"# TYPE assistant_{metric} histogram")
+                    declared.add(metric)
+                for bound, total in histogram.cumulative():
+                    lines.append(f'assistant_{metric}_bucket{{name="{label}",le="{bound}"}} {total}')
+                lines.append(f'assistant_{metric}_sum{{name="{label}"}} {histogram.sum}')
+                lines.append(f'assistant_{metric}_count{{name="{label}"}} {histogram.count}')
+            for (metric, label), value in sorted(self.counters.items()):
+                if metric not in declared:
+                    lines.append(f"# TYPE assistant_{metric} counter")
+                    declared.add(metric)
+                lines.append(f'assistant_{metric}{{name="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port=9464, host="127.0.0.1"):
+        """
+        Serve the metrics on http://host:port/metrics from a daemon thread.
+        """
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.metrics_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.metrics_server = ThreadingHTTPServer((host, port), Handler)
+        self.metrics_server.daemon_threads = True
+        threading.Thread(target=self.metrics_server.serve_forever, name="metrics", daemon=True).start()
+        print(f"Metrics available at http://{host}:{self.metrics_server.server_address[1]}/metrics")
+        return self.metrics_server
+
+
+def traced_generator(name):
+    """
+    Decorator running a generator function inside a span, recording how long it took to
+    yield its first item and how many items it yielded.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name) as span:
+                iterator = fn(*args, **kwargs)
+                yielded = 0
+                try:
+                    while True:
+                        # The consumer may resume the generator from another thread
+                        _current_span.set(span)
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            break
+                        if not yielded:
+                            span.set(first_yield_seconds=time.perf_counter() - span.start)
+                        yielded += 1
+                        yield item
+                finally:
+                    iterator.close()
+                    span.set(yielded=yielded)
+        return wrapper
+    return decorator
+
+
+def record_ollama_stats(span, data):
+    """
+    Copy token counts and server-side timings from a final Ollama response onto a span and into the metrics.
+    The first-token latency of a streamed response is also recorded as cold or warm, by its load time.
+    """
+    if not data:
+        return
+    model = data.get("model") or span.attributes.get("model", "")
+    stats = {key: data[key] for key in ("prompt_eval_count", "eval_count") if key in data}
+    for key in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+        if key in data:
+            stats[key.replace("duration", "seconds")] = data[key] / 1e9  # nanoseconds
+    span.set(**stats)
+    for key in ("prompt_eval_count", "eval_count"):
+        if key in stats:
+            tracer.observe(f"ollama_{key}", model, stats[key], buckets=TOKEN_BUCKETS)
+            tracer.increment(f"ollama_{key}_total", model, stats[key])
+    if "load_seconds" in stats and "first_token_seconds" in span.attributes:
+        residency = "cold" if stats["load_seconds"] >= COLD_LOAD_SECONDS else "warm"
+        span.set(residency=residency)
+        tracer.observe(f"ollama_{residency}_first_token_seconds", model, span.attributes["first_token_seconds"])
+
+
+# Process-wide tracer
+tracer = Tracer()